@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Asyncio-based variant of the MOH scraper
+Keeps many requests in flight across the MOH, GHS and WHO sites while page
+parsing and extraction run in a bounded process pool
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from boilerplate import BoilerplateDetector
+from moh_scraper import MOHScraper, extract_page_rows, init_parse_worker
+from rate_limit import AdaptiveRateLimiter, retry_after
+from records import unpack_records
+from scraper_logging import configure_logging
+from url_discovery import SiteDiscovery, link_text_from_url
+
+logger = logging.getLogger(__name__)
+
+
+class HostRateLimiter:
+    """Cooperative per-host rate limiter.
+
+    Caps the number of concurrent requests to each host and paces request
+    start times with an AdaptiveRateLimiter per host, never faster than one
+    every ``min_interval`` seconds, without blocking the event loop.
+    """
+
+    def __init__(self, per_host_limit=8, min_interval=0.1):
+        self.per_host_limit = per_host_limit
+        self.min_interval = min_interval
+        self._semaphores = {}
+        self._rates = {}
+
+    def set_interval(self, host, seconds):
+        """Space requests to one host further apart, e.g. for its robots.txt Crawl-delay"""
+        self.rate(host).cap(seconds)
+
+    def _semaphore(self, host):
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._semaphores[host]
+
+    def rate(self, host):
+        if host not in self._rates:
+            rate = self._rates[host] = AdaptiveRateLimiter()
+            rate.cap(self.min_interval)
+        return self._rates[host]
+
+    async def acquire(self, host):
+        await self._semaphore(host).acquire()
+        delay = self.rate(host).reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record(self, host, status, latency, retry_after=None):
+        self.rate(host).record(status, latency, retry_after)
+
+    def release(self, host):
+        self._semaphore(host).release()
+
+    def stats(self):
+        return {host: rate.stats() for host, rate in self._rates.items()}
+
+
+class AsyncMOHScraper(MOHScraper):
+    """MOHScraper that crawls its start sites concurrently on an event loop.
+
+    ``max_in_flight`` caps pages being fetched or waiting to be parsed, so at
+    most that many bodies are held in memory. Politeness comes first: each
+    host gets at most ``per_host_limit`` concurrent requests, paced by its
+    rate limiter, so the crawl only approaches ``max_in_flight`` when it
+    spans about ``max_in_flight / per_host_limit`` hosts; against the three
+    default sites at most 24 requests are ever in flight.
+    """
+
+    DEFAULT_START_URLS = [
+        "https://www.moh.gov.gh/",
+        "https://ghs.gov.gh/",
+        "https://www.who.int/",
+    ]
+
+    def __init__(self, start_urls=None, max_in_flight=200, per_host_limit=8,
+                 min_interval=0.1, parse_workers=None, metrics=None, store=None, use_sitemaps=True,
+                 boilerplate=None, page_archive=None):
+        super().__init__(metrics, store=store, use_sitemaps=use_sitemaps, boilerplate=boilerplate,
+                         page_archive=page_archive)
+        self.start_urls = start_urls or self.DEFAULT_START_URLS
+        # One thread, so archive writes to the shared SQLite connection are serialized
+        self.archive_writer = ThreadPoolExecutor(max_workers=1) if page_archive is not None else None
+        self.max_in_flight = max_in_flight
+        self.limiter = HostRateLimiter(per_host_limit, min_interval)
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.timeout = aiohttp.ClientTimeout(total=10)
+
+    async def fetch(self, session, url):
+        """Fetch a page's raw bytes, honouring the per-host rate limit.
+
+        Like ``get_page``, the headers are checked before the body is read
+        and documents, binary assets and oversized pages are not downloaded.
+        """
+        kind = self.classify_url(url)
+        if kind:
+            self.skip_page(url, kind)
+            return None
+        host = urlparse(url).netloc
+        await self.limiter.acquire(host)
+        start = time.perf_counter()
+        error_status = None
+        try:
+            async with session.get(url) as response:
+                self.limiter.record(host, response.status, time.perf_counter() - start,
+                                    retry_after(response.headers))
+                if response.status >= 400:
+                    error_status = response.status
+                    self.metrics.record_fetch(url, response.status, time.perf_counter() - start, 0)
+                    response.raise_for_status()
+                content_type = response.headers.get('Content-Type', '')
+                size = response.content_length or 0
+                kind = self.classify_response(content_type, size)
+                content = None
+                if kind == 'html':
+                    content = await self.read_body_async(response)
+                    if content is None:
+                        kind = 'too_large'
+                self.metrics.record_fetch(url, response.status, time.perf_counter() - start,
+                                          len(content or b''))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Error statuses were recorded above; timeouts and connection errors are recorded here
+            if error_status is None:
+                self.metrics.record_fetch(url, None, time.perf_counter() - start, 0)
+                self.limiter.record(host, None, time.perf_counter() - start)
+            logger.error(f"Error fetching {url}: {e}")
+            return None
+        finally:
+            self.limiter.release(host)
+
+        if kind != 'html':
+            self.skip_page(url, kind, content_type, size)
+            return None
+        if self.page_archive is not None:
+            # Compression and the SQLite write run on the archive's writer thread, off the event loop
+            await asyncio.get_running_loop().run_in_executor(
+                self.archive_writer, self.page_archive.put, url, response.status,
+                {'Content-Type': content_type}, content)
+        return content
+
+    async def read_body_async(self, response):
+        """Async counterpart of ``read_body`` over an aiohttp response"""
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            body += chunk
+            if len(body) > self.max_page_bytes:
+                return None
+        return bytes(body)
+
+    async def parse(self, executor, parse_slots, url, content, extractor_names):
+        """Run the extractors for a page in the process pool and merge the records.
+
+        Pages are pruned with the boilerplate learned so far, so on a first
+        crawl the earliest pages of a site may keep their chrome.
+        """
+        boilerplate = self.boilerplate.boilerplate(url) if self.boilerplate else frozenset()
+        async with parse_slots:
+            loop = asyncio.get_running_loop()
+            rows, stats = await loop.run_in_executor(
+                executor, extract_page_rows, url, content, extractor_names, boilerplate)
+        self.merge_page_records(url, unpack_records(rows), stats)
+
+    async def scrape_site(self, session, executor, page_slots, parse_slots, start_url):
+        """Discover links on a site's start page and scrape every routed page"""
+        logger.info(f"Scraping {start_url}...")
+        content = await self.fetch(session, start_url)
+        if content is None:
+            return
+
+        host = urlparse(start_url).netloc
+        links = self.collect_links(BeautifulSoup(content, 'html.parser'), start_url)
+
+        discovery = None
+        if self.use_sitemaps:
+            # robots.txt and sitemap fetching is a handful of blocking requests per site
+            discovery = SiteDiscovery(self.session, start_url, state_path=None)
+            known = {link['url'] for link in links}
+            sitemap_pages = await asyncio.get_running_loop().run_in_executor(None, discovery.discover)
+            if discovery.crawl_delay:
+                self.limiter.set_interval(host, discovery.crawl_delay)
+            for url, lastmod in sitemap_pages:
+                if url not in known:
+                    text = link_text_from_url(url)
+                    links.append({'text': text, 'url': url, 'category': self.categorize_link(text, url),
+                                  'lastmod': lastmod})
+        self.discovered_links.extend(links)
+
+        pages = {}
+        for link in links:
+            if urlparse(link['url']).netloc != host:
+                continue
+            if discovery and not discovery.can_fetch(link['url']):
+                continue
+            extractor_names = self.extractors_for_link(link['text'])
+            if extractor_names:
+                routed = pages.setdefault(link['url'], [])
+                routed.extend(name for name in extractor_names if name not in routed)
+
+        # The start page itself is checked for contact details, like the main page
+        await asyncio.gather(
+            self.parse(executor, parse_slots, start_url, content, ['extract_contact_details']),
+            *(self.scrape_page(session, executor, page_slots, parse_slots, url, extractor_names)
+              for url, extractor_names in pages.items() if url != start_url)
+        )
+
+    async def scrape_page(self, session, executor, page_slots, parse_slots, url, extractor_names):
+        # The page slot is held from before the fetch until the page is parsed,
+        # so slow parsing holds back new fetches instead of queueing bodies
+        async with page_slots:
+            # Each URL is fetched once and shared by all extractors routed to it
+            content = await self.fetch(session, url)
+            if content is not None:
+                await self.parse(executor, parse_slots, url, content, extractor_names)
+
+    def rate_limit_stats(self):
+        return self.limiter.stats()
+
+    async def run_async(self, prometheus=False):
+        """Crawl every start site concurrently and return the EHR insights"""
+        logger.info("Starting async scraping...")
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+        # Pages fetched or awaiting parsing, which bounds the bodies held in memory
+        page_slots = asyncio.Semaphore(self.max_in_flight)
+        # Bound the jobs queued on the process pool
+        parse_slots = asyncio.Semaphore(self.parse_workers * 2)
+        hosts = {urlparse(url).netloc for url in self.start_urls}
+        logger.info(f"At most {min(self.max_in_flight, self.limiter.per_host_limit * len(hosts))} "
+                    f"requests in flight ({self.limiter.per_host_limit} per host over {len(hosts)} hosts)")
+
+        with self.metrics.phase('crawl'), \
+                ProcessPoolExecutor(max_workers=self.parse_workers,
+                                    initializer=init_parse_worker) as executor:
+            async with aiohttp.ClientSession(
+                    connector=connector, timeout=self.timeout,
+                    headers=dict(self.session.headers)) as session:
+                await asyncio.gather(*(
+                    self.scrape_site(session, executor, page_slots, parse_slots, url)
+                    for url in self.start_urls
+                ))
+        if self.archive_writer is not None:
+            self.archive_writer.shutdown()
+
+        self.analyze_discovered_links()
+        with self.metrics.phase('save_data'):
+            self.save_data()
+        with self.metrics.phase('generate_ehr_insights'):
+            insights = self.generate_ehr_insights()
+        self.save_run_report(prometheus)
+        if self.boilerplate:
+            self.boilerplate.save_state()
+        logger.info(f"Async scraping completed: {len(self.discovered_links)} links discovered")
+        return insights
+
+    def run_scraper(self, prometheus=False):
+        """Run the complete scraping process on an event loop"""
+        try:
+            return asyncio.run(self.run_async(prometheus))
+        except Exception as e:
+            logger.error(f"Error during scraping: {e}")
+            return None
+
+
+if __name__ == "__main__":
+    configure_logging()
+    scraper = AsyncMOHScraper(boilerplate=BoilerplateDetector())
+    insights = scraper.run_scraper()
+
+    if insights:
+        print("\n=== EHR Development Insights ===")
+        print(f"Found {len(insights['regulatory_requirements'])} regulatory documents")
+        print(f"Identified facility types: {', '.join(insights['facility_types'])}")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the guidelines embedding backends
+Compares indexing throughput, query latency and retrieval agreement of the
+PyTorch ('hf') and quantized ONNX ('onnx') backends on the extracted guidelines
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import time
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from ehr_insights import HEALTH_KEYWORDS
+from embedding_backends import BACKENDS, DEFAULT_MODEL, get_embeddings
+from scraper_logging import configure_logging
+
+
+def load_chunks(corpus_dir, limit=None):
+    """Split the extracted guideline .txt files the same way embed_into_faiss does"""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    chunks = []
+    for file in sorted(os.listdir(corpus_dir)):
+        if file.endswith('.txt'):
+            with open(os.path.join(corpus_dir, file), encoding='utf-8') as f:
+                chunks.extend(splitter.split_text(f.read()))
+    return chunks[:limit] if limit else chunks
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def run_backend(backend, model_name, chunks, queries):
+    start = time.perf_counter()
+    embeddings = get_embeddings(backend, model_name)
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    doc_vectors = normalize(embeddings.embed_documents(chunks))
+    index_s = time.perf_counter() - start
+
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(embeddings.embed_query(query))
+        latencies.append(time.perf_counter() - start)
+    return {
+        'load_s': load_s,
+        'index_s': index_s,
+        'chunks_per_s': len(chunks) / index_s if index_s else None,
+        'query_ms_median': statistics.median(latencies) * 1000,
+    }, doc_vectors, normalize(query_vectors)
+
+
+def agreement(baseline, other, k):
+    """Mean overlap of the top-k chunks each backend retrieves per query"""
+    base_docs, base_queries = baseline
+    other_docs, other_queries = other
+    base_top = np.argsort(-base_queries @ base_docs.T, axis=1)[:, :k]
+    other_top = np.argsort(-other_queries @ other_docs.T, axis=1)[:, :k]
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(base_top, other_top)]
+    return {
+        f'overlap_at_{k}': float(np.mean(overlap)),
+        'mean_vector_cosine': float(np.mean(np.sum(base_docs * other_docs, axis=1))),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the guidelines embedding backends")
+    parser.add_argument('--corpus', default='guidelines', help="Directory of extracted guideline .txt files")
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS),
+                        help="Backends to run; the first is the agreement baseline")
+    parser.add_argument('--limit', type=int, help="Only embed the first N chunks")
+    parser.add_argument('--k', type=int, default=5, help="Retrieval depth for agreement")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    configure_logging(logging.WARNING, log_file=None)
+    chunks = load_chunks(args.corpus, args.limit)
+    queries = HEALTH_KEYWORDS + [f"treatment guidelines for {keyword}" for keyword in HEALTH_KEYWORDS]
+
+    report = {'chunks': len(chunks), 'queries': len(queries), 'backends': {}}
+    vectors = {}
+    for backend in args.backends:
+        result, doc_vectors, query_vectors = run_backend(backend, args.model, chunks, queries)
+        report['backends'][backend] = result
+        vectors[backend] = (doc_vectors, query_vectors)
+    baseline = args.backends[0]
+    for backend in args.backends[1:]:
+        report['backends'][backend].update(agreement(vectors[baseline], vectors[backend], args.k))
+
+    print(f"Chunks: {len(chunks)}, queries: {len(queries)}")
+    print(f"{'backend':<10}{'load (s)':>10}{'index (s)':>11}{'chunks/s':>11}{'query (ms)':>12}"
+          f"{f'overlap@{args.k}':>12}")
+    for backend, result in report['backends'].items():
+        overlap = result.get(f'overlap_at_{args.k}')
+        print(f"{backend:<10}{result['load_s']:>10.2f}{result['index_s']:>11.2f}{result['chunks_per_s']:>11.1f}"
+              f"{result['query_ms_median']:>12.2f}{'' if overlap is None else f'{overlap:.0%}':>12}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
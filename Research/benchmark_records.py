@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for scraped record representations
+Compares per-record dicts with a fresh timestamp each (the old extractor
+output) against the typed records in records.py, using a JSON dump as corpus,
+and times pickling each the way parse workers ship records between processes
+"""
+
+import argparse
+import json
+import pickle
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from records import RECORD_TYPES, pack_records, unpack_records
+
+URL_FIELDS = ('url', 'source_url', 'source_page')
+
+
+def page_url(record):
+    return record.get('source_url') or record.get('url') or ''
+
+
+def build_dicts(corpus, scale):
+    """Records as the old extractors built them: one dict and timestamp string per record"""
+    data = {}
+    for category, records in corpus.items():
+        out = data[category] = []
+        for _ in range(scale):
+            # Records from one page shared that page's URL object, but every
+            # crawl (and every page linking to a URL) built a fresh copy
+            url_copies = {}
+            for record in records:
+                item = dict(record)
+                for field in URL_FIELDS:
+                    if field in item:
+                        if item[field] not in url_copies:
+                            url_copies[item[field]] = ''.join(list(item[field]))
+                        item[field] = url_copies[item[field]]
+                for field in ('services', 'objectives'):
+                    if field in item:
+                        item[field] = list(item[field])
+                item['scraped_at'] = datetime.now().isoformat()
+                out.append(item)
+    return data
+
+
+def build_records(corpus, scale):
+    """Typed records with interned URLs and one timestamp per page"""
+    data = {}
+    for category, records in corpus.items():
+        record_type = RECORD_TYPES[category]
+        out = data[category] = []
+        for _ in range(scale):
+            page_timestamps = {}
+            for record in records:
+                page = sys.intern(page_url(record))
+                if page not in page_timestamps:
+                    page_timestamps[page] = datetime.now().isoformat()
+                values = {field: record[field] for field in record_type._fields if field in record}
+                for field in URL_FIELDS:
+                    if field in values:
+                        values[field] = sys.intern(values[field])
+                for field in ('services', 'objectives'):
+                    if field in values:
+                        values[field] = tuple(values[field])
+                values['scraped_at'] = page_timestamps[page]
+                out.append(record_type(**values))
+    return data
+
+
+def best_time(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(builder, corpus, scale, pack=None, unpack=None):
+    """Memory of the built records and the pickle round trip of ``pack(records)``"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    data = builder(corpus, scale)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+    pack = pack or (lambda records: records)
+    unpack = unpack or (lambda records: records)
+    payload = pickle.dumps(pack(data), protocol=pickle.HIGHEST_PROTOCOL)
+    return {
+        'records': sum(len(records) for records in data.values()),
+        'memory_bytes': used,
+        'pickle_bytes': len(payload),
+        'pickle_s': best_time(lambda: pickle.dumps(pack(data), protocol=pickle.HIGHEST_PROTOCOL)),
+        'unpickle_s': best_time(lambda: unpack(pickle.loads(payload))),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare memory use of dict and typed scraped records")
+    parser.add_argument('dump', nargs='?', default='moh_data_20250709_144205.json',
+                        help="moh_data_<timestamp>.json dump to use as the corpus")
+    parser.add_argument('--scale', type=int, default=10, help="Copies of the corpus to build")
+    args = parser.parse_args()
+
+    with open(args.dump, encoding='utf-8') as f:
+        corpus = {category: records for category, records in json.load(f).items()
+                  if category in RECORD_TYPES and records}
+
+    results = {
+        'dicts': measure(build_dicts, corpus, args.scale),
+        'typed': measure(build_records, corpus, args.scale),
+        # What parse workers ship: the typed records packed into plain tuples
+        'typed, packed': measure(build_records, corpus, args.scale, pack_records, unpack_records),
+    }
+
+    print(f"{'':<14}{'records':>10}{'memory (KB)':>14}{'pickle (KB)':>14}"
+          f"{'pickle (ms)':>14}{'unpickle (ms)':>16}")
+    for name, result in results.items():
+        print(f"{name:<14}{result['records']:>10}{result['memory_bytes'] / 1024:>14.1f}"
+              f"{result['pickle_bytes'] / 1024:>14.1f}{result['pickle_s'] * 1000:>14.2f}"
+              f"{result['unpickle_s'] * 1000:>16.2f}")
+    dicts, typed, packed = results.values()
+    print(f"Memory reduction: {1 - typed['memory_bytes'] / dicts['memory_bytes']:.0%}")
+    print(f"Pickle time vs dicts: typed {typed['pickle_s'] / dicts['pickle_s']:.1f}x, "
+          f"packed {packed['pickle_s'] / dicts['pickle_s']:.1f}x")
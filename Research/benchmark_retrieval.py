@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Retrieval benchmark for faiss_guidelines_db
+Builds (or loads) the guidelines index and measures build time, index size,
+query latency, concurrent throughput and how many expected documents each
+fixed query retrieves
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+from langchain.vectorstores import FAISS
+
+from ehr_insights import HEALTH_KEYWORDS
+from embedding_backends import BACKENDS, DEFAULT_MODEL, LazyEmbeddings, load_backend
+from guideline_answers import ANSWERS_FILE, INDEX_FILES
+from guideline_chunker import chunk_pdfs
+from guideline_index import build_index, document_metadata, load_documents
+from scraper_logging import configure_logging
+
+# Fixed query set: every health issue generate_ehr_insights tracks, alone and in clinical phrasings
+QUERY_TEMPLATES = ("{}", "treatment guidelines for {}", "{} management in primary care",
+                   "{} screening and diagnosis")
+
+# Metrics where a lower value is better, for comparing runs
+LOWER_IS_BETTER = ('build_s', 'index_mb', 'partitions_build_s', 'partitions_mb', 'answers_build_s', 'answers_mb',
+                   'embed_ms_p50', 'search_ms_p50', 'search_ms_p99')
+HIGHER_IS_BETTER = ('qps', 'doc_recall', 'mrr', 'ann_recall')
+
+# A document is expected for a health issue when it mentions the issue at least this often...
+MIN_MENTIONS = 3
+# ...and at least this share as often per word as the document that mentions it most
+RELEVANT_SHARE = 0.5
+
+
+def benchmark_queries():
+    return [template.format(keyword) for template in QUERY_TEMPLATES for keyword in HEALTH_KEYWORDS]
+
+
+def document_text(path):
+    if path.endswith('.pdf'):
+        import fitz  # PyMuPDF
+        with fitz.open(path) as doc:
+            return ' '.join(page.get_text() for page in doc)
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def keyword_judgments(paths):
+    """Expected documents for each benchmark query, judged from the documents' own text.
+
+    Every phrasing of a health issue expects the documents that mention it
+    most (see MIN_MENTIONS and RELEVANT_SHARE). The judgments depend only on
+    the corpus, not on chunking or embeddings, so a chunker or index change
+    that retrieves the wrong documents shows up against them.
+    """
+    rates = {}
+    for path in paths:
+        text = document_text(path).lower()
+        words = max(1, len(text.split()))
+        document = document_metadata(path)['document']
+        for keyword in HEALTH_KEYWORDS:
+            mentions = len(re.findall(rf'\b{re.escape(keyword)}\b', text))
+            if mentions >= MIN_MENTIONS:
+                rates.setdefault(keyword, {})[document] = mentions / words
+    judgments = {}
+    for keyword, documents in rates.items():
+        top = max(documents.values())
+        expected = sorted(document for document, rate in documents.items() if rate >= top * RELEVANT_SHARE)
+        for template in QUERY_TEMPLATES:
+            judgments[template.format(keyword)] = expected
+    return judgments
+
+
+def retrieval_quality(db, found, queries, judgments, k):
+    """Mean document recall@k and MRR@k over the judged queries.
+
+    Chunk boundaries differ between builds, so a hit is a chunk from an
+    expected document rather than a particular chunk.
+    """
+    recalls, reciprocal_ranks = [], []
+    for query, positions in zip(queries, found):
+        expected = set(judgments.get(query, ()))
+        if not expected:
+            continue
+        documents = []
+        for position in positions:
+            if position < 0:
+                continue
+            metadata = db.docstore.search(db.index_to_docstore_id[int(position)]).metadata
+            documents.append(metadata.get('document') or document_metadata(metadata.get('source', ''))['document'])
+        recalls.append(len(expected & set(documents)) / len(expected))
+        rank = next((rank for rank, document in enumerate(documents, 1) if document in expected), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    if not recalls:
+        return {}
+    return {f'doc_recall_at_{k}': float(np.mean(recalls)), f'mrr_at_{k}': float(np.mean(reciprocal_ranks)),
+            'judged_queries': len(recalls)}
+
+
+def is_exact(index):
+    """True for flat indexes, whose search already is brute force"""
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def file_sizes(directory, names):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in names
+               if os.path.exists(os.path.join(directory, name)))
+
+
+def percentile_ms(latencies, q):
+    return float(np.percentile(latencies, q) * 1000)
+
+
+def exact_neighbours(index, query_vectors, k):
+    """Top-k positions by brute-force L2 search over the index's own vectors"""
+    exact = faiss.IndexFlatL2(index.d)
+    exact.add(index.reconstruct_n(0, index.ntotal))
+    return exact.search(query_vectors, k)[1]
+
+
+def measure_latency(index, query_vectors, k, repeats):
+    """Single-query search latencies, one query at a time"""
+    latencies = []
+    for _ in range(repeats):
+        for vector in query_vectors:
+            start = time.perf_counter()
+            index.search(vector[None, :], k)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def measure_qps(index, query_vectors, k, concurrency, repeats):
+    """Queries per second with ``concurrency`` threads each issuing single-query searches.
+
+    FAISS releases the GIL while searching, so threads overlap as concurrent
+    requests to a search service would.
+    """
+    work = [vector[None, :] for _ in range(repeats) for vector in query_vectors]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        list(executor.map(lambda vector: index.search(vector, k), work))
+        elapsed = time.perf_counter() - start
+    return len(work) / elapsed
+
+
+def run_benchmark(corpus=None, index_dir=None, backend='hf', model_name=DEFAULT_MODEL, workers=None,
+                  k=5, concurrency=(1, 4, 8), repeats=5, chunker='character', judgments=None):
+    """Benchmark one index, building it from ``corpus`` unless ``index_dir`` already holds one.
+
+    The 'character' chunker reads the corpus's extracted .txt files; the
+    'layout' chunker reads its PDFs. Retrieval quality is scored against
+    ``judgments`` ({query: [expected documents]}), by default judged from
+    the corpus with :func:`keyword_judgments`.
+    """
+    report = {'config': {'k': k, 'repeats': repeats}}
+    with tempfile.TemporaryDirectory() as tmp:
+        if corpus:
+            extension = '.pdf' if chunker == 'layout' else '.txt'
+            paths = sorted(os.path.join(corpus, file) for file in os.listdir(corpus) if file.endswith(extension))
+            docs = chunk_pdfs(paths, model_name) if chunker == 'layout' else load_documents(paths)
+            if judgments is None:
+                judgments = keyword_judgments(paths)
+            index_dir = index_dir or os.path.join(tmp, 'index')
+            timings = {}
+            build_index(docs, index_dir, backend, model_name, workers, timings)
+            report['build_s'] = timings['index_s']
+            report['partitions_build_s'] = timings['partitions_s']
+            report['answers_build_s'] = timings['answers_s']
+            report['config'].update({'corpus': corpus, 'documents': len(paths), 'workers': workers,
+                                     'chunker': chunker})
+        else:
+            backend, model_name = load_backend(index_dir)
+        report['config'].update({'backend': backend, 'model': model_name})
+
+        embeddings = LazyEmbeddings(backend, model_name)
+        db = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+        report['chunks'] = db.index.ntotal
+        # The searched index alone; the partitions and answers table are extras
+        report['index_mb'] = file_sizes(index_dir, INDEX_FILES) / 1e6
+        report['partitions_mb'] = (directory_size(os.path.join(index_dir, 'partitions'))
+                                   + file_sizes(index_dir, ['catalogue.json'])) / 1e6
+        report['answers_mb'] = file_sizes(index_dir, [ANSWERS_FILE]) / 1e6
+
+        queries = benchmark_queries()
+        embeddings.embed_query(queries[0])  # load the model outside the timings
+        embed_latencies = []
+        vectors = []
+        for query in queries:
+            start = time.perf_counter()
+            vectors.append(embeddings.embed_query(query))
+            embed_latencies.append(time.perf_counter() - start)
+        query_vectors = np.asarray(vectors, dtype=np.float32)
+
+    latencies = measure_latency(db.index, query_vectors, k, repeats)
+    found = db.index.search(query_vectors, k)[1]
+    report.update(retrieval_quality(db, found, queries, judgments or {}, k))
+    if not is_exact(db.index):
+        exact = exact_neighbours(db.index, query_vectors, k)
+        report[f'ann_recall_at_{k}'] = float(np.mean([len(set(a) & set(b)) / k for a, b in zip(found, exact)]))
+    report.update({
+        'queries': len(queries),
+        'embed_ms_p50': percentile_ms(embed_latencies, 50),
+        'search_ms_p50': percentile_ms(latencies, 50),
+        'search_ms_p99': percentile_ms(latencies, 99),
+        'qps': {str(threads): measure_qps(db.index, query_vectors, k, threads, repeats) for threads in concurrency},
+    })
+    return report
+
+
+def compare(report, previous):
+    """Rows of ``(metric, previous, current, change)`` for the scalar metrics two runs share"""
+    def flatten(run):
+        values = {key: value for key, value in run.items() if isinstance(value, (int, float))}
+        values.update({f'qps@{threads}': value for threads, value in run.get('qps', {}).items()})
+        return values
+
+    current, before = flatten(report), flatten(previous)
+    rows = []
+    for metric, value in current.items():
+        if metric in before and before[metric]:
+            rows.append((metric, before[metric], value, (value - before[metric]) / before[metric]))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark retrieval speed and quality of the guidelines index")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--corpus', help="Guidelines directory to build an index from: its extracted .txt files, "
+                                          "or its PDFs with --chunker layout")
+    source.add_argument('--index', help="Benchmark an existing index instead of building one")
+    parser.add_argument('--backend', choices=BACKENDS, default='hf')
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--workers', type=int, help="Embedding processes for the build")
+    parser.add_argument('--chunker', choices=('character', 'layout'), default='character',
+                        help="How to chunk the corpus for the build")
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8],
+                        help="Thread counts to measure QPS at")
+    parser.add_argument('--repeats', type=int, default=5, help="Passes over the query set per measurement")
+    parser.add_argument('--judgments', help="JSON {query: [expected documents]} to score retrieval against "
+                                            "(default: judged from the --corpus text)")
+    parser.add_argument('--save-judgments', help="Write the judgments used to this file, to pin them across runs")
+    parser.add_argument('--label', help="Name for this run in the report, e.g. the change being tested")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    parser.add_argument('--compare', help="A previous run's JSON report to compare against")
+    args = parser.parse_args()
+
+    configure_logging(logging.WARNING, log_file=None)
+    judgments = None
+    if args.judgments:
+        with open(args.judgments, encoding='utf-8') as f:
+            judgments = json.load(f)
+    elif args.save_judgments and args.corpus:
+        extension = '.pdf' if args.chunker == 'layout' else '.txt'
+        judgments = keyword_judgments(sorted(os.path.join(args.corpus, file) for file in os.listdir(args.corpus)
+                                             if file.endswith(extension)))
+    if args.save_judgments and judgments is not None:
+        with open(args.save_judgments, 'w', encoding='utf-8') as f:
+            json.dump(judgments, f, indent=2)
+    report = run_benchmark(args.corpus, args.index, args.backend, args.model, args.workers, args.k,
+                           args.concurrency, args.repeats, args.chunker, judgments)
+    report['label'] = args.label
+    report['timestamp'] = datetime.datetime.now().isoformat()
+
+    print(f"Chunks: {report['chunks']}, queries: {report['queries']}, index: {report['index_mb']:.1f} MB")
+    if 'build_s' in report:
+        print(f"Build: {report['build_s']:.2f}s")
+    print(f"Partitions: {report['partitions_mb']:.1f} MB"
+          + (f", built in {report['partitions_build_s']:.2f}s" if 'partitions_build_s' in report else ''))
+    print(f"Answers table: {report['answers_mb']:.2f} MB"
+          + (f", built in {report['answers_build_s']:.2f}s" if 'answers_build_s' in report else ''))
+    print(f"Query embedding p50: {report['embed_ms_p50']:.2f} ms")
+    print(f"Search p50/p99: {report['search_ms_p50']:.3f} / {report['search_ms_p99']:.3f} ms")
+    print("QPS: " + ", ".join(f"{qps:.0f} @ {threads} threads" for threads, qps in report['qps'].items()))
+    if f'doc_recall_at_{args.k}' in report:
+        print(f"Document recall@{args.k}: {report[f'doc_recall_at_{args.k}']:.1%}, "
+              f"MRR@{args.k}: {report[f'mrr_at_{args.k}']:.3f} over {report['judged_queries']} judged queries")
+    else:
+        print("Retrieval quality: no judged queries (pass --judgments or --corpus)")
+    if f'ann_recall_at_{args.k}' in report:
+        print(f"ANN recall@{args.k} against exact search: {report[f'ann_recall_at_{args.k}']:.1%}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"\nAgainst {previous.get('label') or args.compare}:")
+        for metric, before, value, change in compare(report, previous):
+            verdict = ''
+            if change and (metric in LOWER_IS_BETTER or metric.startswith(HIGHER_IS_BETTER)):
+                verdict = ' better' if (change < 0) == (metric in LOWER_IS_BETTER) else ' worse'
+            print(f"  {metric:<16}{before:>12.3f}{value:>12.3f}{change:>+9.1%}{verdict}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
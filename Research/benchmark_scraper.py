@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for MOHScraper
+Times scrape_main_page, each extract_* method and save_data against a page
+archive recorded with `python moh_scraper.py --record ARCHIVE`
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from bs4 import BeautifulSoup
+
+from moh_scraper import MOHScraper
+from page_archive import PageArchive, replay
+from scraper_logging import configure_logging
+
+
+def time_call(func, repeat):
+    """Return the per-run timings of ``func`` in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def new_scraper(archive, base_url=None):
+    scraper = MOHScraper()
+    if base_url:
+        scraper.base_url = base_url
+    replay(scraper, archive)
+    return scraper
+
+
+def run_benchmark(archive, repeat=5, base_url=None):
+    """Benchmark each scraper phase on the archived corpus"""
+    results = {}
+
+    results['scrape_main_page'] = time_call(lambda: new_scraper(archive, base_url).scrape_main_page(), repeat)
+
+    scraper = new_scraper(archive, base_url)
+    scraper.scrape_main_page()
+    routed = {name: [] for name, _ in scraper.PAGE_EXTRACTORS}
+    for link in scraper.discovered_links:
+        for name in scraper.extractors_for_link(link['text']):
+            if link['url'] not in routed[name]:
+                routed[name].append(link['url'])
+
+    # Parse each page once so the extractor timings exclude fetching and parsing
+    soups = {}
+    parse_start = time.perf_counter()
+    for url in {url for urls in routed.values() for url in urls}:
+        entry = archive.get(url)
+        if entry and entry[0] == 200:
+            soups[url] = BeautifulSoup(entry[2], 'html.parser')
+    results['parse_pages'] = [time.perf_counter() - parse_start]
+
+    for name, urls in routed.items():
+        pages = [(soups[url], url) for url in urls if url in soups]
+
+        def run_extractor():
+            extractor = getattr(new_scraper(archive, base_url), name)
+            for soup, url in pages:
+                extractor(soup, url)
+        results[name] = time_call(run_extractor, repeat)
+
+    # Fill a scraper with one full pass of records for save_data
+    for name, urls in routed.items():
+        for url in urls:
+            if url in soups:
+                getattr(scraper, name)(soups[url], url)
+    scraper.analyze_discovered_links()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as out_dir:
+        os.chdir(out_dir)
+        try:
+            results['save_data'] = time_call(scraper.save_data, repeat)
+        finally:
+            os.chdir(cwd)
+
+    return {
+        'pages': len(soups),
+        'records': {category: len(data) for category, data in scraper.scraped_data.items()},
+        'timings': {
+            phase: {
+                'min_s': min(timings),
+                'median_s': statistics.median(timings),
+                'runs': len(timings),
+            }
+            for phase, timings in results.items()
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark MOHScraper on a recorded page archive")
+    parser.add_argument('archive', help="SQLite archive written with moh_scraper.py --record")
+    parser.add_argument('--base-url', help="Site root the archive was recorded from (default: MOH)")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per phase")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    configure_logging(logging.WARNING, log_file=None)
+    report = run_benchmark(PageArchive(args.archive), args.repeat, args.base_url)
+
+    print(f"Pages parsed: {report['pages']}")
+    print(f"{'phase':<28}{'min (ms)':>12}{'median (ms)':>14}")
+    for phase, timing in report['timings'].items():
+        print(f"{phase:<28}{timing['min_s'] * 1000:>12.2f}{timing['median_s'] * 1000:>14.2f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the scrape_embed_guidelines CLI
+Times a fresh interpreter importing what each subcommand needs, against the
+old eager import of every stage, using python -X importtime
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Modules each subcommand imports before doing any work (mirrors the imports inside its stage)
+STAGE_MODULES = {
+    'download': ['requests', 'bs4', 'urllib.parse'],
+    'extract': ['pdf_text'],
+    'embed': ['guideline_index', 'guideline_chunker'],
+    'query (precomputed)': ['guideline_answers'],
+    'query (live)': ['guideline_answers', 'guideline_index'],
+}
+# What every run imported before the subcommand split
+EAGER_MODULES = sorted({module for modules in STAGE_MODULES.values() for module in modules})
+
+
+def time_imports(modules):
+    """Wall time of a fresh interpreter importing the CLI and ``modules``, plus the slowest imports"""
+    code = '; '.join(['import scrape_embed_guidelines'] + [f'import {module}' for module in modules])
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=HERE,
+                            capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+
+    # importtime lines: "import time: self [us] | cumulative | imported package"
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, total, name = line[len('import time:'):].split('|')
+        # Nested imports are indented further and already counted in their parent's total
+        if name.startswith('  '):
+            continue
+        cumulative[name.strip()] = int(total) / 1000
+    slowest = sorted(cumulative.items(), key=lambda item: -item[1])[:5]
+    return wall, slowest
+
+
+def benchmark(runs=5):
+    stages = dict(STAGE_MODULES, **{'eager (all stages)': EAGER_MODULES, 'cli only': []})
+    report = {}
+    for stage, modules in stages.items():
+        walls = []
+        for _ in range(runs):
+            wall, slowest = time_imports(modules)
+            walls.append(wall)
+        report[stage] = {'wall_ms_median': statistics.median(walls) * 1000,
+                         'slowest_imports_ms': dict(slowest)}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time scrape_embed_guidelines startup per subcommand")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per stage")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report = benchmark(args.runs)
+    print(f"{'stage':<22}{'startup (ms)':>14}  slowest imports")
+    for stage, result in report.items():
+        slowest = ', '.join(f"{name} {ms:.0f}" for name, ms in list(result['slowest_imports_ms'].items())[:3])
+        print(f"{stage:<22}{result['wall_ms_median']:>14.0f}  {slowest}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
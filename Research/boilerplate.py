@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Boilerplate detection for scraped sites
+Learns fingerprints of DOM subtrees (headers, menus, footers, sidebars) that
+repeat across many pages of a host and prunes them before extraction
+"""
+
+import hashlib
+import json
+import logging
+import os
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Container elements fingerprinted; inline markup is covered by its container
+BLOCK_TAGS = ['header', 'nav', 'footer', 'aside', 'div', 'section', 'article',
+              'ul', 'ol', 'table', 'form']
+
+
+def fingerprint(element):
+    """Hash of an element's tag and whitespace-normalized text, or None if it has no text"""
+    text = ' '.join(element.stripped_strings)
+    if not text:
+        return None
+    return hashlib.blake2b(f"{element.name}|{text}".encode('utf-8'), digest_size=8).hexdigest()
+
+
+def fingerprint_elements(soup):
+    """``(element, fingerprint)`` for every block element of a page, outermost first"""
+    return [(element, fingerprint(element)) for element in soup.find_all(BLOCK_TAGS)]
+
+
+def page_fingerprints(elements):
+    """Distinct fingerprints among ``fingerprint_elements`` output"""
+    return {fp for _, fp in elements if fp}
+
+
+def prune(elements, boilerplate):
+    """Remove every subtree whose fingerprint is in ``boilerplate``; returns how many.
+
+    ``elements`` comes from :func:`fingerprint_elements`, so each page is
+    fingerprinted once whether it is observed, pruned or both.
+    """
+    if not boilerplate:
+        return 0
+    removed = 0
+    for element, fp in elements:
+        # Descendants of an already removed subtree are still in the list
+        if fp in boilerplate and not element.decomposed:
+            element.decompose()
+            removed += 1
+    return removed
+
+
+class BoilerplateDetector:
+    """Per-host record of the distinct pages each subtree fingerprint appeared on.
+
+    A fingerprint seen on ``min_pages`` or more distinct URLs of a host is
+    treated as shared page chrome. The URLs persist in ``state_path``, so
+    later crawls prune from their first page and revisiting a page never
+    counts it twice.
+    """
+
+    def __init__(self, state_path='boilerplate_state.json', min_pages=3):
+        self.state_path = state_path
+        self.min_pages = min_pages
+        self.pages = {}
+        self.chrome = {}
+        self._load_state()
+
+    def _read_pages(self):
+        if not (self.state_path and os.path.exists(self.state_path)):
+            return {}
+        with open(self.state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        # Older files only kept counts, which can't tell a revisit from a new page; relearn those
+        return {host: {fp: set(urls) for fp, urls in host_pages.items()}
+                for host, host_pages in state.get('pages', {}).items()}
+
+    def _load_state(self):
+        self.pages = self._read_pages()
+        self.chrome = {host: {fp for fp, urls in host_pages.items() if len(urls) >= self.min_pages}
+                       for host, host_pages in self.pages.items()}
+
+    def save_state(self):
+        """Persist the fingerprints seen on more than one page, with the URLs they were seen on.
+
+        The file is re-read first and its URLs kept, so several crawl
+        workers can share it without dropping each other's pages.
+        """
+        if not self.state_path:
+            return
+        pages = self._read_pages()
+        for host, host_pages in self.pages.items():
+            saved = pages.setdefault(host, {})
+            for fp, urls in host_pages.items():
+                saved[fp] = saved.get(fp, set()) | urls
+        pages = {host: {fp: sorted(urls) for fp, urls in host_pages.items() if len(urls) > 1}
+                 for host, host_pages in pages.items()}
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump({'min_pages': self.min_pages, 'pages': pages}, f)
+
+    def observe(self, url, fingerprints):
+        """Count a page's fingerprints once per distinct URL, across runs"""
+        host = urlparse(url).netloc
+        host_pages = self.pages.setdefault(host, {})
+        chrome = self.chrome.setdefault(host, set())
+        for fp in fingerprints:
+            if fp in chrome:
+                continue
+            urls = host_pages.setdefault(fp, set())
+            urls.add(url)
+            if len(urls) >= self.min_pages:
+                chrome.add(fp)
+
+    def boilerplate(self, url):
+        """Fingerprints currently treated as chrome on the URL's host"""
+        return frozenset(self.chrome.get(urlparse(url).netloc, ()))
+
+    def process(self, url, soup):
+        """Observe a parsed page and prune the host's known chrome from it"""
+        elements = fingerprint_elements(soup)
+        self.observe(url, page_fingerprints(elements))
+        removed = prune(elements, self.boilerplate(url))
+        if removed:
+            logger.debug(f"Pruned {removed} boilerplate subtrees from {url}")
+        return removed
@@ -0,0 +1,692 @@
+#!/usr/bin/env python3
+"""
+Shared crawl frontier for distributed MOH scraping
+A coordinator seeds URLs into a SQLite or Redis frontier; any number of worker
+processes or hosts lease them with expiry under per-host rate limits enforced
+across all workers, and the coordinator merges their records into one run
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlparse
+
+from records import as_dict, from_dict
+from scraper_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+Lease = namedtuple('Lease', 'url extractors')
+
+DEFAULT_LEASE_SECONDS = 120
+# Seconds between requests to one host, across all workers, unless robots.txt asks for more
+DEFAULT_HOST_INTERVAL = 0.5
+MAX_HOST_INTERVAL = 30.0
+MAX_ATTEMPTS = 3
+
+
+def host_of(url):
+    return urlparse(url).netloc
+
+
+def slower(interval, min_interval):
+    """Back a host off after a 429, 5xx or failed request"""
+    return min(MAX_HOST_INTERVAL, max(interval, min_interval) * 2)
+
+
+def faster(interval, min_interval):
+    """Creep back towards a host's floor after a healthy response"""
+    return max(min_interval, interval * 0.9)
+
+
+class SQLiteFrontier:
+    """Frontier in a SQLite file, shared by worker processes on one machine.
+
+    Leasing runs in a ``BEGIN IMMEDIATE`` transaction, so two workers never
+    lease the same URL, and a lease reserves its host's next request slot,
+    so the per-host interval holds however many workers there are.
+    """
+
+    def __init__(self, path='crawl_frontier.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                host TEXT NOT NULL,
+                extractors TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                error TEXT,
+                records TEXT
+            );
+            CREATE INDEX IF NOT EXISTS urls_state ON urls (state, host);
+            CREATE TABLE IF NOT EXISTS hosts (
+                host TEXT PRIMARY KEY,
+                min_interval REAL NOT NULL,
+                interval REAL NOT NULL,
+                next_allowed REAL NOT NULL DEFAULT 0
+            );
+        """)
+
+    def reset(self):
+        """Forget the previous run's URLs and results; learned host intervals are kept"""
+        self.conn.execute("DELETE FROM urls")
+
+    def add(self, url, extractors):
+        """Queue a URL unless it is already known; returns whether it was added"""
+        host = host_of(url)
+        self.conn.execute("INSERT OR IGNORE INTO hosts (host, min_interval, interval) VALUES (?, ?, ?)",
+                          (host, DEFAULT_HOST_INTERVAL, DEFAULT_HOST_INTERVAL))
+        cursor = self.conn.execute("INSERT OR IGNORE INTO urls (url, host, extractors) VALUES (?, ?, ?)",
+                                   (url, host, json.dumps(list(extractors))))
+        return cursor.rowcount == 1
+
+    def set_host_interval(self, host, seconds):
+        """Set a host's minimum interval between requests, e.g. its robots.txt Crawl-delay"""
+        self.conn.execute("""
+            INSERT INTO hosts (host, min_interval, interval) VALUES (?, ?, ?)
+            ON CONFLICT (host) DO UPDATE SET min_interval = excluded.min_interval,
+                interval = MAX(interval, excluded.min_interval)
+        """, (host, seconds, seconds))
+
+    def lease(self, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Lease the next URL whose host may be requested now, or return None"""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Leases whose worker died or stalled go back to the queue, unless
+            # the URL has used up its attempts (it may be what kills workers)
+            self.conn.execute("""
+                UPDATE urls SET lease_owner = NULL,
+                    state = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END,
+                    error = CASE WHEN attempts < ? THEN error ELSE 'lease expired' END
+                WHERE state = 'leased' AND lease_expires < ?
+            """, (MAX_ATTEMPTS, MAX_ATTEMPTS, now))
+            row = self.conn.execute("""
+                SELECT urls.url, urls.host, urls.extractors FROM urls JOIN hosts ON urls.host = hosts.host
+                WHERE urls.state = 'pending' AND hosts.next_allowed <= ?
+                ORDER BY hosts.next_allowed, urls.rowid LIMIT 1
+            """, (now,)).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            url, host, extractors = row
+            self.conn.execute("UPDATE urls SET state = 'leased', lease_owner = ?, lease_expires = ?, "
+                              "attempts = attempts + 1 WHERE url = ?", (worker, now + lease_seconds, url))
+            self.conn.execute("UPDATE hosts SET next_allowed = ? + interval WHERE host = ?", (now, host))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return Lease(url, json.loads(extractors))
+
+    def record_response(self, host, congested, retry_after=None):
+        """Adjust a host's shared interval after a response and honour Retry-After"""
+        row = self.conn.execute("SELECT interval, min_interval, next_allowed FROM hosts WHERE host = ?",
+                                (host,)).fetchone()
+        if row is None:
+            return
+        interval, min_interval, next_allowed = row
+        interval = slower(interval, min_interval) if congested else faster(interval, min_interval)
+        if retry_after:
+            next_allowed = max(next_allowed, time.time() + retry_after)
+        self.conn.execute("UPDATE hosts SET interval = ?, next_allowed = ? WHERE host = ?",
+                          (interval, next_allowed, host))
+
+    def complete(self, url, worker, records):
+        """Store a leased URL's records; False if the lease had expired and moved on"""
+        cursor = self.conn.execute("UPDATE urls SET state = 'done', records = ?, lease_owner = NULL "
+                                   "WHERE url = ? AND lease_owner = ? AND state = 'leased'",
+                                   (json.dumps(records, ensure_ascii=False), url, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, url, worker, error, retry=True):
+        """Give a leased URL back for another attempt, or mark it failed"""
+        self.conn.execute("""
+            UPDATE urls SET state = CASE WHEN ? AND attempts < ? THEN 'pending' ELSE 'failed' END,
+                lease_owner = NULL, error = ?
+            WHERE url = ? AND lease_owner = ? AND state = 'leased'
+        """, (retry, MAX_ATTEMPTS, error, url, worker))
+
+    def idle_delay(self):
+        """Seconds until a lease may be available, or None once the frontier is drained"""
+        now = time.time()
+        ready = self.conn.execute("""
+            SELECT MIN(hosts.next_allowed) FROM urls JOIN hosts ON urls.host = hosts.host
+            WHERE urls.state = 'pending'
+        """).fetchone()[0]
+        if ready is not None:
+            return max(0.0, ready - now)
+        expires = self.conn.execute("SELECT MIN(lease_expires) FROM urls WHERE state = 'leased'").fetchone()[0]
+        if expires is not None:
+            return min(1.0, max(0.0, expires - now))
+        return None
+
+    def results(self):
+        """``(url, {category: [record dicts]})`` for every completed URL"""
+        for url, records in self.conn.execute("SELECT url, records FROM urls WHERE state = 'done'"):
+            yield url, json.loads(records)
+
+    def stats(self):
+        counts = dict(self.conn.execute("SELECT state, COUNT(*) FROM urls GROUP BY state"))
+        hosts = dict(self.conn.execute("SELECT host, interval FROM hosts"))
+        return {'urls': counts, 'host_intervals_s': hosts}
+
+    def close(self):
+        self.conn.close()
+
+
+class RedisFrontier:
+    """Frontier in Redis (or any server speaking its protocol), shared by workers on many hosts.
+
+    Each host has a pending list and a rate slot key set with ``NX`` and a
+    millisecond expiry equal to the host's interval; only the worker that
+    sets the slot may pop from that host, which enforces the interval across
+    every node. Leases live in a sorted set by expiry and are reclaimed by
+    whichever worker removes them first.
+    """
+
+    def __init__(self, client, prefix='frontier'):
+        self.redis = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, prefix='frontier'):
+        import redis
+        return cls(redis.Redis.from_url(url, decode_responses=True), prefix)
+
+    def _key(self, *parts):
+        return ':'.join((self.prefix,) + parts)
+
+    def _queue(self, url):
+        host = host_of(url)
+        self.redis.rpush(self._key('queue', host), url)
+        self.redis.zadd(self._key('ready'), {host: 0}, nx=True)
+
+    def reset(self):
+        """Forget the previous run's URLs and results; learned host intervals are kept"""
+        hosts = self.redis.smembers(self._key('hosts'))
+        names = ('urls', 'hosts', 'ready', 'leases', 'owners', 'attempts', 'results', 'done', 'errors', 'failed')
+        self.redis.delete(*[self._key(name) for name in names], *[self._key('queue', host) for host in hosts])
+
+    def add(self, url, extractors):
+        if not self.redis.hsetnx(self._key('urls'), url, json.dumps(list(extractors))):
+            return False
+        self.redis.sadd(self._key('hosts'), host_of(url))
+        self._queue(url)
+        return True
+
+    def set_host_interval(self, host, seconds):
+        self.redis.hset(self._key('min_interval'), host, seconds)
+        interval = float(self.redis.hget(self._key('interval'), host) or 0)
+        self.redis.hset(self._key('interval'), host, max(interval, seconds))
+
+    def _interval(self, host):
+        return float(self.redis.hget(self._key('interval'), host) or DEFAULT_HOST_INTERVAL)
+
+    def _reclaim(self, now):
+        for url in self.redis.zrangebyscore(self._key('leases'), '-inf', now):
+            if self.redis.zrem(self._key('leases'), url):
+                self.redis.hdel(self._key('owners'), url)
+                if int(self.redis.hget(self._key('attempts'), url) or 0) < MAX_ATTEMPTS:
+                    self._queue(url)
+                else:
+                    self.redis.hset(self._key('errors'), url, 'lease expired')
+                    self.redis.sadd(self._key('failed'), url)
+
+    def lease(self, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        now = time.time()
+        self._reclaim(now)
+        for host in self.redis.zrangebyscore(self._key('ready'), '-inf', now, start=0, num=20):
+            interval = self._interval(host)
+            if not self.redis.set(self._key('slot', host), worker, nx=True, px=max(1, int(interval * 1000))):
+                continue
+            url = self.redis.lpop(self._key('queue', host))
+            if url is None:
+                self.redis.zrem(self._key('ready'), host)
+                # An add() may have raced the removal
+                if self.redis.llen(self._key('queue', host)):
+                    self.redis.zadd(self._key('ready'), {host: now})
+                continue
+            self.redis.zadd(self._key('ready'), {host: now + interval}, xx=True)
+            self.redis.zadd(self._key('leases'), {url: now + lease_seconds})
+            self.redis.hset(self._key('owners'), url, worker)
+            self.redis.hincrby(self._key('attempts'), url, 1)
+            return Lease(url, json.loads(self.redis.hget(self._key('urls'), url)))
+        return None
+
+    def record_response(self, host, congested, retry_after=None):
+        min_interval = float(self.redis.hget(self._key('min_interval'), host) or DEFAULT_HOST_INTERVAL)
+        interval = self._interval(host)
+        interval = slower(interval, min_interval) if congested else faster(interval, min_interval)
+        self.redis.hset(self._key('interval'), host, interval)
+        if retry_after:
+            self.redis.set(self._key('slot', host), 'retry-after', px=int(retry_after * 1000))
+
+    def _release(self, url, worker):
+        """Drop a lease this worker still holds; False if it expired and was reclaimed"""
+        if self.redis.hget(self._key('owners'), url) != worker:
+            return False
+        if not self.redis.zrem(self._key('leases'), url):
+            return False
+        self.redis.hdel(self._key('owners'), url)
+        return True
+
+    def complete(self, url, worker, records):
+        if not self._release(url, worker):
+            return False
+        self.redis.hset(self._key('results'), url, json.dumps(records, ensure_ascii=False))
+        self.redis.sadd(self._key('done'), url)
+        return True
+
+    def fail(self, url, worker, error, retry=True):
+        if not self._release(url, worker):
+            return
+        attempts = int(self.redis.hget(self._key('attempts'), url) or 0)
+        if retry and attempts < MAX_ATTEMPTS:
+            self._queue(url)
+        else:
+            self.redis.hset(self._key('errors'), url, error)
+            self.redis.sadd(self._key('failed'), url)
+
+    def idle_delay(self):
+        now = time.time()
+        ready = self.redis.zrangebyscore(self._key('ready'), '-inf', '+inf', start=0, num=1, withscores=True)
+        if ready:
+            return max(0.05, ready[0][1] - now)
+        if self.redis.zcard(self._key('leases')):
+            return 0.5
+        return None
+
+    def results(self):
+        for url, records in self.redis.hgetall(self._key('results')).items():
+            yield url, json.loads(records)
+
+    def stats(self):
+        hosts = self.redis.smembers(self._key('hosts'))
+        return {
+            'urls': {
+                'pending': sum(self.redis.llen(self._key('queue', host)) for host in hosts),
+                'leased': self.redis.zcard(self._key('leases')),
+                'done': self.redis.scard(self._key('done')),
+                'failed': self.redis.scard(self._key('failed')),
+            },
+            'host_intervals_s': {host: self._interval(host) for host in hosts},
+        }
+
+    def close(self):
+        pass
+
+
+class LocalRedis:
+    """In-process stand-in for the Redis commands RedisFrontier uses.
+
+    Thread-safe, so a RedisFrontier can be exercised by worker threads in
+    one process without a server; values are strings as with
+    ``decode_responses=True``.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.lock = threading.RLock()
+
+    def _get(self, key, default):
+        if key in self.expiry and self.expiry[key] <= time.time():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return self.data.setdefault(key, default) if default is not None else self.data.get(key)
+
+    def set(self, key, value, nx=False, px=None):
+        with self.lock:
+            if nx and self._get(key, None) is not None:
+                return None
+            self.data[key] = str(value)
+            self.expiry.pop(key, None)
+            if px:
+                self.expiry[key] = time.time() + px / 1000
+            return True
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+                self.expiry.pop(key, None)
+
+    def hsetnx(self, key, field, value):
+        with self.lock:
+            fields = self._get(key, {})
+            if field in fields:
+                return 0
+            fields[field] = str(value)
+            return 1
+
+    def hset(self, key, field, value):
+        with self.lock:
+            self._get(key, {})[field] = str(value)
+
+    def hget(self, key, field):
+        with self.lock:
+            return self._get(key, {}).get(field)
+
+    def hdel(self, key, field):
+        with self.lock:
+            return int(self._get(key, {}).pop(field, None) is not None)
+
+    def hincrby(self, key, field, amount):
+        with self.lock:
+            fields = self._get(key, {})
+            fields[field] = str(int(fields.get(field, 0)) + amount)
+            return int(fields[field])
+
+    def hgetall(self, key):
+        with self.lock:
+            return dict(self._get(key, {}))
+
+    def rpush(self, key, value):
+        with self.lock:
+            self._get(key, []).append(value)
+
+    def lpop(self, key):
+        with self.lock:
+            items = self._get(key, [])
+            return items.pop(0) if items else None
+
+    def llen(self, key):
+        with self.lock:
+            return len(self._get(key, []))
+
+    def sadd(self, key, value):
+        with self.lock:
+            self._get(key, set()).add(value)
+
+    def scard(self, key):
+        with self.lock:
+            return len(self._get(key, set()))
+
+    def smembers(self, key):
+        with self.lock:
+            return set(self._get(key, set()))
+
+    def zadd(self, key, mapping, nx=False, xx=False):
+        with self.lock:
+            scores = self._get(key, {})
+            for member, score in mapping.items():
+                if (nx and member in scores) or (xx and member not in scores):
+                    continue
+                scores[member] = float(score)
+
+    def zrem(self, key, member):
+        with self.lock:
+            return int(self._get(key, {}).pop(member, None) is not None)
+
+    def zcard(self, key):
+        with self.lock:
+            return len(self._get(key, {}))
+
+    def zrangebyscore(self, key, low, high, start=None, num=None, withscores=False):
+        with self.lock:
+            low, high = float(low), float(high)
+            items = sorted((score, member) for member, score in self._get(key, {}).items() if low <= score <= high)
+            if start is not None:
+                items = items[start:start + num]
+            return [(member, score) if withscores else member for score, member in items]
+
+
+def open_frontier(spec):
+    """A frontier from a ``redis://`` URL or a SQLite file path"""
+    if spec.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisFrontier.from_url(spec)
+    return SQLiteFrontier(spec)
+
+
+class FrontierPacer:
+    """Stands in for a scraper's rate limiter, feeding responses back to the frontier.
+
+    The lease already reserved the host's request slot, so ``wait`` returns
+    at once; ``record`` widens or narrows the host's interval for every
+    worker sharing the frontier.
+    """
+
+    def __init__(self, frontier):
+        self.frontier = frontier
+        self.host = None
+
+    def cap(self, delay):
+        pass
+
+    def wait(self):
+        pass
+
+    def record(self, status, latency, retry_after=None):
+        congested = status is None or status == 429 or status >= 500
+        self.frontier.record_response(self.host, congested, retry_after)
+
+    def stats(self):
+        return {}
+
+
+def take_records(scraper):
+    """Remove and return the scraper's accumulated records as ``{category: [dicts]}``"""
+    records = {}
+    for category, items in scraper.scraped_data.items():
+        if items:
+            records[category] = [as_dict(record) for record in items]
+            items.clear()
+    return records
+
+
+def run_worker(frontier, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS, keep_boilerplate=False,
+               max_pages=None):
+    """Lease, fetch and extract URLs until the frontier is drained; returns pages completed"""
+    from boilerplate import BoilerplateDetector
+    from moh_scraper import MOHScraper, extract_page_records
+
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    scraper = MOHScraper()
+    scraper.rate_limiter = pacer = FrontierPacer(frontier)
+    # Learns chrome from its own pages, starting from what earlier crawls saved
+    boilerplate = None if keep_boilerplate else BoilerplateDetector()
+    completed = 0
+    while max_pages is None or completed < max_pages:
+        lease = frontier.lease(worker_id, lease_seconds)
+        if lease is None:
+            delay = frontier.idle_delay()
+            if delay is None:
+                break
+            time.sleep(min(delay, 1.0))
+            continue
+
+        pacer.host = host_of(lease.url)
+        try:
+            content = scraper.fetch_page(lease.url)
+            if content is not None:
+                fingerprints = boilerplate.boilerplate(lease.url) if boilerplate else frozenset()
+                records, stats = extract_page_records(lease.url, content, lease.extractors, fingerprints)
+                if boilerplate:
+                    boilerplate.observe(lease.url, stats['fingerprints'])
+                for category, items in records.items():
+                    scraper.scraped_data[category].extend(items)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} failed on {lease.url}: {e}")
+            take_records(scraper)
+            frontier.fail(lease.url, worker_id, str(e))
+            continue
+
+        # None with an error status means the fetch failed; otherwise the page was skipped on its headers
+        status = scraper.metrics.last_status(lease.url)
+        if content is None and (status is None or status >= 400):
+            take_records(scraper)
+            retry = status is None or status == 429 or status >= 500
+            frontier.fail(lease.url, worker_id, f"status {status}", retry)
+        elif frontier.complete(lease.url, worker_id, take_records(scraper)):
+            completed += 1
+        else:
+            logger.warning(f"Lease on {lease.url} expired before {worker_id} finished it")
+    if boilerplate:
+        boilerplate.save_state()
+    logger.info(f"Worker {worker_id} finished {completed} pages")
+    return completed
+
+
+def _worker_process(spec, lease_seconds, keep_boilerplate, log_level):
+    configure_logging(log_level, log_file=None)
+    frontier = open_frontier(spec)
+    try:
+        run_worker(frontier, lease_seconds=lease_seconds, keep_boilerplate=keep_boilerplate)
+    finally:
+        frontier.close()
+
+
+def seed_frontier(frontier, scraper, seeds):
+    """Discover each seed site's pages and queue them with the extractors their links route to.
+
+    Returns the seeds' SiteDiscovery objects; their sitemap lastmods are
+    saved once the crawl shows which pages were actually fetched.
+    """
+    added = 0
+    links = []
+    discoveries = []
+    for seed in seeds:
+        scraper.base_url = seed
+        scraper.scrape_main_page()
+        links.extend(scraper.discovered_links)
+        if scraper.discovery:
+            discoveries.append(scraper.discovery)
+        host = host_of(seed)
+        delay = scraper.discovery.crawl_delay if scraper.discovery else None
+        frontier.set_host_interval(host, max(delay or 0, DEFAULT_HOST_INTERVAL))
+
+        # As in run_scraper, the home page itself is also searched for contact details
+        routes = {seed: ['extract_contact_details']}
+        for link in scraper.discovered_links:
+            url = link['url']
+            names = scraper.extractors_for_link(link['text'])
+            if not names or not url.startswith(('http://', 'https://')):
+                continue
+            routes.setdefault(url, [])
+            routes[url].extend(name for name in names if name not in routes[url])
+        for url, names in routes.items():
+            kind = scraper.classify_url(url)
+            if kind:
+                scraper.skip_page(url, kind)
+            elif scraper.discovery and not scraper.discovery.can_fetch(url):
+                logger.info(f"Skipping {url}: disallowed by robots.txt")
+            elif scraper.discovery and scraper.discovery.is_unchanged(url):
+                continue
+            else:
+                added += frontier.add(url, names)
+    scraper.discovered_links = links
+    scraper.analyze_discovered_links()
+    logger.info(f"Queued {added} URLs from {len(seeds)} seed sites")
+    return discoveries
+
+
+def run_coordinator(frontier, seeds, workers=0, spec=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+                    keep_boilerplate=False, export_formats=('json', 'csv'), log_level=logging.INFO, resume=False):
+    """Seed the frontier, optionally start local workers, wait for it to drain and save the merged run.
+
+    Each run starts from an empty frontier, so pages crawled by an earlier
+    run are queued again and only this run's records are merged; with
+    ``resume`` an interrupted run's frontier is continued instead.
+    """
+    from moh_scraper import MOHScraper
+
+    if not resume:
+        frontier.reset()
+    scraper = MOHScraper(export_formats=export_formats)
+    discoveries = seed_frontier(frontier, scraper, seeds)
+
+    processes = []
+    if workers:
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=_worker_process, args=(spec, lease_seconds, keep_boilerplate, log_level))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+
+    last_report = 0.0
+    while frontier.idle_delay() is not None:
+        if processes and not any(process.is_alive() for process in processes):
+            logger.error(f"All local workers exited before the frontier drained: {frontier.stats()['urls']}")
+            break
+        if time.monotonic() - last_report > 10:
+            logger.info(f"Frontier: {frontier.stats()['urls']}")
+            last_report = time.monotonic()
+        time.sleep(1.0)
+    for process in processes:
+        process.join()
+
+    pages = 0
+    for url, records in frontier.results():
+        pages += 1
+        for discovery in discoveries:
+            discovery.mark_fetched(url)
+        for category, items in records.items():
+            for item in items:
+                scraper.add_record(category, from_dict(category, item))
+    stats = frontier.stats()
+    logger.info(f"Merged records from {pages} pages; frontier: {stats['urls']}")
+    for discovery in discoveries:
+        discovery.save_state()
+    scraper.save_data()
+    insights = scraper.generate_ehr_insights()
+    scraper.save_run_report()
+    return insights
+
+
+if __name__ == "__main__":
+    from moh_scraper import MOHScraper
+
+    parser = argparse.ArgumentParser(description="Distributed MOH crawling over a shared frontier")
+    parser.add_argument('--frontier', default='crawl_frontier.db',
+                        help="SQLite file for one machine, or redis://host:port/db for several")
+    parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="How long a worker may hold a URL before it is handed to another")
+    parser.add_argument('--keep-boilerplate', action='store_true',
+                        help="Don't prune headers, menus and footers shared across pages before extraction")
+    parser.add_argument('--log-level', default='INFO')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    coordinator = commands.add_parser('coordinator', help="Seed the frontier, wait for workers, save the results")
+    coordinator.add_argument('--seed', nargs='+', default=["https://www.moh.gov.gh/"],
+                             help="Home pages of the sites to crawl")
+    coordinator.add_argument('--workers', type=int, default=0,
+                             help="Also start this many local worker processes")
+    coordinator.add_argument('--format', nargs='+', default=['json', 'csv'],
+                             choices=MOHScraper.EXPORT_FORMATS, help="Output formats for the scraped data")
+    coordinator.add_argument('--resume', action='store_true',
+                             help="Continue the frontier's unfinished run instead of starting a new one")
+
+    worker = commands.add_parser('worker', help="Process URLs from the frontier until it is drained")
+    worker.add_argument('--processes', type=int, default=1, help="Worker processes to run on this machine")
+    args = parser.parse_args()
+
+    level = args.log_level.upper()
+    if args.command == 'coordinator':
+        configure_logging(level)
+        run_coordinator(open_frontier(args.frontier), args.seed, args.workers, args.frontier, args.lease_seconds,
+                        args.keep_boilerplate, args.format, level, args.resume)
+    elif args.processes > 1:
+        configure_logging(level, log_file=None)
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=_worker_process,
+                                     args=(args.frontier, args.lease_seconds, args.keep_boilerplate, level))
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    else:
+        _worker_process(args.frontier, args.lease_seconds, args.keep_boilerplate, level)
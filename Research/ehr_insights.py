@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Incremental EHR insights for scraped MOH data
+Maintains running aggregates as records arrive and recomputes them in bulk
+from a persisted record store with set-based SQL
+"""
+
+import argparse
+import json
+import logging
+from collections import Counter
+from datetime import datetime
+
+from records import as_dict
+from scraper_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+REGULATORY_KEYWORDS = ['data', 'privacy', 'record', 'ehr', 'electronic', 'information']
+
+HEALTH_KEYWORDS = ['malaria', 'diabetes', 'hypertension', 'maternal', 'child health',
+                   'tuberculosis', 'hiv', 'aids', 'immunization', 'nutrition']
+
+# Checked in order; the first keyword found in a facility name decides its type
+FACILITY_TYPES = [
+    ('hospital', 'hospital'),
+    ('clinic', 'clinic'),
+    ('center', 'health_center'),
+    ('polyclinic', 'polyclinic'),
+]
+
+GENERAL_RECOMMENDATIONS = [
+    "Implement offline-capable design for rural areas with poor connectivity",
+    "Include multilingual support (English, Twi, other local languages)",
+    "Ensure compliance with Ghana's data protection and health information policies",
+    "Design mobile-first interface for healthcare workers using smartphones",
+    "Include Mobile Money integration for billing (popular payment method in Ghana)"
+]
+
+
+def facility_type(name):
+    name = name.lower()
+    for keyword, type_name in FACILITY_TYPES:
+        if keyword in name:
+            return type_name
+    return None
+
+
+class InsightAggregator:
+    """Running aggregates behind ``MOHScraper.generate_ehr_insights``"""
+
+    def __init__(self):
+        self.regulatory_requirements = []
+        self.facility_types = Counter()
+        self.health_issues = Counter()
+        self.common_health_issues = []
+        self.contact_summary = {}
+
+    def update(self, category, record):
+        """Fold one newly extracted typed record (see records.py) into the aggregates"""
+        if category == 'health_policies':
+            title = record.title.lower()
+            if any(keyword in title for keyword in REGULATORY_KEYWORDS):
+                self.regulatory_requirements.append(record)
+
+        elif category == 'healthcare_facilities':
+            type_name = facility_type(record.name)
+            if type_name:
+                self.facility_types[type_name] += 1
+
+        elif category == 'health_programs':
+            title = record.title
+            content = f"{title.lower()} {record.description.lower()}"
+            for keyword in HEALTH_KEYWORDS:
+                if keyword in content:
+                    self.health_issues[keyword] += 1
+                    self.common_health_issues.append({
+                        'issue': keyword,
+                        'program': title,
+                        'context': content[:200]
+                    })
+
+        elif category == 'contact_info':
+            self.contact_summary.setdefault(record.type, []).append(record.value)
+
+    @classmethod
+    def from_store(cls, store):
+        """Recompute the aggregates over everything in a RecordStore.
+
+        Matching and counting run as set-based SQL inside SQLite rather
+        than as per-record Python loops.
+        """
+        aggregator = cls()
+        conn = store.conn
+
+        where = ' OR '.join("instr(lower(title), ?) > 0" for _ in REGULATORY_KEYWORDS)
+        aggregator.regulatory_requirements = [
+            json.loads(data) for (data,) in conn.execute(
+                f"SELECT data FROM health_policies WHERE {where} ORDER BY rowid", REGULATORY_KEYWORDS)
+        ]
+
+        cases = ' '.join(f"WHEN instr(lower(name), '{keyword}') > 0 THEN '{type_name}'"
+                         for keyword, type_name in FACILITY_TYPES)
+        aggregator.facility_types = Counter(dict(conn.execute(
+            f"SELECT CASE {cases} END AS type, COUNT(*) FROM healthcare_facilities "
+            f"GROUP BY type HAVING type IS NOT NULL")))
+
+        content = "lower(title) || ' ' || lower(description)"
+        sums = ', '.join(f"SUM(instr({content}, ?) > 0)" for _ in HEALTH_KEYWORDS)
+        counts = conn.execute(f"SELECT {sums} FROM health_programs", HEALTH_KEYWORDS).fetchone()
+        aggregator.health_issues = Counter({keyword: count for keyword, count in zip(HEALTH_KEYWORDS, counts)
+                                            if count})
+        for keyword in aggregator.health_issues:
+            aggregator.common_health_issues.extend(
+                {'issue': keyword, 'program': title, 'context': context}
+                for title, context in conn.execute(
+                    f"SELECT title, substr({content}, 1, 200) FROM health_programs "
+                    f"WHERE instr({content}, ?) > 0 ORDER BY rowid", (keyword,)))
+
+        for contact_type, value in conn.execute("SELECT type, value FROM contact_info ORDER BY rowid"):
+            aggregator.contact_summary.setdefault(contact_type or 'unknown', []).append(value)
+        return aggregator
+
+    def build(self, discovered_links=(), ehr_relevant_links=()):
+        """Assemble the insights report from the current aggregates"""
+        link_categories = {}
+        for link in discovered_links:
+            link_categories.setdefault(link.get('category', 'other'), []).append(link['text'])
+
+        facility_types = list(self.facility_types)
+        recommendations = []
+        if facility_types:
+            recommendations.append(
+                f"Design EHR to support {len(facility_types)} facility types: "
+                f"{', '.join(facility_types)}"
+            )
+        if self.health_issues:
+            top_issues = [issue for issue, _ in self.health_issues.most_common(5)]
+            recommendations.append(
+                f"Include templates/modules for common health issues: {', '.join(top_issues)}"
+            )
+        if self.contact_summary.get('phone'):
+            recommendations.append("Integrate SMS/phone communication features for patient engagement")
+        if self.contact_summary.get('email'):
+            recommendations.append("Include email notifications and communication features")
+        recommendations.extend(GENERAL_RECOMMENDATIONS)
+
+        return {
+            'regulatory_requirements': [as_dict(record) for record in self.regulatory_requirements],
+            'facility_types': facility_types,
+            'facility_type_counts': dict(self.facility_types),
+            'common_health_issues': self.common_health_issues,
+            'health_issue_counts': dict(self.health_issues),
+            'data_standards': [],
+            'compliance_requirements': [],
+            'discovered_sections': link_categories,
+            'ehr_relevant_links': list(ehr_relevant_links),
+            'contact_summary': self.contact_summary,
+            'contact_type_counts': {contact_type: len(values)
+                                    for contact_type, values in self.contact_summary.items()},
+            'recommendations': recommendations
+        }
+
+
+def save_insights(insights):
+    insights_filename = f"ehr_insights_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(insights_filename, 'w', encoding='utf-8') as f:
+        json.dump(insights, f, indent=2, ensure_ascii=False)
+    logger.info(f"EHR insights saved to {insights_filename}")
+    return insights_filename
+
+
+if __name__ == "__main__":
+    from record_store import RecordStore
+
+    parser = argparse.ArgumentParser(description="Generate EHR insights from a persisted record store")
+    parser.add_argument('store', help="SQLite store written with moh_scraper.py --store")
+    args = parser.parse_args()
+
+    configure_logging(log_file=None)
+    store = RecordStore(args.store)
+    insights = InsightAggregator.from_store(store).build(ehr_relevant_links=store.records('ehr_relevant_links'))
+    save_insights(insights)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Embedding backends for the guidelines indexer
+'hf' runs the sentence-transformers model in PyTorch; 'onnx' exports it once
+to ONNX Runtime with dynamic int8 quantization for faster CPU inference
+"""
+
+import json
+import logging
+import os
+
+from langchain.embeddings.base import Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+BACKENDS = ('hf', 'onnx')
+
+
+def _encoder_module(model, input_names):
+    """Wrap a transformers model so tracing sees plain tensors in and out"""
+    import torch
+
+    class Encoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *tensors):
+            return self.model(**dict(zip(input_names, tensors))).last_hidden_state
+
+    return Encoder()
+
+
+def export_onnx(model_name=DEFAULT_MODEL, out_dir='onnx_models', quantize=True):
+    """Export a transformer encoder to ONNX (and int8) once, returning the model path"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    model_dir = os.path.join(out_dir, model_name.replace('/', '__'))
+    fp32_path = os.path.join(model_dir, 'model.onnx')
+    int8_path = os.path.join(model_dir, 'model.int8.onnx')
+    path = int8_path if quantize else fp32_path
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(model_dir, exist_ok=True)
+    if not os.path.exists(fp32_path):
+        logger.info(f"Exporting {model_name} to {fp32_path}")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+        inputs = tokenizer(["export sample"], return_tensors='pt')
+        names = list(inputs.keys())
+        axes = {name: {0: 'batch', 1: 'sequence'} for name in names}
+        axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+        with torch.no_grad():
+            torch.onnx.export(_encoder_module(model, names), tuple(inputs.values()), fp32_path, input_names=names,
+                              output_names=['last_hidden_state'], dynamic_axes=axes,
+                              opset_version=14, dynamo=False)
+        tokenizer.save_pretrained(model_dir)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        logger.info(f"Quantizing {fp32_path} to int8")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return path
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an ONNX Runtime session.
+
+    Reproduces the sentence-transformers pipeline of MiniLM-style models:
+    mean pooling over the attention mask followed by L2 normalization.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, model_dir='onnx_models', quantize=True,
+                 batch_size=32, max_length=256, threads=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path = export_onnx(model_name, model_dir, quantize)
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.dirname(path))
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    def _embed(self, texts):
+        import numpy as np
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = self.tokenizer(texts[start:start + self.batch_size], padding=True, truncation=True,
+                                   max_length=self.max_length, return_tensors='np')
+            feed = {name: batch[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feed)[0]
+            mask = batch['attention_mask'][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.append(pooled)
+        return np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self._embed([text])[0].tolist()
+
+
+def get_embeddings(backend='hf', model_name=DEFAULT_MODEL, **kwargs):
+    """Build a LangChain embeddings object for a backend name"""
+    if backend == 'hf':
+        from langchain.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name, **kwargs)
+    if backend == 'onnx':
+        return OnnxEmbeddings(model_name, **kwargs)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+class LazyEmbeddings(Embeddings):
+    """Builds its backend on first use.
+
+    Lets indexes be loaded, merged and saved, or routed between, without
+    loading a model that may never embed anything.
+    """
+
+    def __init__(self, backend='hf', model_name=DEFAULT_MODEL, **kwargs):
+        self.backend = backend
+        self.model_name = model_name
+        self.kwargs = kwargs
+        self._embeddings = None
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            self._embeddings = get_embeddings(self.backend, self.model_name, **self.kwargs)
+        return self._embeddings
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+def save_backend(index_dir, backend, model_name=DEFAULT_MODEL):
+    """Record which backend built an index; queries must embed with the same one"""
+    with open(os.path.join(index_dir, 'embeddings.json'), 'w', encoding='utf-8') as f:
+        json.dump({'backend': backend, 'model': model_name}, f)
+
+
+def load_backend(index_dir):
+    """Return ``(backend, model_name)`` an index was built with, defaulting to 'hf'"""
+    path = os.path.join(index_dir, 'embeddings.json')
+    if not os.path.exists(path):
+        return 'hf', DEFAULT_MODEL
+    with open(path, encoding='utf-8') as f:
+        info = json.load(f)
+    return info['backend'], info['model']
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Fuzzy lookup index of scraped healthcare facilities
+Normalizes facility names and answers trigram fuzzy searches (e.g. referral
+text) and prefix autocompletion (e.g. a facility picker) from a saved numpy index
+"""
+
+import argparse
+import csv
+import json
+import logging
+import re
+import time
+import unicodedata
+
+import numpy as np
+
+from ehr_insights import facility_type
+from scraper_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# Spelled-out forms of abbreviations common in Ghanaian facility names and referral notes
+ABBREVIATIONS = {
+    'hosp': 'hospital',
+    'hosps': 'hospitals',
+    'hsp': 'hospital',
+    'clin': 'clinic',
+    'ctr': 'center',
+    'centre': 'center',
+    'hc': 'health center',
+    'govt': 'government',
+    'gov': 'government',
+    'reg': 'regional',
+    'dist': 'district',
+    'mun': 'municipal',
+    'teach': 'teaching',
+    'th': 'teaching hospital',
+    'st': 'saint',
+    'mem': 'memorial',
+    'med': 'medical',
+}
+
+# Names longer than this are headlines or page text the extractor picked up, not facilities
+MAX_NAME_CHARS = 120
+
+
+def name_words(name):
+    """Lowercase ASCII words of a name, punctuation dropped"""
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+    return re.findall(r'[a-z0-9]+', name.replace('&', ' and '))
+
+
+def normalize_name(name):
+    """Lowercase ASCII words with punctuation dropped and abbreviations expanded"""
+    return ' '.join(ABBREVIATIONS.get(word, word) for word in name_words(name))
+
+
+def trigrams(text):
+    """Character trigrams of a normalized name, padded so word starts and ends count"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def load_facilities(path):
+    """Facility dicts from a moh_data_*.json dump, a moh_healthcare_facilities_*.csv or a record store"""
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get('healthcare_facilities', [])
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+    from record_store import RecordStore
+    store = RecordStore(path)
+    try:
+        return list(store.records('healthcare_facilities'))
+    finally:
+        store.close()
+
+
+class FacilityIndex:
+    """Deduplicated facility names with trigram postings and a sorted token list.
+
+    Everything is held in numpy arrays: trigram postings in CSR form
+    (sorted grams, offsets, entry ids), so a fuzzy search is a few
+    ``searchsorted`` calls and one ``bincount`` scoring every facility by
+    the Dice coefficient of its trigrams, and autocompletion bisects the
+    sorted name tokens. Saved as an uncompressed ``.npz``, it loads without
+    rebuilding anything.
+    """
+
+    COLUMNS = ('name', 'normalized', 'type', 'location', 'source_url')
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        for key, value in arrays.items():
+            setattr(self, key, value)
+
+    def __len__(self):
+        return len(self.normalized)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from facility records or dicts, merging names that normalize the same"""
+        entries = {}
+        for record in records:
+            record = record if isinstance(record, dict) else record._asdict()
+            name = ' '.join((record.get('name') or '').split())
+            normalized = normalize_name(name)
+            if not normalized or len(name) > MAX_NAME_CHARS or not re.search('[a-z]{3}', normalized):
+                continue
+            entry = entries.get(normalized)
+            if entry is None:
+                entries[normalized] = {
+                    'name': name,
+                    'normalized': normalized,
+                    'type': facility_type(name) or '',
+                    'location': record.get('location') or '',
+                    'source_url': record.get('source_url') or '',
+                    'mentions': 1,
+                }
+            else:
+                entry['mentions'] += 1
+                entry['location'] = entry['location'] or record.get('location') or ''
+        entries = sorted(entries.values(), key=lambda entry: entry['normalized'])
+
+        postings = {}
+        for number, entry in enumerate(entries):
+            for gram in trigrams(entry['normalized']):
+                postings.setdefault(gram, []).append(number)
+        grams = sorted(postings)
+        tokens = sorted({(word, number) for number, entry in enumerate(entries)
+                         for word in entry['normalized'].split()})
+
+        arrays = {column: np.array([entry[column] for entry in entries], dtype=str) for column in cls.COLUMNS}
+        arrays.update({
+            'mentions': np.array([entry['mentions'] for entry in entries], dtype=np.int32),
+            'sizes': np.array([len(trigrams(entry['normalized'])) for entry in entries], dtype=np.int32),
+            'grams': np.array(grams, dtype=str),
+            'offsets': np.cumsum([0] + [len(postings[gram]) for gram in grams], dtype=np.int64),
+            'postings': np.array([number for gram in grams for number in postings[gram]], dtype=np.int32),
+            'token_words': np.array([word for word, _ in tokens], dtype=str),
+            'token_ids': np.array([number for _, number in tokens], dtype=np.int32),
+        })
+        return cls(arrays)
+
+    def entry(self, number):
+        entry = {column: str(getattr(self, column)[number]) for column in self.COLUMNS}
+        entry['mentions'] = int(self.mentions[number])
+        return entry
+
+    def search(self, query, k=5, min_score=0.3):
+        """``(entry, score)`` for the names most similar to ``query``, best first"""
+        grams = np.array(sorted(trigrams(normalize_name(query))), dtype=str)
+        if not len(grams) or not len(self):
+            return []
+        positions = np.minimum(np.searchsorted(self.grams, grams), len(self.grams) - 1)
+        positions = positions[self.grams[positions] == grams]
+        if not len(positions):
+            return []
+        ids = np.concatenate([self.postings[self.offsets[position]:self.offsets[position + 1]]
+                              for position in positions])
+        scores = 2 * np.bincount(ids, minlength=len(self)) / (len(grams) + self.sizes)
+        candidates = np.flatnonzero(scores >= min_score)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        ranked = sorted(candidates.tolist(), key=lambda number: (-scores[number], number))
+        return [(self.entry(number), float(scores[number])) for number in ranked]
+
+    def _prefix_matches(self, prefix):
+        start = np.searchsorted(self.token_words, prefix)
+        end = np.searchsorted(self.token_words, prefix + '\uffff')
+        return set(self.token_ids[start:end].tolist())
+
+    def complete(self, prefix, k=10):
+        """Facilities whose name has a word starting with each word of ``prefix``.
+
+        "kor bu" finds "Korle Bu Teaching Hospital". The last word may be
+        unfinished, so it matches as typed as well as expanded: "med" finds
+        "Medina Polyclinic" and "... Medical Centre". Names that start with
+        the typed text come first, then more often mentioned and shorter ones.
+        """
+        words = name_words(prefix)
+        if not words or not len(self):
+            return []
+        finished = normalize_name(' '.join(words[:-1])).split()
+        last = words[-1]
+        candidate_sets = [self._prefix_matches(word) for word in finished]
+        typed_last = self._prefix_matches(last)
+        if last in ABBREVIATIONS:
+            expanded = [self._prefix_matches(word) for word in ABBREVIATIONS[last].split()]
+            typed_last |= set.intersection(*expanded)
+        candidate_sets.append(typed_last)
+        matches = None
+        # Rarest prefix first keeps the intersections small
+        for candidates in sorted(candidate_sets, key=len):
+            matches = candidates if matches is None else matches & candidates
+            if not matches:
+                return []
+        # "korle bu th" leads "Korle Bu Teaching Hospital" through its expansion
+        typed = (' '.join(finished + [last]),)
+        if last in ABBREVIATIONS:
+            typed += (' '.join(finished + [ABBREVIATIONS[last]]),)
+        ranked = sorted(matches, key=lambda number: (not self.normalized[number].startswith(typed),
+                                                     -self.mentions[number], len(self.normalized[number])))
+        return [self.entry(number) for number in ranked[:k]]
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, version=INDEX_VERSION, **self.arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['version']) != INDEX_VERSION:
+                raise ValueError(f"{path} is a version {int(data['version'])} facility index; rebuild it")
+            return cls({key: data[key] for key in data.files if key != 'version'})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the facility lookup index")
+    parser.add_argument('--index', default='facility_index.npz')
+    parser.add_argument('--build', nargs='+', metavar='SOURCE',
+                        help="Rebuild from moh_data_*.json dumps, facility CSVs or record store databases")
+    parser.add_argument('--search', help="Fuzzy match a facility name or referral text")
+    parser.add_argument('--complete', help="Autocomplete a typed prefix")
+    parser.add_argument('-k', type=int, default=5)
+    args = parser.parse_args()
+
+    configure_logging(log_file=None)
+    if args.build:
+        records = [record for source in args.build for record in load_facilities(source)]
+        index = FacilityIndex.from_records(records)
+        index.save(args.index)
+        logger.info(f"Indexed {len(index)} facilities from {len(records)} records into {args.index}")
+
+    start = time.perf_counter()
+    index = FacilityIndex.load(args.index)
+    print(f"Loaded {len(index)} facilities in {(time.perf_counter() - start) * 1000:.2f} ms")
+    if args.search:
+        start = time.perf_counter()
+        results = index.search(args.search, args.k)
+        elapsed = time.perf_counter() - start
+        for entry, score in results:
+            print(f"{score:.2f}  {entry['name']}" + (f" ({entry['location']})" if entry['location'] else ''))
+        print(f"{len(results)} matches in {elapsed * 1000:.3f} ms")
+    if args.complete:
+        start = time.perf_counter()
+        results = index.complete(args.complete, args.k)
+        elapsed = time.perf_counter() - start
+        for entry in results:
+            print(f"  {entry['name']}")
+        print(f"{len(results)} completions in {elapsed * 1000:.3f} ms")
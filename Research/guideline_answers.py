@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Precomputed guideline passages for common clinical topics
+After each index build, stores the top-k chunks for every health topic and
+query template so EHR lookups need no embedding or vector search
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import uuid
+
+from ehr_insights import HEALTH_KEYWORDS
+from scraper_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+ANSWERS_FILE = 'answers.json'
+
+# Phrasings the EHR asks about each topic in; '{}' is the bare topic
+QUERY_TEMPLATES = {
+    'overview': "{}",
+    'treatment': "treatment guidelines for {}",
+    'diagnosis': "{} screening and diagnosis",
+    'prevention': "{} prevention",
+}
+
+# Written by each index build; answers stamped with another build's ID are stale
+BUILD_ID_FILE = 'build_id'
+# Files that make up an index; replacing one (e.g. copying in another index) also invalidates its answers
+INDEX_FILES = ('index.faiss', 'index.pkl', 'embeddings.json')
+
+
+def new_build_id(index_dir):
+    """Give a freshly saved index a new build ID"""
+    build_id = uuid.uuid4().hex
+    with open(os.path.join(index_dir, BUILD_ID_FILE), 'w', encoding='utf-8') as f:
+        f.write(build_id)
+    return build_id
+
+
+def index_stamp(index_dir):
+    """Build ID plus the size and modification time of each index file.
+
+    Cheap to check on every lookup: the index itself is never read.
+    """
+    path = os.path.join(index_dir, BUILD_ID_FILE)
+    build_id = None
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            build_id = f.read().strip()
+    files = []
+    for name in INDEX_FILES:
+        path = os.path.join(index_dir, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            files.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return f"{build_id}|{','.join(files)}"
+
+
+def materialize_answers(db, index_dir, k=5, topics=HEALTH_KEYWORDS, templates=QUERY_TEMPLATES):
+    """Search every topic/template pair once and save the results beside the index.
+
+    Call after the index is saved to ``index_dir``; the answers are stamped
+    with its build ID so a rebuilt or replaced index makes them stale.
+    """
+    if not os.path.exists(os.path.join(index_dir, BUILD_ID_FILE)):
+        new_build_id(index_dir)
+    answers = {}
+    for topic in topics:
+        answers[topic] = {}
+        for name, template in templates.items():
+            results = db.similarity_search_with_score(template.format(topic), k)
+            answers[topic][name] = [{'content': doc.page_content, 'metadata': doc.metadata,
+                                     'distance': float(distance)} for doc, distance in results]
+    with open(os.path.join(index_dir, ANSWERS_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'stamp': index_stamp(index_dir), 'k': k, 'templates': templates,
+                   'answers': answers}, f, indent=2)
+    logger.info(f"Precomputed answers for {len(topics)} topics x {len(templates)} templates")
+    return answers
+
+
+class PrecomputedAnswers:
+    """Read-only lookups of materialized guideline passages.
+
+    The answer table is discarded at load time if the index's build stamp no
+    longer matches, in which case every lookup misses and callers should
+    fall back to a live search (or rerun ``materialize_answers``).
+    """
+
+    def __init__(self, index_dir='faiss_guidelines_db'):
+        self.index_dir = index_dir
+        self.answers = {}
+        self.templates = QUERY_TEMPLATES
+        self.stale = False
+        path = os.path.join(index_dir, ANSWERS_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, encoding='utf-8') as f:
+            table = json.load(f)
+        if table.get('stamp') != index_stamp(index_dir):
+            logger.warning(f"Precomputed answers in {index_dir} are stale; the index has changed since")
+            self.stale = True
+            return
+        self.answers = table['answers']
+        self.templates = table.get('templates', QUERY_TEMPLATES)
+
+    def lookup(self, topic, template='overview'):
+        """Precomputed passages for a topic, nearest first, or None on a miss"""
+        return self.answers.get(topic.lower(), {}).get(template)
+
+    def answer(self, query):
+        """Precomputed passages for a query phrased like one of the templates, or None.
+
+        "treatment guidelines for malaria" is served from the 'treatment'
+        answers for malaria; a bare topic from its 'overview'.
+        """
+        query = ' '.join(query.lower().split())
+        # The bare '{}' template matches anything, so it is tried last
+        for name, template in sorted(self.templates.items(), key=lambda item: item[1] == '{}'):
+            pattern = re.escape(template.lower()).replace(re.escape('{}'), '(.+)')
+            match = re.fullmatch(pattern, query)
+            if match:
+                results = self.lookup(match.group(1), name)
+                if results is not None:
+                    return results
+        return None
+
+    def topics(self):
+        return sorted(self.answers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up or rebuild precomputed guideline passages")
+    parser.add_argument('topic', nargs='?', help="Topic to look up; omit to list topics")
+    parser.add_argument('--template', choices=list(QUERY_TEMPLATES), default='overview')
+    parser.add_argument('--index', default='faiss_guidelines_db')
+    parser.add_argument('--rebuild', action='store_true', help="Recompute the answers for the current index")
+    parser.add_argument('-k', type=int, default=5, help="Passages per answer when rebuilding")
+    args = parser.parse_args()
+
+    configure_logging(logging.INFO, log_file=None)
+    if args.rebuild:
+        from langchain.vectorstores import FAISS
+        from embedding_backends import LazyEmbeddings, load_backend
+        db = FAISS.load_local(args.index, LazyEmbeddings(*load_backend(args.index)),
+                              allow_dangerous_deserialization=True)
+        materialize_answers(db, args.index, args.k)
+
+    answers = PrecomputedAnswers(args.index)
+    if not args.topic:
+        print("\n".join(answers.topics()) or "No precomputed answers")
+    else:
+        results = answers.lookup(args.topic, args.template)
+        if results is None:
+            print(f"No precomputed answer for '{args.topic}' ({args.template})")
+        for result in results or []:
+            meta = result['metadata']
+            print(f"[{meta.get('publisher')} {meta.get('year') or '----'}] {meta.get('document')} "
+                  f"({result['distance']:.3f})")
+            print(f"    {' '.join(result['content'].split())[:200]}")
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Layout-aware chunking of guideline PDFs
+Groups PyMuPDF text blocks into sections under their headings and packs them
+into chunks sized to the embedding model's token limit, with page metadata
+"""
+
+import argparse
+import logging
+import os
+import re
+from collections import Counter
+
+import fitz  # PyMuPDF
+from langchain.docstore.document import Document
+
+from embedding_backends import DEFAULT_MODEL
+from guideline_index import document_metadata
+from pdf_text import MIN_TEXT_CHARS, OcrCache, file_hash
+from scraper_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# all-MiniLM-L6-v2 and the ONNX backend truncate inputs to 256 tokens
+MAX_TOKENS = 256
+# Blocks set this much larger than the body text are headings
+HEADING_SCALE = 1.15
+MAX_HEADING_CHARS = 150
+# Running headers and footers are short blocks within this share of the page
+# height from its top or bottom edge
+MARGIN_SHARE = 0.1
+MAX_RUNNING_CHARS = 100
+SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+')
+
+
+def page_blocks(page):
+    """``(text, font size, bold, in margin)`` for each text block on a page, in reading order"""
+    top, bottom = page.rect.y0 + page.rect.height * MARGIN_SHARE, page.rect.y1 - page.rect.height * MARGIN_SHARE
+    blocks = []
+    for block in page.get_text('dict', sort=True)['blocks']:
+        spans = [span for line in block.get('lines', ()) for span in line['spans'] if span['text'].strip()]
+        if not spans:
+            continue
+        text = ' '.join(' '.join(span['text'] for span in line['spans']).strip()
+                        for line in block['lines']).strip()
+        size = max(span['size'] for span in spans)
+        # PyMuPDF flag bit 4 (16) marks bold text
+        bold = all(span['flags'] & 16 for span in spans)
+        _, y0, _, y1 = block['bbox']
+        blocks.append((' '.join(text.split()), round(size, 1), bold, y1 <= top or y0 >= bottom))
+    return blocks
+
+
+def running_key(text, margin):
+    """Page-number-agnostic form of a possible running header or footer, else None.
+
+    Only short blocks in the top or bottom margin qualify, so numbered
+    headings, table captions and templated body text are never dropped.
+    """
+    if not margin or len(text) > MAX_RUNNING_CHARS:
+        return None
+    return re.sub(r'\d+', '#', text)
+
+
+def running_text(pages):
+    """Margin blocks repeated on at least half the pages: running headers, footers, page numbers"""
+    if len(pages) < 4:
+        return set()
+    counts = Counter(key for blocks in pages
+                     for key in {running_key(text, margin) for text, _, _, margin in blocks} - {None})
+    return {key for key, count in counts.items() if count >= len(pages) / 2}
+
+
+class TokenCounter:
+    """Counts tokens with the embedding model's own tokenizer"""
+
+    def __init__(self, model_name=DEFAULT_MODEL):
+        from transformers import AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    def __call__(self, text):
+        return len(self.tokenizer(text, add_special_tokens=False)['input_ids'])
+
+    def split(self, text, max_tokens):
+        """Cut an over-long sentence into windows of ``max_tokens``"""
+        ids = self.tokenizer(text, add_special_tokens=False)['input_ids']
+        return [self.tokenizer.decode(ids[start:start + max_tokens]) for start in range(0, len(ids), max_tokens)]
+
+
+def pdf_sections(path, ocr_cache=None):
+    """Split a PDF into ``(heading, [(paragraph, page number), ...])`` sections.
+
+    Headings are short blocks set larger than the body font, or bold
+    single-line blocks. Pages without a text layer take their paragraphs from
+    the OCR cache when it has them.
+    """
+    with fitz.open(path) as doc:
+        pages = [page_blocks(page) for page in doc]
+    sizes = Counter()
+    for blocks in pages:
+        for text, size, _, _ in blocks:
+            sizes[size] += len(text)
+    body_size = sizes.most_common(1)[0][0] if sizes else 0
+    repeated = running_text(pages)
+
+    digest = None
+    sections = [('', [])]
+    for number, blocks in enumerate(pages):
+        if sum(len(text) for text, _, _, _ in blocks) < MIN_TEXT_CHARS and ocr_cache:
+            digest = digest or file_hash(path)
+            text = ocr_cache.get(digest, number) or ''
+            sections[-1][1].extend((' '.join(paragraph.split()), number + 1)
+                                   for paragraph in re.split(r'\n\s*\n', text) if paragraph.strip())
+            continue
+        for text, size, bold, margin in blocks:
+            if running_key(text, margin) in repeated:
+                continue
+            short = len(text) <= MAX_HEADING_CHARS
+            if short and (size >= body_size * HEADING_SCALE or (bold and size >= body_size)):
+                sections.append((text, []))
+            else:
+                sections[-1][1].append((text, number + 1))
+    return [section for section in sections if section[1]]
+
+
+def pack_section(heading, paragraphs, count_tokens, max_tokens):
+    """Pack a section's paragraphs into ``(text, first page, last page)`` chunks.
+
+    Each chunk starts with the section heading, which is the only text
+    repeated between chunks; paragraphs too long for one chunk are split at
+    sentence ends.
+    """
+    budget = max_tokens - 2 - (count_tokens(heading) if heading else 0)
+    units = []
+    for text, page in paragraphs:
+        tokens = count_tokens(text)
+        if tokens <= budget:
+            units.append((text, page, tokens))
+            continue
+        for sentence in SENTENCE_END.split(text):
+            tokens = count_tokens(sentence)
+            if tokens <= budget:
+                units.append((sentence, page, tokens))
+            else:
+                units.extend((piece, page, count_tokens(piece)) for piece in count_tokens.split(sentence, budget))
+
+    chunks = []
+    current, used = [], 0
+    for text, page, tokens in units:
+        if current and used + tokens > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append((text, page))
+        used += tokens + 1
+    if current:
+        chunks.append(current)
+    prefix = f"{heading}\n" if heading else ''
+    return [(prefix + '\n'.join(text for text, _ in chunk), chunk[0][1], chunk[-1][1]) for chunk in chunks]
+
+
+def chunk_pdf(path, count_tokens, max_tokens=MAX_TOKENS, ocr_cache=None):
+    """LangChain documents for one PDF, one per packed chunk, with section and page metadata.
+
+    Consecutive sections share a chunk while they fit, so short sections
+    don't become vectors of their own.
+    """
+    metadata = document_metadata(path)
+    docs = []
+    pending = None
+    for heading, paragraphs in pdf_sections(path, ocr_cache):
+        for text, first, last in pack_section(heading, paragraphs, count_tokens, max_tokens):
+            if pending and count_tokens(pending[0]) + count_tokens(text) + 3 <= max_tokens:
+                pending = (f"{pending[0]}\n\n{text}", pending[1], last, pending[3])
+                continue
+            if pending:
+                docs.append(pending)
+            pending = (text, first, last, heading)
+    if pending:
+        docs.append(pending)
+    return [Document(page_content=text,
+                     metadata={'source': path, **metadata, 'section': heading,
+                               'page_start': first, 'page_end': last})
+            for text, first, last, heading in docs]
+
+
+def chunk_pdfs(paths, model_name=DEFAULT_MODEL, max_tokens=MAX_TOKENS, ocr_cache_dir=None):
+    """Chunk PDFs for embedding with ``model_name``'s tokenizer"""
+    count_tokens = TokenCounter(model_name)
+    ocr_cache = OcrCache(ocr_cache_dir) if ocr_cache_dir else None
+    docs = []
+    for path in paths:
+        try:
+            chunks = chunk_pdf(path, count_tokens, max_tokens, ocr_cache)
+        except Exception as e:
+            logger.error(f"Error chunking {path}: {e}")
+            continue
+        logger.info(f"{os.path.basename(path)}: {len(chunks)} chunks")
+        docs.extend(chunks)
+    return docs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the layout-aware chunks of guideline PDFs")
+    parser.add_argument('pdfs', nargs='+')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="Model whose tokenizer sets the budget")
+    parser.add_argument('--max-tokens', type=int, default=MAX_TOKENS)
+    parser.add_argument('--ocr-cache', help="OCR cache directory for scanned pages")
+    args = parser.parse_args()
+
+    configure_logging(logging.INFO, log_file=None)
+    for doc in chunk_pdfs(args.pdfs, args.model, args.max_tokens, args.ocr_cache):
+        meta = doc.metadata
+        print(f"--- {meta['document']} pp. {meta['page_start']}-{meta['page_end']} | {meta['section'][:60]}")
+        print(doc.page_content[:300])
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+FAISS index builds and search for the guidelines corpus
+Embeds chunks in parallel shards, merges them into one index and splits it
+into per-source, per-year partitions that filtered searches are routed to
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from langchain.document_loaders import TextLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.vectorstores import FAISS
+
+from embedding_backends import (DEFAULT_MODEL, LazyEmbeddings, get_embeddings, load_backend,
+                                save_backend)
+from guideline_answers import materialize_answers, new_build_id
+from scraper_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Downloaded PDFs are named <publisher>_<original name>.pdf
+PUBLISHERS = ('who', 'moh')
+YEAR_PATTERN = re.compile(r'(?<!\d)(19[89]\d|20\d\d)(?!\d)')
+
+
+# Read by the BLAS/OpenMP runtimes only when they load, i.e. at import time
+THREAD_VARIABLES = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+
+@contextmanager
+def worker_thread_env(threads):
+    """Export thread limits for worker processes spawned inside the block.
+
+    A spawned worker imports numpy and faiss while unpickling its initializer,
+    before that can run, so the limits have to be in the environment it
+    inherits from this process.
+    """
+    variables = THREAD_VARIABLES + ('TOKENIZERS_PARALLELISM',)
+    saved = {variable: os.environ.get(variable) for variable in variables}
+    os.environ.update({variable: str(threads) for variable in THREAD_VARIABLES})
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+    try:
+        yield
+    finally:
+        for variable, value in saved.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+
+def pin_threads(threads):
+    """Limit the runtime-configurable thread pools in this process to ``threads``.
+
+    Run as the worker initializer, before a model is loaded, so shards
+    running side by side don't oversubscribe the cores; the BLAS/OpenMP
+    limits come from ``worker_thread_env``.
+    """
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    import faiss
+    faiss.omp_set_num_threads(threads)
+
+
+def embed_shard(shard_dir, texts, metadatas, backend, model_name, threads):
+    """Embed one shard's chunks and save them as a FAISS index in ``shard_dir``"""
+    kwargs = {'threads': threads} if backend == 'onnx' else {}
+    start = time.perf_counter()
+    db = FAISS.from_texts(texts, get_embeddings(backend, model_name, **kwargs), metadatas)
+    db.save_local(shard_dir)
+    return len(texts), time.perf_counter() - start
+
+
+def build_index(docs, out_dir='faiss_guidelines_db', backend='hf', model_name=DEFAULT_MODEL, workers=None,
+                timings=None):
+    """Embed LangChain documents into a FAISS index saved at ``out_dir``.
+
+    With more than one worker the documents are split into contiguous
+    shards, one per worker process with ``cpu_count // workers`` threads,
+    and the shard indexes are merged in order. A ``timings`` dict gets the
+    seconds spent on the index, the partitions and the answers table.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    workers = min(workers or os.cpu_count() or 1, len(docs)) or 1
+    texts = [doc.page_content for doc in docs]
+    metadatas = [doc.metadata for doc in docs]
+    embeddings = LazyEmbeddings(backend, model_name)
+
+    if workers == 1:
+        db = FAISS.from_texts(texts, embeddings, metadatas)
+    else:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        size = -(-len(texts) // workers)
+        workers = -(-len(texts) // size)
+        logger.info(f"Embedding {len(texts)} chunks in {workers} shards of up to {size} "
+                    f"({threads} threads each)")
+        with tempfile.TemporaryDirectory() as tmp, worker_thread_env(threads), ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=pin_threads, initargs=(threads,)) as executor:
+            shard_dirs = [os.path.join(tmp, f"shard_{number}") for number in range(workers)]
+            futures = [executor.submit(embed_shard, shard_dir, texts[number * size:(number + 1) * size],
+                                       metadatas[number * size:(number + 1) * size], backend, model_name,
+                                       threads)
+                       for number, shard_dir in enumerate(shard_dirs)]
+            for number, future in enumerate(futures):
+                count, seconds = future.result()
+                logger.info(f"Shard {number}: {count} chunks in {seconds:.1f}s")
+
+            db = None
+            for shard_dir in shard_dirs:
+                shard = FAISS.load_local(shard_dir, embeddings, allow_dangerous_deserialization=True)
+                if db is None:
+                    db = shard
+                else:
+                    db.merge_from(shard)
+
+    db.save_local(out_dir)
+    save_backend(out_dir, backend, model_name)
+    new_build_id(out_dir)
+    timings['index_s'] = time.perf_counter() - start
+    start = time.perf_counter()
+    partition_index(db, out_dir)
+    timings['partitions_s'] = time.perf_counter() - start
+    # Common topic lookups are served from this table until the next build
+    start = time.perf_counter()
+    materialize_answers(db, out_dir)
+    timings['answers_s'] = time.perf_counter() - start
+    return db
+
+
+def document_metadata(path):
+    """Publisher, year and document name of an extracted guideline file.
+
+    The year comes from the file name, else from the source PDF's creation
+    date; it is None when neither has one.
+    """
+    name = os.path.basename(path)
+    prefix = name.split('_', 1)[0].lower()
+    document = os.path.splitext(name)[0] + '.pdf'
+    match = YEAR_PATTERN.search(name)
+    year = int(match.group(1)) if match else None
+    pdf_path = os.path.join(os.path.dirname(path), document)
+    if year is None and os.path.exists(pdf_path):
+        import fitz  # PyMuPDF
+        with fitz.open(pdf_path) as pdf:
+            match = YEAR_PATTERN.search((pdf.metadata or {}).get('creationDate') or '')
+        year = int(match.group(1)) if match else None
+    return {
+        'publisher': prefix if prefix in PUBLISHERS else 'other',
+        'year': year,
+        'document': document,
+    }
+
+
+def load_documents(paths, chunk_size=1000, chunk_overlap=200):
+    """Split extracted guideline .txt files into chunks tagged with their document metadata"""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    docs = []
+    for path in paths:
+        chunks = splitter.split_documents(TextLoader(path, encoding='utf-8').load())
+        # Publisher and year route filtered searches to the matching index partitions
+        metadata = document_metadata(path)
+        for chunk in chunks:
+            chunk.metadata.update(metadata)
+        docs.extend(chunks)
+    return docs
+
+
+def partition_name(publisher, year):
+    return f"{publisher}_{year or 'unknown'}"
+
+
+def partition_index(db, out_dir='faiss_guidelines_db'):
+    """Split a built index into one sub-index per publisher and year, plus a catalogue.
+
+    Vectors are copied out of the built index rather than re-embedded.
+    Partitions go under ``<out_dir>/partitions/`` and ``catalogue.json``
+    lists each one's publisher, year, documents and chunk count.
+    """
+    groups = {}
+    for position, doc_id in db.index_to_docstore_id.items():
+        doc = db.docstore.search(doc_id)
+        key = (doc.metadata.get('publisher', 'other'), doc.metadata.get('year'))
+        groups.setdefault(key, []).append((doc, db.index.reconstruct(position)))
+
+    # Drop partitions left by an earlier build of a different corpus
+    shutil.rmtree(os.path.join(out_dir, 'partitions'), ignore_errors=True)
+    catalogue = []
+    for (publisher, year), items in sorted(groups.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+        name = partition_name(publisher, year)
+        partition = FAISS.from_embeddings([(doc.page_content, vector.tolist()) for doc, vector in items],
+                                          db.embeddings, [doc.metadata for doc, _ in items])
+        partition.save_local(os.path.join(out_dir, 'partitions', name))
+        catalogue.append({
+            'name': name,
+            'publisher': publisher,
+            'year': year,
+            'chunks': len(items),
+            'documents': sorted({doc.metadata.get('document') for doc, _ in items} - {None}),
+        })
+    with open(os.path.join(out_dir, 'catalogue.json'), 'w', encoding='utf-8') as f:
+        json.dump({'partitions': catalogue}, f, indent=2)
+    logger.info(f"Wrote {len(catalogue)} partitions to {out_dir}/partitions")
+    return catalogue
+
+
+def matches_filters(entry_publisher, entry_year, publisher=None, year=None, min_year=None, max_year=None):
+    """Whether a partition's or chunk's publisher and year pass the search filters"""
+    if publisher and entry_publisher != publisher:
+        return False
+    if year is not None and entry_year != year:
+        return False
+    if min_year is not None and (entry_year is None or entry_year < min_year):
+        return False
+    if max_year is not None and (entry_year is None or entry_year > max_year):
+        return False
+    return True
+
+
+class GuidelineSearch:
+    """Search over faiss_guidelines_db, routing filtered queries to matching partitions.
+
+    A filtered query only touches the partitions whose publisher and year
+    match, so it gets a full top-k from them without over-fetching from the
+    whole index and post-filtering. Indexes built before partitioning have
+    no catalogue; their filtered queries fall back to post-filtering.
+    """
+
+    def __init__(self, index_dir='faiss_guidelines_db'):
+        self.index_dir = index_dir
+        backend, model_name = load_backend(index_dir)
+        self.embeddings = LazyEmbeddings(backend, model_name)
+        catalogue_path = os.path.join(index_dir, 'catalogue.json')
+        self.catalogue = []
+        if os.path.exists(catalogue_path):
+            with open(catalogue_path, encoding='utf-8') as f:
+                self.catalogue = json.load(f)['partitions']
+        self._indexes = {}
+
+    def _load(self, name):
+        if name not in self._indexes:
+            path = self.index_dir if name is None else os.path.join(self.index_dir, 'partitions', name)
+            self._indexes[name] = FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+        return self._indexes[name]
+
+    def partitions(self, publisher=None, year=None, min_year=None, max_year=None):
+        """Names of the partitions matching the filters"""
+        return [entry['name'] for entry in self.catalogue
+                if matches_filters(entry['publisher'], entry['year'], publisher, year, min_year, max_year)]
+
+    def _post_filtered(self, vector, k, *filters):
+        """Top ``k`` of the whole index that pass the filters, widening the fetch until enough do"""
+        db = self._load(None)
+        metadata = {}
+        fetch = k * 10
+        while True:
+            results = []
+            for doc, distance in db.similarity_search_with_score_by_vector(vector, fetch):
+                meta = doc.metadata
+                if 'publisher' not in meta:
+                    # Chunks from before per-document metadata only carry their source file
+                    source = meta.get('source', '')
+                    meta = metadata.setdefault(source, document_metadata(source))
+                if matches_filters(meta['publisher'], meta['year'], *filters):
+                    results.append((doc, distance))
+            if len(results) >= k or fetch >= db.index.ntotal:
+                return results[:k]
+            fetch *= 4
+
+    def search(self, query, k=4, publisher=None, year=None, min_year=None, max_year=None):
+        """Return up to ``k`` ``(Document, distance)`` pairs, nearest first"""
+        vector = self.embeddings.embed_query(query)
+        if not any(value is not None for value in (publisher, year, min_year, max_year)):
+            return self._load(None).similarity_search_with_score_by_vector(vector, k)
+        if not self.catalogue:
+            logger.warning(f"{self.index_dir} has no catalogue.json; filtering the full index instead")
+            return self._post_filtered(vector, k, publisher, year, min_year, max_year)
+        results = []
+        for name in self.partitions(publisher, year, min_year, max_year):
+            results.extend(self._load(name).similarity_search_with_score_by_vector(vector, k))
+        results.sort(key=lambda result: result[1])
+        return results[:k]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the guidelines index")
+    parser.add_argument('query')
+    parser.add_argument('--index', default='faiss_guidelines_db')
+    parser.add_argument('-k', type=int, default=4)
+    parser.add_argument('--publisher', choices=PUBLISHERS + ('other',))
+    parser.add_argument('--year', type=int)
+    parser.add_argument('--min-year', type=int)
+    parser.add_argument('--max-year', type=int)
+    args = parser.parse_args()
+
+    configure_logging(logging.WARNING, log_file=None)
+    search = GuidelineSearch(args.index)
+    for doc, distance in search.search(args.query, args.k, args.publisher, args.year, args.min_year, args.max_year):
+        meta = doc.metadata
+        print(f"[{meta.get('publisher')} {meta.get('year') or '----'}] {meta.get('document')} ({distance:.3f})")
+        print(f"    {' '.join(doc.page_content.split())[:200]}")
@@ -13,19 +13,61 @@ import logging
 from urllib.parse import urljoin, urlparse
 from datetime import datetime
 import os
+import sys
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+
+from boilerplate import fingerprint_elements, page_fingerprints, prune
+from ehr_insights import InsightAggregator, save_insights
+from rate_limit import AdaptiveRateLimiter, retry_after
+from records import (ContactRecord, DepartmentRecord, FacilityRecord, NewsRecord,
+                     PolicyRecord, ProgramRecord, PublicationRecord, as_dict, pack_records,
+                     unpack_records)
+from scraper_logging import EventSampler, reset_worker_logging
+from scraper_metrics import ScraperMetrics
+from url_discovery import SiteDiscovery, link_text_from_url
+
+logger = logging.getLogger(__name__)
+
+
+def content_length(value):
+    """Parse a Content-Length header, treating a missing or bad value as 0"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('moh_scraper.log'),
-        logging.StreamHandler()
-    ]
-)
 
 class MOHScraper:
-    def __init__(self):
+    # Link-text keywords that route a discovered page to each extractor
+    PAGE_EXTRACTORS = [
+        ('extract_policy_documents', ['policy', 'guideline', 'document', 'publication', 'standard']),
+        ('extract_facility_info', ['hospital', 'clinic', 'facility', 'center', 'health']),
+        ('extract_program_info', ['program', 'initiative', 'service', 'project', 'health']),
+        ('extract_news_info', ['news', 'update', 'announcement', 'press', 'media']),
+        ('extract_contact_details', ['contact', 'about', 'department', 'office']),
+    ]
+    
+    EXPORT_FORMATS = ('json', 'csv', 'parquet', 'arrow')
+    
+    # Links with these extensions are never fetched as pages: documents are
+    # recorded under 'publications' for the document pipeline, the rest skipped
+    DOCUMENT_EXTENSIONS = ('.pdf', '.doc', '.docx')
+    BINARY_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.bmp',
+                         '.zip', '.rar', '.7z', '.gz', '.tar', '.exe', '.apk',
+                         '.mp3', '.mp4', '.avi', '.mov', '.wmv', '.webm',
+                         '.xls', '.xlsx', '.ppt', '.pptx', '.csv')
+    DOCUMENT_TYPES = ('application/pdf', 'application/msword',
+                      'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+    HTML_TYPES = ('text/html', 'application/xhtml+xml')
+    MAX_PAGE_BYTES = 5 * 1024 * 1024
+    
+    # Contact details usually live in the shared footer, so these extractors
+    # see pages before boilerplate is pruned
+    UNPRUNED_EXTRACTORS = ('extract_contact_details',)
+    
+    def __init__(self, metrics=None, export_formats=('json', 'csv'), store=None, use_sitemaps=True,
+                 max_page_bytes=MAX_PAGE_BYTES, boilerplate=None, parse_workers=0, page_archive=None):
         self.base_url = "https://www.moh.gov.gh/"
         self.session = requests.Session()
         self.session.headers.update({
@@ -42,35 +84,194 @@ class MOHScraper:
             'ehr_relevant_links': []
         }
         self.discovered_links = []
+        self.metrics = metrics or ScraperMetrics()
+        self.events = EventSampler(logger)
+        self.export_formats = export_formats
+        self.store = store
+        self.insights = InsightAggregator()
+        self.use_sitemaps = use_sitemaps
+        self.discovery = None
+        # Paces requests to the site; None fetches back to back (e.g. when replaying)
+        self.rate_limiter = AdaptiveRateLimiter()
+        self.max_page_bytes = max_page_bytes
+        self.document_urls = set()
+        # Optional BoilerplateDetector that prunes shared page chrome before extraction
+        self.boilerplate = boilerplate
+        # Parse and extract linked pages in this many worker processes (0 = in-process)
+        self.parse_workers = parse_workers
+        self._parse_pool = None
+        # Optional PageArchive keeping the raw HTML of every parsed page for reextract.py
+        self.page_archive = page_archive
+    
+    def add_record(self, category, record):
+        """Add an extracted record, upserting it into the record store if one is configured"""
+        self.scraped_data[category].append(record)
+        self.insights.update(category, record)
+        if self.store is not None:
+            self.store.upsert(category, record)
     
     def get_page(self, url):
-        """Fetch a web page with error handling"""
+        """Fetch and parse a web page with error handling"""
+        content = self.fetch_page(url)
+        if content is None:
+            return None
+        
+        start = time.perf_counter()
+        soup = BeautifulSoup(content, 'html.parser')
+        self.metrics.record_parse(url, time.perf_counter() - start)
+        return soup
+    
+    def fetch_page(self, url):
+        """Fetch a web page's raw HTML bytes, or None.
+        
+        The response is streamed so its headers are checked before the body
+        is downloaded: documents are routed to 'publications', other non-HTML
+        responses and pages over ``max_page_bytes`` are skipped.
+        """
+        kind = self.classify_url(url)
+        if kind:
+            self.skip_page(url, kind)
+            return None
+        if self.discovery and not self.discovery.can_fetch(url):
+            logger.info(f"Skipping {url}: disallowed by robots.txt")
+            return None
+        if self.rate_limiter:
+            self.rate_limiter.wait()
+        
+        start = time.perf_counter()
+        error_status = None
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            return BeautifulSoup(response.content, 'html.parser')
+            with self.session.get(url, timeout=10, stream=True) as response:
+                if self.rate_limiter:
+                    self.rate_limiter.record(response.status_code, time.perf_counter() - start,
+                                             retry_after(response.headers))
+                if not response.ok:
+                    error_status = response.status_code
+                    self.metrics.record_fetch(url, response.status_code, time.perf_counter() - start, 0)
+                    response.raise_for_status()
+                content_type = response.headers.get('Content-Type', '')
+                size = content_length(response.headers.get('Content-Length'))
+                kind = self.classify_response(content_type, size)
+                content = None
+                if kind == 'html':
+                    content = self.read_body(response.iter_content(64 * 1024))
+                    if content is None:
+                        kind = 'too_large'
+                self.metrics.record_fetch(url, response.status_code, time.perf_counter() - start,
+                                          len(content or b''))
         except requests.RequestException as e:
-            logging.error(f"Error fetching {url}: {e}")
+            # Error statuses were recorded above; timeouts and connection errors are recorded here
+            if error_status is None:
+                self.metrics.record_fetch(url, None, time.perf_counter() - start, 0)
+                if self.rate_limiter:
+                    self.rate_limiter.record(None, time.perf_counter() - start)
+            logger.error(f"Error fetching {url}: {e}")
+            return None
+        if self.discovery:
+            self.discovery.mark_fetched(url)
+        
+        if kind != 'html':
+            self.skip_page(url, kind, content_type, size)
             return None
+        if self.page_archive is not None:
+            self.page_archive.put(url, response.status_code, {'Content-Type': content_type}, content)
+        return content
+    
+    def classify_url(self, url):
+        """Return 'document' or 'binary' for links that needn't be fetched, else None"""
+        path = urlparse(url).path.lower()
+        if path.endswith(self.DOCUMENT_EXTENSIONS):
+            return 'document'
+        if path.endswith(self.BINARY_EXTENSIONS):
+            return 'binary'
+        return None
+    
+    def classify_response(self, content_type, size):
+        """Return 'html', 'document', 'binary' or 'too_large' from a response's headers"""
+        content_type = content_type.split(';')[0].strip().lower()
+        if content_type in self.DOCUMENT_TYPES:
+            return 'document'
+        # Servers that send no Content-Type get the benefit of the doubt
+        if content_type and content_type not in self.HTML_TYPES:
+            return 'binary'
+        if size > self.max_page_bytes:
+            return 'too_large'
+        return 'html'
+    
+    def read_body(self, chunks):
+        """Join a streamed body, or return None once it grows past ``max_page_bytes``"""
+        body = bytearray()
+        for chunk in chunks:
+            body += chunk
+            if len(body) > self.max_page_bytes:
+                return None
+        return bytes(body)
+    
+    def skip_page(self, url, kind, content_type='', size=0):
+        """Record a URL that wasn't parsed, routing documents to 'publications'"""
+        self.metrics.record_skip(url, kind)
+        if kind != 'document':
+            logger.info(f"Skipping {url}: {kind.replace('_', ' ')}")
+            return
+        if url in self.document_urls:
+            return
+        self.document_urls.add(url)
+        self.add_record('publications', PublicationRecord(
+            title=link_text_from_url(url.rsplit('/', 1)[-1]),
+            url=url,
+            content_type=content_type.split(';')[0].strip(),
+            size=size,
+            scraped_at=datetime.now().isoformat()
+        ))
+        if self.store is not None:
+            self.store.commit()
     
     def scrape_main_page(self):
         """Scrape the main page for overview information and discover actual URLs"""
-        logging.info("Scraping main page...")
+        logger.info("Scraping main page...")
         soup = self.get_page(self.base_url)
         if not soup:
             return
         
-        # Store all discovered links for later use
-        self.discovered_links = []
+        if self.boilerplate:
+            self.boilerplate.observe(self.base_url, page_fingerprints(fingerprint_elements(soup)))
         
-        # Extract ALL links from the page
-        all_links = soup.find_all('a', href=True)
-        for link in all_links:
-            href = urljoin(self.base_url, link['href'])
+        # Store all discovered links for later use
+        self.discovered_links = self.collect_links(soup, self.base_url)
+        if self.use_sitemaps:
+            self.discover_sitemap_links()
+    
+    def discover_sitemap_links(self):
+        """Add pages listed in the site's sitemaps and apply its robots.txt Crawl-delay"""
+        self.discovery = SiteDiscovery(self.session, self.base_url)
+        self.discovery.load_robots()
+        if self.discovery.crawl_delay and self.rate_limiter:
+            self.rate_limiter.cap(self.discovery.crawl_delay)
+            logger.info(f"Using robots.txt Crawl-delay of {self.discovery.crawl_delay}s")
+        
+        known = {link['url'] for link in self.discovered_links}
+        for url, lastmod in self.discovery.discover():
+            if url in known:
+                continue
+            known.add(url)
+            # Sitemap entries have no anchor text; route them on their URL slug
+            text = link_text_from_url(url)
+            self.discovered_links.append({
+                'text': text,
+                'url': url,
+                'category': self.categorize_link(text, url),
+                'lastmod': lastmod
+            })
+    
+    def collect_links(self, soup, page_url):
+        """Extract and categorize every link on a page"""
+        links = []
+        for link in soup.find_all('a', href=True):
+            href = urljoin(page_url, link['href'])
             text = link.get_text(strip=True)
             
             # Store all links for analysis
-            self.discovered_links.append({
+            links.append({
                 'text': text,
                 'url': href,
                 'category': self.categorize_link(text, href)
@@ -79,7 +280,9 @@ class MOHScraper:
             # Log relevant health-related links
             if text and any(keyword in text.lower() for keyword in 
                           ['health', 'policy', 'hospital', 'clinic', 'service', 'program', 'department']):
-                logging.info(f"Found relevant link: {text} -> {href}")
+                self.events.event('relevant links', page_url, "Found relevant link: %s -> %s", text, href)
+        self.events.flush(page_url)
+        return links
     
     def categorize_link(self, text, url):
         """Categorize links based on text and URL patterns"""
@@ -101,26 +304,101 @@ class MOHScraper:
     
     def scrape_health_policies(self):
         """Scrape health policies and guidelines using discovered links"""
-        logging.info("Scraping health policies...")
-        
-        # Use discovered links instead of guessing URLs
-        policy_links = [link for link in getattr(self, 'discovered_links', []) 
-                       if link['category'] == 'policy']
-        
-        # Also try some common patterns from the discovered links
-        if hasattr(self, 'discovered_links'):
-            for link in self.discovered_links:
-                url = link['url']
-                text = link['text'].lower()
-                
-                # Visit pages that might contain policy information
-                if any(keyword in text for keyword in ['policy', 'guideline', 'document', 'publication', 'standard']):
-                    soup = self.get_page(url)
-                    if soup:
-                        self.extract_policy_documents(soup, url)
+        logger.info("Scraping health policies...")
+        self.scrape_linked_pages('extract_policy_documents')
+    
+    def extractors_for_link(self, text):
+        """Return the names of the extractors whose keywords match a link's text"""
+        text = text.lower()
+        return [name for name, keywords in self.PAGE_EXTRACTORS
+                if any(keyword in text for keyword in keywords)]
+    
+    def scrape_linked_pages(self, extractor_name):
+        """Visit every discovered link routed to an extractor and run it on the page"""
+        urls = []
+        for link in self.discovered_links:
+            url = link['url']
+            # Menus and footers repeat the same links; visit each page once
+            if url in urls or extractor_name not in self.extractors_for_link(link['text']):
+                continue
+            urls.append(url)
+        if self.discovery:
+            urls = [url for url in urls if not self.discovery.is_unchanged(url)]
+        
+        if self.parse_workers:
+            self.parse_pages_in_pool((url, self.fetch_page(url), [extractor_name]) for url in urls)
+            return
+        for url in urls:
+            soup = self.get_page(url)
+            if soup:
+                if self.boilerplate and extractor_name not in self.UNPRUNED_EXTRACTORS:
+                    self.boilerplate.process(url, soup)
+                self.run_extractor(extractor_name, soup, url)
+    
+    def parse_pages_in_pool(self, pages):
+        """Parse ``(url, content, extractor_names)`` pages in a process pool.
+        
+        ``pages`` is consumed lazily, e.g. as pages are fetched, and records
+        are written back in this process as pages complete. At most
+        ``2 * parse_workers`` pages are in flight, so a backed-up parse stage
+        holds off further fetches instead of buffering every page's bytes.
+        Pages whose content is None are skipped.
+        """
+        if self._parse_pool is None:
+            self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers,
+                                                   initializer=init_parse_worker)
+        pending = {}
+        for url, content, extractor_names in pages:
+            if content is None:
+                continue
+            boilerplate = self.boilerplate.boilerplate(url) if self.boilerplate else frozenset()
+            future = self._parse_pool.submit(extract_page_rows, url, content, extractor_names, boilerplate)
+            pending[future] = url
+            if len(pending) >= 2 * self.parse_workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rows, stats = future.result()
+                    self.merge_page_records(pending.pop(future), unpack_records(rows), stats)
+        for future in as_completed(pending):
+            rows, stats = future.result()
+            self.merge_page_records(pending[future], unpack_records(rows), stats)
+    
+    def merge_page_records(self, url, records, stats):
+        """Fold the output of ``extract_page_records`` for a page into this run"""
+        self.metrics.record_parse(url, stats['parse_s'])
+        self.metrics.merge_extractors(stats['extractors'])
+        self.events.log_counts(url, stats['events'])
+        if self.boilerplate:
+            self.boilerplate.observe(url, stats['fingerprints'])
+        for category, items in records.items():
+            for record in items:
+                self.add_record(category, record)
+        if self.store is not None:
+            self.store.commit()
+    
+    def close(self):
+        """Shut down the parse pool, if one was started"""
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown()
+            self._parse_pool = None
+    
+    def run_extractor(self, extractor_name, soup, source_url):
+        """Run an extractor on a page, recording its time and record count"""
+        before = sum(len(records) for records in self.scraped_data.values())
+        start = time.perf_counter()
+        getattr(self, extractor_name)(soup, source_url)
+        elapsed = time.perf_counter() - start
+        found = sum(len(records) for records in self.scraped_data.values()) - before
+        self.metrics.record_extractor(extractor_name, elapsed, found)
+        if self.store is not None:
+            self.store.commit()
+        return self.events.flush(source_url)
     
     def extract_policy_documents(self, soup, source_url):
         """Extract policy documents from a page"""
+        source_url = sys.intern(source_url)
+        scraped_at = datetime.now().isoformat()
+        
         # Look for downloadable documents (PDFs, DOCs)
         doc_links = soup.find_all('a', href=True)
         for link in doc_links:
@@ -132,13 +410,13 @@ class MOHScraper:
                any(keyword in text.lower() for keyword in ['policy', 'guideline', 'standard', 'protocol', 'document']):
                 
                 doc_url = urljoin(source_url, href)
-                self.scraped_data['health_policies'].append({
-                    'title': text,
-                    'url': doc_url,
-                    'source_page': source_url,
-                    'scraped_at': datetime.now().isoformat()
-                })
-                logging.info(f"Found policy document: {text} -> {doc_url}")
+                self.add_record('health_policies', PolicyRecord(
+                    title=text,
+                    url=doc_url,
+                    source_page=source_url,
+                    scraped_at=scraped_at
+                ))
+                self.events.event('policy documents', source_url, "Found policy document: %s -> %s", text, doc_url)
         
         # Look for policy content directly on the page
         policy_sections = soup.find_all(['div', 'section', 'article'], 
@@ -151,122 +429,98 @@ class MOHScraper:
                 title = title_elem.get_text(strip=True)
                 content = section.get_text(strip=True)[:500]  # First 500 chars
                 
-                self.scraped_data['health_policies'].append({
-                    'title': title,
-                    'content_preview': content,
-                    'url': source_url,
-                    'scraped_at': datetime.now().isoformat()
-                })
+                self.add_record('health_policies', PolicyRecord(
+                    title=title,
+                    content_preview=content,
+                    url=source_url,
+                    scraped_at=scraped_at
+                ))
     
     def scrape_healthcare_facilities(self):
         """Scrape information about healthcare facilities using discovered links"""
-        logging.info("Scraping healthcare facilities...")
-        
-        # Use discovered links for facility information
-        if hasattr(self, 'discovered_links'):
-            for link in self.discovered_links:
-                url = link['url']
-                text = link['text'].lower()
-                
-                # Visit pages that might contain facility information
-                if any(keyword in text for keyword in ['hospital', 'clinic', 'facility', 'center', 'health']):
-                    soup = self.get_page(url)
-                    if soup:
-                        self.extract_facility_info(soup, url)
+        logger.info("Scraping healthcare facilities...")
+        self.scrape_linked_pages('extract_facility_info')
     
     def extract_facility_info(self, soup, source_url):
         """Extract facility information from a page"""
+        source_url = sys.intern(source_url)
+        scraped_at = datetime.now().isoformat()
+        
         # Look for facility listings or information
         facility_sections = soup.find_all(['div', 'section', 'article', 'li'])
         
         for section in facility_sections:
-            facility_info = {
-                'name': '',
-                'location': '',
-                'contact': '',
-                'services': [],
-                'source_url': source_url,
-                'scraped_at': datetime.now().isoformat()
-            }
-            
-            # Extract facility name
+            # Extract facility name; sections without one are skipped
             name_elem = section.find(['h1', 'h2', 'h3', 'h4', 'h5'])
-            if name_elem:
-                name_text = name_elem.get_text(strip=True)
-                # Check if it looks like a facility name
-                if any(keyword in name_text.lower() for keyword in 
-                      ['hospital', 'clinic', 'center', 'polyclinic', 'medical']):
-                    facility_info['name'] = name_text
+            if not name_elem:
+                continue
+            name = name_elem.get_text(strip=True)
+            # Check if it looks like a facility name
+            if not any(keyword in name.lower() for keyword in 
+                       ['hospital', 'clinic', 'center', 'polyclinic', 'medical']):
+                continue
             
             # Extract location information
+            location = ''
             location_patterns = ['region', 'district', 'town', 'city', 'location', 'address']
             for pattern in location_patterns:
                 location_elem = section.find(text=lambda x: x and pattern in x.lower())
                 if location_elem:
-                    facility_info['location'] = location_elem.strip()
+                    location = location_elem.strip()
                     break
             
             # Extract contact information
+            contact = ''
             contact_patterns = ['phone', 'tel', 'email', 'contact']
             for pattern in contact_patterns:
                 contact_elem = section.find(text=lambda x: x and pattern in x.lower())
                 if contact_elem:
-                    facility_info['contact'] = contact_elem.strip()
+                    contact = contact_elem.strip()
                     break
             
             # Extract services
+            services = ()
             services_elem = section.find(text=lambda x: x and 'service' in x.lower())
             if services_elem:
                 # Simple extraction of services mentioned
-                services_text = services_elem.strip()
-                facility_info['services'] = [services_text]
+                services = (services_elem.strip(),)
             
-            # Only add if we found a name
-            if facility_info['name']:
-                self.scraped_data['healthcare_facilities'].append(facility_info)
-                logging.info(f"Found facility: {facility_info['name']}")
+            self.add_record('healthcare_facilities', FacilityRecord(
+                name=name,
+                location=location,
+                contact=contact,
+                services=services,
+                source_url=source_url,
+                scraped_at=scraped_at
+            ))
+            self.events.event('facilities', source_url, "Found facility: %s", name)
     
     def scrape_health_programs(self):
         """Scrape health programs and initiatives using discovered links"""
-        logging.info("Scraping health programs...")
-        
-        # Use discovered links for program information
-        if hasattr(self, 'discovered_links'):
-            for link in self.discovered_links:
-                url = link['url']
-                text = link['text'].lower()
-                
-                # Visit pages that might contain program information
-                if any(keyword in text for keyword in ['program', 'initiative', 'service', 'project', 'health']):
-                    soup = self.get_page(url)
-                    if soup:
-                        self.extract_program_info(soup, url)
+        logger.info("Scraping health programs...")
+        self.scrape_linked_pages('extract_program_info')
     
     def extract_program_info(self, soup, source_url):
         """Extract program information from a page"""
+        source_url = sys.intern(source_url)
+        scraped_at = datetime.now().isoformat()
+        
         # Look for program content
         program_sections = soup.find_all(['div', 'section', 'article'])
         
         for section in program_sections:
-            program_info = {
-                'title': '',
-                'description': '',
-                'target_group': '',
-                'objectives': [],
-                'url': source_url,
-                'scraped_at': datetime.now().isoformat()
-            }
-            
-            # Extract program title
+            # Extract program title; sections without one are skipped
             title_elem = section.find(['h1', 'h2', 'h3', 'h4'])
-            if title_elem:
-                title_text = title_elem.get_text(strip=True)
-                # Check if it looks like a program title
-                if any(keyword in title_text.lower() for keyword in 
-                      ['program', 'initiative', 'project', 'service', 'health', 'care']):
-                    program_info['title'] = title_text
+            if not title_elem:
+                continue
+            title = title_elem.get_text(strip=True)
+            # Check if it looks like a program title
+            if not any(keyword in title.lower() for keyword in 
+                       ['program', 'initiative', 'project', 'service', 'health', 'care']):
+                continue
             
             # Extract description
+            description = ''
             desc_paragraphs = section.find_all('p')
             if desc_paragraphs:
                 descriptions = []
@@ -274,9 +528,10 @@ class MOHScraper:
                     desc_text = p.get_text(strip=True)
                     if desc_text and len(desc_text) > 20:  # Meaningful content
                         descriptions.append(desc_text)
-                program_info['description'] = ' '.join(descriptions)
+                description = ' '.join(descriptions)
             
             # Extract objectives if present
+            objectives = ()
             objectives_elem = section.find(text=lambda x: x and 'objective' in x.lower())
             if objectives_elem:
                 # Look for list items near objectives
@@ -284,90 +539,75 @@ class MOHScraper:
                 if parent:
                     list_items = parent.find_all('li')
                     if list_items:
-                        program_info['objectives'] = [li.get_text(strip=True) for li in list_items]
+                        objectives = tuple(li.get_text(strip=True) for li in list_items)
             
-            # Only add if we found a title
-            if program_info['title']:
-                self.scraped_data['health_programs'].append(program_info)
-                logging.info(f"Found program: {program_info['title']}")
+            self.add_record('health_programs', ProgramRecord(
+                title=title,
+                description=description,
+                objectives=objectives,
+                url=source_url,
+                scraped_at=scraped_at
+            ))
+            self.events.event('programs', source_url, "Found program: %s", title)
     
     def scrape_news_and_updates(self):
         """Scrape news and updates using discovered links"""
-        logging.info("Scraping news and updates...")
-        
-        # Use discovered links for news information
-        if hasattr(self, 'discovered_links'):
-            for link in self.discovered_links:
-                url = link['url']
-                text = link['text'].lower()
-                
-                # Visit pages that might contain news information
-                if any(keyword in text for keyword in ['news', 'update', 'announcement', 'press', 'media']):
-                    soup = self.get_page(url)
-                    if soup:
-                        self.extract_news_info(soup, url)
+        logger.info("Scraping news and updates...")
+        self.scrape_linked_pages('extract_news_info')
     
     def extract_news_info(self, soup, source_url):
         """Extract news information from a page"""
+        source_url = sys.intern(source_url)
+        scraped_at = datetime.now().isoformat()
+        
         # Look for news articles or updates
         news_sections = soup.find_all(['div', 'article', 'section'])
         
         for section in news_sections:
-            news_info = {
-                'title': '',
-                'date': '',
-                'summary': '',
-                'url': source_url,
-                'scraped_at': datetime.now().isoformat()
-            }
-            
-            # Extract news title
+            # Extract news title; only sections with a meaningful one are kept
             title_elem = section.find(['h1', 'h2', 'h3', 'h4'])
-            if title_elem:
-                news_info['title'] = title_elem.get_text(strip=True)
+            if not title_elem:
+                continue
+            title = title_elem.get_text(strip=True)
+            if len(title) <= 10:
+                continue
             
             # Extract date
+            date = ''
             date_elem = section.find(class_=lambda x: x and 'date' in x.lower()) or \
                        section.find(text=lambda x: x and any(month in x.lower() for month in 
                                    ['january', 'february', 'march', 'april', 'may', 'june',
                                     'july', 'august', 'september', 'october', 'november', 'december']))
             if date_elem:
                 if hasattr(date_elem, 'get_text'):
-                    news_info['date'] = date_elem.get_text(strip=True)
+                    date = date_elem.get_text(strip=True)
                 else:
-                    news_info['date'] = str(date_elem).strip()
+                    date = str(date_elem).strip()
             
             # Extract summary
+            summary = ''
             summary_elem = section.find('p')
             if summary_elem:
-                summary_text = summary_elem.get_text(strip=True)
-                news_info['summary'] = summary_text[:300]  # First 300 characters
+                summary = summary_elem.get_text(strip=True)[:300]  # First 300 characters
             
-            # Only add if we found a title
-            if news_info['title'] and len(news_info['title']) > 10:
-                self.scraped_data['news_updates'].append(news_info)
-                logging.info(f"Found news: {news_info['title'][:50]}...")
+            self.add_record('news_updates', NewsRecord(
+                title=title,
+                date=date,
+                summary=summary,
+                url=source_url,
+                scraped_at=scraped_at
+            ))
+            self.events.event('news items', source_url, "Found news: %.50s...", title)
     
     def extract_contact_information(self):
         """Extract contact information and department details using discovered links"""
-        logging.info("Extracting contact information...")
-        
-        # Use discovered links for contact information
-        if hasattr(self, 'discovered_links'):
-            for link in self.discovered_links:
-                url = link['url']
-                text = link['text'].lower()
-                
-                # Visit pages that might contain contact information
-                if any(keyword in text for keyword in ['contact', 'about', 'department', 'office']):
-                    soup = self.get_page(url)
-                    if soup:
-                        self.extract_contact_details(soup, url)
+        logger.info("Extracting contact information...")
+        self.scrape_linked_pages('extract_contact_details')
         
         # Also check the main page for contact info
         main_soup = self.get_page(self.base_url)
         if main_soup:
-            self.extract_contact_details(main_soup, self.base_url)
+            self.run_extractor('extract_contact_details', main_soup, self.base_url)
     
     def extract_contact_details(self, soup, source_url):
         """Extract contact details from a page"""
@@ -381,6 +621,8 @@ class MOHScraper:
         
         import re
         
+        source_url = sys.intern(source_url)
+        scraped_at = datetime.now().isoformat()
         page_text = soup.get_text()
         
         for contact_type, patterns in contact_patterns.items():
@@ -389,13 +631,13 @@ class MOHScraper:
                     # Use regex for phone and email
                     matches = re.findall(pattern, page_text, re.IGNORECASE)
                     for match in matches:
-                        self.scraped_data['contact_info'].append({
-                            'type': contact_type,
-                            'value': match.strip(),
-                            'source_url': source_url,
-                            'scraped_at': datetime.now().isoformat()
-                        })
-                        logging.info(f"Found {contact_type}: {match}")
+                        self.add_record('contact_info', ContactRecord(
+                            type=contact_type,
+                            value=match.strip(),
+                            source_url=source_url,
+                            scraped_at=scraped_at
+                        ))
+                        self.events.event(f"{contact_type} contacts", source_url, "Found %s: %s", contact_type, match)
                 else:
                     # Use text search for address and fax
                     if pattern in page_text.lower():
@@ -403,13 +645,13 @@ class MOHScraper:
                         lines = page_text.split('\n')
                         for line in lines:
                             if pattern in line.lower():
-                                self.scraped_data['contact_info'].append({
-                                    'type': contact_type,
-                                    'value': line.strip(),
-                                    'source_url': source_url,
-                                    'scraped_at': datetime.now().isoformat()
-                                })
-                                logging.info(f"Found {contact_type}: {line.strip()}")
+                                self.add_record('contact_info', ContactRecord(
+                                    type=contact_type,
+                                    value=line.strip(),
+                                    source_url=source_url,
+                                    scraped_at=scraped_at
+                                ))
+                                self.events.event(f"{contact_type} contacts", source_url, "Found %s: %s", contact_type, line.strip())
                                 break
         
         # Look for department information
@@ -417,149 +659,56 @@ class MOHScraper:
         for element in dept_elements:
             dept_text = str(element).strip()
             if len(dept_text) > 10 and len(dept_text) < 200:  # Reasonable length
-                self.scraped_data['departments'].append({
-                    'name': dept_text,
-                    'source_url': source_url,
-                    'scraped_at': datetime.now().isoformat()
-                })
-                logging.info(f"Found department: {dept_text}")
+                self.add_record('departments', DepartmentRecord(
+                    name=dept_text,
+                    source_url=source_url,
+                    scraped_at=scraped_at
+                ))
+                self.events.event('departments', source_url, "Found department: %s", dept_text)
     
     def save_data(self):
-        """Save scraped data to files"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        """Save scraped data to files in each of the configured export formats"""
+        run_time = datetime.now()
+        timestamp = run_time.strftime("%Y%m%d_%H%M%S")
         
         # Save as JSON
-        json_filename = f"moh_data_{timestamp}.json"
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(self.scraped_data, f, indent=2, ensure_ascii=False)
-        logging.info(f"Data saved to {json_filename}")
+        if 'json' in self.export_formats:
+            json_filename = f"moh_data_{timestamp}.json"
+            with open(json_filename, 'w', encoding='utf-8') as f:
+                json.dump({category: [as_dict(record) for record in data]
+                           for category, data in self.scraped_data.items()},
+                          f, indent=2, ensure_ascii=False)
+            logger.info(f"Data saved to {json_filename}")
         
         # Save as CSV for each category
         for category, data in self.scraped_data.items():
-            if data:
+            if data and 'csv' in self.export_formats:
                 csv_filename = f"moh_{category}_{timestamp}.csv"
-                if isinstance(data[0], dict):
-                    fieldnames = data[0].keys()
-                    with open(csv_filename, 'w', newline='', encoding='utf-8') as f:
-                        writer = csv.DictWriter(f, fieldnames=fieldnames)
-                        writer.writeheader()
-                        writer.writerows(data)
-                    logging.info(f"Category '{category}' saved to {csv_filename}")
+                fieldnames = getattr(data[0], '_fields', None) or data[0].keys()
+                with open(csv_filename, 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.DictWriter(f, fieldnames=fieldnames)
+                    writer.writeheader()
+                    writer.writerows(as_dict(record) for record in data)
+                logger.info(f"Category '{category}' saved to {csv_filename}")
+        
+        # Save as Parquet/Arrow datasets partitioned by run date, after the plain
+        # formats so a broken columnar toolchain can't cost the rest of the run
+        for fmt in ('parquet', 'arrow'):
+            if fmt in self.export_formats:
+                try:
+                    from parquet_export import export_columnar
+                    export_columnar(self.scraped_data, fmt=fmt, run_time=run_time)
+                except Exception as e:
+                    logger.error(f"{fmt} export failed: {e}")
     
     def generate_ehr_insights(self):
-        """Generate insights for EHR development based on scraped data"""
-        insights = {
-            'regulatory_requirements': [],
-            'facility_types': set(),
-            'common_health_issues': [],
-            'data_standards': [],
-            'compliance_requirements': [],
-            'discovered_sections': [],
-            'ehr_relevant_links': [],
-            'contact_summary': {},
-            'recommendations': []
-        }
+        """Generate insights for EHR development based on scraped data
         
-        # Analyze policies for regulatory requirements
-        for policy in self.scraped_data['health_policies']:
-            title = policy.get('title', '').lower()
-            if any(keyword in title for keyword in ['data', 'privacy', 'record', 'ehr', 'electronic', 'information']):
-                insights['regulatory_requirements'].append(policy)
-        
-        # Extract facility types
-        for facility in self.scraped_data['healthcare_facilities']:
-            facility_name = facility.get('name', '').lower()
-            if 'hospital' in facility_name:
-                insights['facility_types'].add('hospital')
-            elif 'clinic' in facility_name:
-                insights['facility_types'].add('clinic')
-            elif 'center' in facility_name:
-                insights['facility_types'].add('health_center')
-            elif 'polyclinic' in facility_name:
-                insights['facility_types'].add('polyclinic')
-        
-        # Analyze health programs for common health issues
-        health_keywords = ['malaria', 'diabetes', 'hypertension', 'maternal', 'child health', 
-                          'tuberculosis', 'hiv', 'aids', 'immunization', 'nutrition']
-        
-        for program in self.scraped_data['health_programs']:
-            description = program.get('description', '').lower()
-            title = program.get('title', '').lower()
-            content = f"{title} {description}"
-            
-            for keyword in health_keywords:
-                if keyword in content:
-                    insights['common_health_issues'].append({
-                        'issue': keyword,
-                        'program': program.get('title', ''),
-                        'context': content[:200]
-                    })
-        
-        # Analyze discovered links
-        if hasattr(self, 'discovered_links'):
-            link_categories = {}
-            for link in self.discovered_links:
-                category = link.get('category', 'other')
-                if category not in link_categories:
-                    link_categories[category] = []
-                link_categories[category].append(link['text'])
-            
-            insights['discovered_sections'] = link_categories
-        
-        # Include EHR-relevant links
-        if 'ehr_relevant_links' in self.scraped_data:
-            insights['ehr_relevant_links'] = self.scraped_data['ehr_relevant_links']
-        
-        # Summarize contact information
-        contact_types = {}
-        for contact in self.scraped_data['contact_info']:
-            contact_type = contact.get('type', 'unknown')
-            if contact_type not in contact_types:
-                contact_types[contact_type] = []
-            contact_types[contact_type].append(contact.get('value', ''))
-        
-        insights['contact_summary'] = contact_types
-        
-        # Generate recommendations for EHR development
-        recommendations = []
-        
-        if insights['facility_types']:
-            recommendations.append(
-                f"Design EHR to support {len(insights['facility_types'])} facility types: "
-                f"{', '.join(insights['facility_types'])}"
-            )
-        
-        if insights['common_health_issues']:
-            top_issues = list(set([issue['issue'] for issue in insights['common_health_issues']]))[:5]
-            recommendations.append(
-                f"Include templates/modules for common health issues: {', '.join(top_issues)}"
-            )
-        
-        if contact_types.get('phone'):
-            recommendations.append("Integrate SMS/phone communication features for patient engagement")
-        
-        if contact_types.get('email'):
-            recommendations.append("Include email notifications and communication features")
-        
-        # Add general recommendations
-        recommendations.extend([
-            "Implement offline-capable design for rural areas with poor connectivity",
-            "Include multilingual support (English, Twi, other local languages)",
-            "Ensure compliance with Ghana's data protection and health information policies",
-            "Design mobile-first interface for healthcare workers using smartphones",
-            "Include Mobile Money integration for billing (popular payment method in Ghana)"
-        ])
-        
-        insights['recommendations'] = recommendations
-        
-        # Convert sets to lists for JSON serialization
-        insights['facility_types'] = list(insights['facility_types'])
-        
-        insights_filename = f"ehr_insights_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(insights_filename, 'w', encoding='utf-8') as f:
-            json.dump(insights, f, indent=2, ensure_ascii=False)
-        
-        logging.info(f"EHR insights saved to {insights_filename}")
+        The aggregates are maintained incrementally by add_record, so this
+        only assembles and saves the report.
+        """
+        insights = self.insights.build(self.discovered_links, self.scraped_data['ehr_relevant_links'])
+        save_insights(insights)
         return insights
     
     def analyze_discovered_links(self):
@@ -592,57 +741,177 @@ class MOHScraper:
         
         # Store for insights
         self.scraped_data['ehr_relevant_links'] = relevant_links[:20]  # Top 20
+        if self.store is not None:
+            self.store.upsert_many('ehr_relevant_links', self.scraped_data['ehr_relevant_links'])
         
-        logging.info(f"Found {len(relevant_links)} EHR-relevant links")
+        logger.info(f"Found {len(relevant_links)} EHR-relevant links")
         for link in relevant_links[:5]:  # Log top 5
-            logging.info(f"EHR-relevant: {link['text']} (score: {link['ehr_relevance_score']})")
+            logger.info(f"EHR-relevant: {link['text']} (score: {link['ehr_relevance_score']})")
 
-    def run_scraper(self):
+    def rate_limit_stats(self):
+        """Current and peak request rates per host, for the run report"""
+        if not self.rate_limiter:
+            return {}
+        return {urlparse(self.base_url).netloc: self.rate_limiter.stats()}
+    
+    def save_run_report(self, prometheus=False):
+        """Save the run metrics as JSON and optionally in Prometheus text format"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.metrics.rate_limits = self.rate_limit_stats()
+        self.metrics.save_report(f"scraper_report_{timestamp}.json")
+        if prometheus:
+            self.metrics.save_prometheus(f"scraper_metrics_{timestamp}.prom")
+    
+    def run_scraper(self, prometheus=False):
         """Run the complete scraping process"""
-        logging.info("Starting MOH website scraping...")
+        logger.info("Starting MOH website scraping...")
         
         try:
-            self.scrape_main_page()
-            self.analyze_discovered_links()
-            time.sleep(2)  # Be respectful to the server
+            with self.metrics.phase('scrape_main_page'):
+                self.scrape_main_page()
+                self.analyze_discovered_links()
             
-            self.scrape_health_policies()
-            time.sleep(2)
+            with self.metrics.phase('scrape_health_policies'):
+                self.scrape_health_policies()
             
-            self.scrape_healthcare_facilities()
-            time.sleep(2)
+            with self.metrics.phase('scrape_healthcare_facilities'):
+                self.scrape_healthcare_facilities()
             
-            self.scrape_health_programs()
-            time.sleep(2)
+            with self.metrics.phase('scrape_health_programs'):
+                self.scrape_health_programs()
             
-            self.scrape_news_and_updates()
-            time.sleep(2)
+            with self.metrics.phase('scrape_news_and_updates'):
+                self.scrape_news_and_updates()
             
-            self.extract_contact_information()
+            with self.metrics.phase('extract_contact_information'):
+                self.extract_contact_information()
             
-            self.save_data()
-            insights = self.generate_ehr_insights()
+            with self.metrics.phase('save_data'):
+                self.save_data()
+            with self.metrics.phase('generate_ehr_insights'):
+                insights = self.generate_ehr_insights()
+            self.save_run_report(prometheus)
+            if self.discovery:
+                self.discovery.save_state()
+            if self.boilerplate:
+                self.boilerplate.save_state()
             
             # Print summary
-            logging.info("=== SCRAPING SUMMARY ===")
-            logging.info(f"Health policies found: {len(self.scraped_data['health_policies'])}")
-            logging.info(f"Healthcare facilities found: {len(self.scraped_data['healthcare_facilities'])}")
-            logging.info(f"Health programs found: {len(self.scraped_data['health_programs'])}")
-            logging.info(f"News updates found: {len(self.scraped_data['news_updates'])}")
-            logging.info(f"Contact info entries: {len(self.scraped_data['contact_info'])}")
-            logging.info(f"Departments found: {len(self.scraped_data['departments'])}")
-            logging.info(f"Total discovered links: {len(getattr(self, 'discovered_links', []))}")
+            logger.info("=== SCRAPING SUMMARY ===")
+            logger.info(f"Health policies found: {len(self.scraped_data['health_policies'])}")
+            logger.info(f"Healthcare facilities found: {len(self.scraped_data['healthcare_facilities'])}")
+            logger.info(f"Health programs found: {len(self.scraped_data['health_programs'])}")
+            logger.info(f"News updates found: {len(self.scraped_data['news_updates'])}")
+            logger.info(f"Contact info entries: {len(self.scraped_data['contact_info'])}")
+            logger.info(f"Departments found: {len(self.scraped_data['departments'])}")
+            logger.info(f"Total discovered links: {len(getattr(self, 'discovered_links', []))}")
             
-            logging.info("Scraping completed successfully!")
+            logger.info("Scraping completed successfully!")
             return insights
             
         except Exception as e:
-            logging.error(f"Error during scraping: {e}")
+            logger.error(f"Error during scraping: {e}")
             return None
+        finally:
+            self.close()
+
+# Extraction-only scraper of this process, reused for every page it parses
+_page_scraper = None
+
+
+def page_scraper():
+    """This process's extraction scraper, created on first use"""
+    global _page_scraper
+    if _page_scraper is None:
+        _page_scraper = MOHScraper(use_sitemaps=False)
+        _page_scraper.rate_limiter = None
+    return _page_scraper
+
+
+def init_parse_worker():
+    """Process pool initializer for page parsing: reset logging and create the worker's scraper up front"""
+    reset_worker_logging()
+    page_scraper()
+
+
+def extract_page_records(url, content, extractor_names, boilerplate=frozenset()):
+    """Parse raw page bytes and run the named extractors on them.
+    
+    Module-level so it can be shipped to a process pool; returns the
+    non-empty categories of the records found on the page together with
+    the parse time, per-extractor stats, event counts and the page's
+    subtree fingerprints so the calling process can report, log and learn
+    from them. Subtrees whose fingerprint is in ``boilerplate`` are pruned
+    before all but the ``UNPRUNED_EXTRACTORS`` run.
+    """
+    scraper = page_scraper()
+    # Fresh containers, so only this page's records and stats are returned
+    scraper.scraped_data = {category: [] for category in scraper.scraped_data}
+    scraper.metrics.extractors = {}
+    scraper.insights = InsightAggregator()
+    start = time.perf_counter()
+    soup = BeautifulSoup(content, 'html.parser')
+    elements = fingerprint_elements(soup)
+    parse_time = time.perf_counter() - start
+    events = Counter()
+    unpruned = [name for name in extractor_names if name in MOHScraper.UNPRUNED_EXTRACTORS]
+    for name in unpruned:
+        events.update(scraper.run_extractor(name, soup, url))
+    prune(elements, boilerplate)
+    for name in extractor_names:
+        if name not in unpruned:
+            events.update(scraper.run_extractor(name, soup, url))
+    records = {category: records for category, records in scraper.scraped_data.items() if records}
+    return records, {'parse_s': parse_time, 'extractors': scraper.metrics.extractors, 'events': dict(events),
+                     'fingerprints': page_fingerprints(elements)}
+
+
+def extract_page_rows(url, content, extractor_names, boilerplate=frozenset()):
+    """``extract_page_records`` for a process pool: records come back as
+    ``pack_records`` tuples, which pickle faster than the typed records"""
+    records, stats = extract_page_records(url, content, extractor_names, boilerplate)
+    return pack_records(records), stats
 
 if __name__ == "__main__":
-    scraper = MOHScraper()
-    insights = scraper.run_scraper()
+    import argparse
+    from boilerplate import BoilerplateDetector
+    from page_archive import PageArchive, record, replay
+    from record_store import RecordStore
+    from scraper_logging import configure_logging
+    
+    parser = argparse.ArgumentParser(description="Scrape the Ghana MOH website")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--record', metavar='ARCHIVE', help="Archive every fetched response to this SQLite file")
+    mode.add_argument('--replay', metavar='ARCHIVE', help="Serve every request from this archive instead of the network")
+    parser.add_argument('--keep-pages', metavar='ARCHIVE',
+                        help="Keep the compressed HTML of every parsed page in this archive for reextract.py")
+    parser.add_argument('--format', nargs='+', choices=MOHScraper.EXPORT_FORMATS, default=['json', 'csv'],
+                        help="Output formats for the scraped data")
+    parser.add_argument('--no-sitemaps', action='store_true', help="Only discover pages from the home page links")
+    parser.add_argument('--store', metavar='DB', help="Also upsert every record into this SQLite record store")
+    parser.add_argument('--keep-boilerplate', action='store_true',
+                        help="Don't prune headers, menus and footers shared across pages before extraction")
+    parser.add_argument('--parse-workers', type=int, default=0, metavar='N',
+                        help="Parse and extract pages in N worker processes (default: in-process)")
+    parser.add_argument('--prometheus', action='store_true', help="Also write the run metrics in Prometheus text format")
+    parser.add_argument('--profile', choices=ScraperMetrics.PROFILERS, help="Profile each phase with this profiler")
+    parser.add_argument('--profile-dir', default='profiles', help="Directory for per-phase profiles")
+    parser.add_argument('--log-level', default='INFO', help="Logging level (DEBUG shows sampled per-record events)")
+    parser.add_argument('--log-file', default='moh_scraper.log', help="Log file path")
+    parser.add_argument('--log-json', action='store_true', help="Write structured JSON log events")
+    args = parser.parse_args()
+    
+    configure_logging(args.log_level.upper(), args.log_file, args.log_json)
+    scraper = MOHScraper(metrics=ScraperMetrics(args.profile, args.profile_dir), export_formats=args.format,
+                         store=RecordStore(args.store) if args.store else None, use_sitemaps=not args.no_sitemaps,
+                         boilerplate=None if args.keep_boilerplate else BoilerplateDetector(),
+                         parse_workers=args.parse_workers,
+                         page_archive=PageArchive(args.keep_pages) if args.keep_pages else None)
+    if args.record:
+        record(scraper, PageArchive(args.record))
+    elif args.replay:
+        replay(scraper, PageArchive(args.replay))
+    insights = scraper.run_scraper(prometheus=args.prometheus)
     
     if insights:
         print("\n=== EHR Development Insights ===")
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Record/replay archive for scraper HTTP traffic
+Stores fetched responses compressed in a SQLite blob store so MOHScraper can
+be re-run offline, either through a replay transport or a local HTTP stand-in
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from scraper_logging import configure_logging
+
+try:
+    import zstandard
+except ImportError:  # optional: bodies fall back to zlib
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Content types whose bodies are archived even when the response is streamed
+ARCHIVED_TYPES = ('text/', 'application/xhtml', 'application/xml', 'application/json')
+# Header marking a page archived without its body because it was over the size limit
+TRUNCATED_HEADER = 'X-Archive-Truncated'
+
+
+def compress(body, level=9):
+    """Return ``(encoding, blob)`` for a body, using zstd when it is installed"""
+    if not body:
+        return 'identity', body
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=level).compress(body)
+    return 'zlib', zlib.compress(body, level)
+
+
+def decompress(encoding, blob):
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("This archive is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    if encoding == 'zlib':
+        return zlib.decompress(blob)
+    return blob
+
+
+class PageArchive:
+    """SQLite blob store of fetched responses keyed on URL.
+
+    Bodies are stored compressed, tagged with their ``encoding``; archives
+    written before compression was added read back as ``identity``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                fetched_at REAL NOT NULL,
+                encoding TEXT NOT NULL DEFAULT 'identity'
+            )
+        """)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(pages)")]
+        if 'encoding' not in columns:
+            self.conn.execute("ALTER TABLE pages ADD COLUMN encoding TEXT NOT NULL DEFAULT 'identity'")
+        self.conn.commit()
+
+    def put(self, url, status, headers, body):
+        encoding, blob = compress(body)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (url, status, headers, body, fetched_at, encoding) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, status, json.dumps(dict(headers)), blob, time.time(), encoding))
+
+    def get(self, url):
+        """Return ``(status, headers, body)`` for an archived URL, or None"""
+        row = self.conn.execute(
+            "SELECT status, headers, encoding, body FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), decompress(row[2], row[3])
+
+    def html_pages(self):
+        """Yield ``(url, body)`` for every successfully fetched HTML page"""
+        rows = self.conn.execute(
+            "SELECT url, headers, encoding, body FROM pages WHERE status BETWEEN 200 AND 299 ORDER BY url")
+        for url, headers, encoding, blob in rows:
+            headers = CaseInsensitiveDict(json.loads(headers))
+            content_type = headers.get('Content-Type', 'text/html')
+            if content_type.startswith(('text/html', 'application/xhtml')) and TRUNCATED_HEADER not in headers:
+                yield url, decompress(encoding, blob)
+
+    def find_path(self, path):
+        """Return the first archived URL whose path and query match ``path``"""
+        for (url,) in self.conn.execute("SELECT url FROM pages ORDER BY url"):
+            parsed = urlparse(url)
+            if (parsed.path or '/') + (f"?{parsed.query}" if parsed.query else '') == path:
+                return url
+        return None
+
+    def urls(self):
+        return [row[0] for row in self.conn.execute("SELECT url FROM pages ORDER BY url")]
+
+    def close(self):
+        self.conn.close()
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport adapter that fetches from the network and archives each response.
+
+    Streamed bodies are read up to ``max_bytes``; a larger page is archived
+    by its headers only, marked with ``TRUNCATED_HEADER`` and a Content-Length
+    of at least the bytes read, and handed on truncated, so the scraper sees
+    it as too large both live and on replay.
+    """
+
+    def __init__(self, archive, max_bytes=None, **kwargs):
+        super().__init__(**kwargs)
+        self.archive = archive
+        self.max_bytes = max_bytes
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        content_type = response.headers.get('Content-Type', '')
+        if kwargs.get('stream') and content_type and not content_type.startswith(ARCHIVED_TYPES):
+            # A streamed document or binary asset that the scraper only checks
+            # the headers of: archive the headers and leave the body unread
+            self.archive.put(request.url, response.status_code, dict(response.headers), b'')
+            return response
+        if kwargs.get('stream') and self.max_bytes:
+            body = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                body += chunk
+                if len(body) > self.max_bytes:
+                    break
+            response._content = bytes(body)
+            response._content_consumed = True
+            if len(body) > self.max_bytes:
+                headers = CaseInsensitiveDict({name: value for name, value in response.headers.items()
+                                               if name.lower() not in ('content-encoding', 'transfer-encoding')})
+                headers.setdefault('Content-Length', str(len(body)))
+                headers[TRUNCATED_HEADER] = '1'
+                self.archive.put(request.url, response.status_code, dict(headers), b'')
+                response.close()
+                return response
+        # The body is stored decoded, so drop the wire encoding headers
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in ('content-encoding', 'transfer-encoding', 'content-length')}
+        headers['Content-Length'] = str(len(response.content))
+        self.archive.put(request.url, response.status_code, headers, response.content)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter that serves responses from the archive only"""
+
+    def __init__(self, archive):
+        super().__init__()
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        response = Response()
+        response.url = request.url
+        response.request = request
+        entry = self.archive.get(request.url)
+        if entry is None:
+            logger.warning(f"Not in archive: {request.url}")
+            response.status_code = 404
+            response.reason = 'Not Archived'
+            response._content = b''
+            response._content_consumed = True
+            return response
+        status, headers, body = entry
+        response.status_code = status
+        # A page truncated on record keeps its oversized Content-Length, so the
+        # scraper skips it as too large again instead of parsing an empty body
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = body
+        # Lets streamed reads (iter_content) and close() work without a raw socket
+        response._content_consumed = True
+        return response
+
+    def close(self):
+        pass
+
+
+def record(scraper, archive):
+    """Archive every response the scraper's session fetches"""
+    adapter = RecordingAdapter(archive, max_bytes=scraper.max_page_bytes)
+    scraper.session.mount('http://', adapter)
+    scraper.session.mount('https://', adapter)
+
+
+def replay(scraper, archive):
+    """Serve every request the scraper's session makes from the archive"""
+    adapter = ReplayAdapter(archive)
+    scraper.session.mount('http://', adapter)
+    scraper.session.mount('https://', adapter)
+    # There is no server to protect, so replayed requests aren't paced
+    scraper.rate_limiter = None
+
+
+def serve_archive(archive, port=8000):
+    """Serve archived pages by path over HTTP as a local stand-in for the site"""
+
+    class ArchiveHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = archive.find_path(self.path)
+            entry = archive.get(url) if url else None
+            if entry is None:
+                self.send_error(404, 'Not Archived')
+                return
+            status, headers, body = entry
+            self.send_response(status)
+            self.send_header('Content-Type', headers.get('Content-Type', 'text/html'))
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), ArchiveHandler)
+    logger.info(f"Serving {archive.path} on http://127.0.0.1:{port}/")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a recorded page archive over HTTP")
+    parser.add_argument('archive', help="SQLite archive written with --record")
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    configure_logging(log_file=None)
+    serve_archive(PageArchive(args.archive), args.port).serve_forever()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Columnar export of scraped MOH data
+Writes each category to Parquet (or Arrow IPC) with a fixed schema,
+list-typed columns and compression, partitioned by run date
+"""
+
+import logging
+import os
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from records import as_dict
+
+logger = logging.getLogger(__name__)
+
+# Repeated values such as page URLs are dictionary-encoded
+_url = pa.dictionary(pa.int32(), pa.string())
+_timestamp = pa.timestamp('us')
+
+SCHEMAS = {
+    'health_policies': pa.schema([
+        ('title', pa.string()),
+        ('url', _url),
+        ('source_page', _url),
+        ('content_preview', pa.string()),
+        ('scraped_at', _timestamp),
+    ]),
+    'healthcare_facilities': pa.schema([
+        ('name', pa.string()),
+        ('location', pa.string()),
+        ('contact', pa.string()),
+        ('services', pa.list_(pa.string())),
+        ('source_url', _url),
+        ('scraped_at', _timestamp),
+    ]),
+    'health_programs': pa.schema([
+        ('title', pa.string()),
+        ('description', pa.string()),
+        ('target_group', pa.string()),
+        ('objectives', pa.list_(pa.string())),
+        ('url', _url),
+        ('scraped_at', _timestamp),
+    ]),
+    'publications': pa.schema([
+        ('title', pa.string()),
+        ('url', pa.string()),
+        ('content_type', pa.dictionary(pa.int8(), pa.string())),
+        ('size', pa.int64()),
+        ('scraped_at', _timestamp),
+    ]),
+    'news_updates': pa.schema([
+        ('title', pa.string()),
+        ('date', pa.string()),
+        ('summary', pa.string()),
+        ('url', _url),
+        ('scraped_at', _timestamp),
+    ]),
+    'contact_info': pa.schema([
+        ('type', pa.dictionary(pa.int8(), pa.string())),
+        ('value', pa.string()),
+        ('source_url', _url),
+        ('scraped_at', _timestamp),
+    ]),
+    'departments': pa.schema([
+        ('name', pa.string()),
+        ('source_url', _url),
+        ('scraped_at', _timestamp),
+    ]),
+    'ehr_relevant_links': pa.schema([
+        ('text', pa.string()),
+        ('url', pa.string()),
+        ('category', pa.dictionary(pa.int8(), pa.string())),
+        ('ehr_relevance_score', pa.int32()),
+    ]),
+}
+
+
+def to_table(category, records):
+    """Build an Arrow table for a category's records using its schema"""
+    schema = SCHEMAS[category]
+    rows = []
+    for record in records:
+        record = as_dict(record)
+        row = {name: record.get(name) for name in schema.names}
+        if row.get('scraped_at'):
+            row['scraped_at'] = datetime.fromisoformat(row['scraped_at'])
+        rows.append(row)
+    return pa.Table.from_pylist(rows, schema=schema)
+
+
+def export_columnar(scraped_data, out_dir=None, fmt='parquet', run_time=None, compression='zstd'):
+    """Write every non-empty category under ``<out_dir>/<category>/run_date=<YYYY-MM-DD>/``.
+
+    ``out_dir`` defaults to ``moh_parquet`` or ``moh_arrow`` so the two
+    formats never share a dataset directory.
+
+    The hive-style ``run_date`` partition lets readers such as
+    ``pyarrow.dataset`` or DuckDB prune whole days of snapshots.
+    Returns the paths written.
+    """
+    if fmt not in ('parquet', 'arrow'):
+        raise ValueError(f"Unknown columnar format: {fmt}")
+    out_dir = out_dir or f"moh_{fmt}"
+    run_time = run_time or datetime.now()
+    partition = f"run_date={run_time.strftime('%Y-%m-%d')}"
+    filename = f"part-{run_time.strftime('%H%M%S')}.{fmt}"
+
+    paths = []
+    for category, records in scraped_data.items():
+        if not records or category not in SCHEMAS:
+            continue
+        table = to_table(category, records)
+        directory = os.path.join(out_dir, category, partition)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, filename)
+
+        if fmt == 'parquet':
+            pq.write_table(table, path, compression=compression)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=compression)
+            with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+        logger.info(f"Category '{category}' saved to {path}")
+        paths.append(path)
+    return paths
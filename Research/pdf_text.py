@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+PDF text extraction with an OCR fallback for scanned pages
+Pages with a text layer are read directly; only pages without one are
+OCRed (Tesseract through PyMuPDF) in a process pool, cached by PDF hash
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from scraper_logging import configure_logging, reset_worker_logging
+
+logger = logging.getLogger(__name__)
+
+# Pages with less extracted text than this are treated as scanned
+MIN_TEXT_CHARS = 20
+
+
+def file_hash(path):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def ocr_page(path, page_number, language='eng', dpi=300):
+    """OCR one page of a PDF; module-level so it can run in a process pool"""
+    with fitz.open(path) as doc:
+        page = doc[page_number]
+        textpage = page.get_textpage_ocr(language=language, dpi=dpi, full=True)
+        return page.get_text(textpage=textpage)
+
+
+class OcrCache:
+    """OCR output stored as ``<cache_dir>/<pdf sha1>/<page>.txt``.
+
+    Keyed on the PDF's content, so a re-downloaded or renamed file reuses
+    its pages and a changed file is OCRed afresh.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _path(self, digest, page_number):
+        return os.path.join(self.cache_dir, digest, f"{page_number}.txt")
+
+    def get(self, digest, page_number):
+        path = self._path(digest, page_number)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def put(self, digest, page_number, text):
+        path = self._path(digest, page_number)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+def extract_pdf_texts(paths, cache_dir='ocr_cache', workers=None, language='eng'):
+    """Return ``{path: text}`` for PDFs, OCRing only the pages without a text layer.
+
+    The text layer of every page is read in this process as before; pages
+    that come back (nearly) empty but carry images are looked up in the OCR
+    cache and the rest are OCRed in a process pool, started only if needed.
+    """
+    cache = OcrCache(cache_dir)
+    pages = {}
+    scanned = []
+    for path in paths:
+        try:
+            with fitz.open(path) as doc:
+                texts = [page.get_text() for page in doc]
+                # Only near-empty pages are checked for images, the costlier lookup
+                missing = [number for number, text in enumerate(texts)
+                           if len(text.strip()) < MIN_TEXT_CHARS and doc[number].get_images()]
+        except Exception as e:
+            logger.error(f"Error extracting text from {path}: {e}")
+            continue
+        pages[path] = texts
+        if not missing:
+            continue
+        digest = file_hash(path)
+        for number in missing:
+            cached = cache.get(digest, number)
+            if cached is not None:
+                texts[number] = cached
+            else:
+                scanned.append((path, digest, number))
+
+    if scanned:
+        logger.info(f"OCRing {len(scanned)} scanned pages from "
+                    f"{len({path for path, _, _ in scanned})} PDFs")
+        with ProcessPoolExecutor(max_workers=workers, initializer=reset_worker_logging) as executor:
+            futures = [(path, digest, number, executor.submit(ocr_page, path, number, language))
+                       for path, digest, number in scanned]
+            for path, digest, number, future in futures:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    # e.g. Tesseract or its language data isn't installed, or the
+                    # worker died; the page keeps whatever text layer it had
+                    logger.error(f"OCR failed for {path} page {number + 1}: {e}")
+                    continue
+                cache.put(digest, number, text)
+                pages[path][number] = text
+
+    return {path: ''.join(texts) for path, texts in pages.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract text from PDFs, OCRing scanned pages")
+    parser.add_argument('pdfs', nargs='+')
+    parser.add_argument('--cache-dir', default='ocr_cache')
+    parser.add_argument('--workers', type=int, help="OCR processes (default: one per CPU)")
+    parser.add_argument('--language', default='eng', help="Tesseract language, e.g. eng or eng+fra")
+    args = parser.parse_args()
+
+    configure_logging(log_file=None)
+    for path, text in extract_pdf_texts(args.pdfs, args.cache_dir, args.workers, args.language).items():
+        print(f"{path}: {len(text)} characters")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Adaptive request rate control
+AIMD limiter that speeds up while a server answers quickly and backs off on
+429/5xx responses, connection failures or rising latency
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveRateLimiter:
+    """Additive-increase/multiplicative-decrease control of the request rate to one host.
+
+    Each healthy response raises the rate by about ``increase`` requests per
+    second for every second of healthy traffic. A 429, a 5xx, a failed
+    request or a latency over ``latency_factor`` times the running baseline
+    multiplies it by ``decrease``, at most once per ``cooldown`` seconds so
+    one congested burst only counts once. ``Retry-After`` pauses the host.
+    """
+
+    def __init__(self, initial_rate=2.0, min_rate=0.2, max_rate=10.0, increase=0.5, decrease=0.5,
+                 latency_factor=2.0, cooldown=1.0):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(initial_rate, min_rate), max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        # Running average of response latency, the yardstick for "slow"
+        self.baseline = None
+        self.increases = 0
+        self.decreases = 0
+        self.peak_rate = self.rate
+        self._next_slot = 0.0
+        self._last_decrease = float('-inf')
+
+    @property
+    def interval(self):
+        return 1.0 / self.rate
+
+    def cap(self, delay):
+        """Never go faster than one request per ``delay`` seconds, e.g. a robots.txt Crawl-delay"""
+        if delay:
+            self.max_rate = min(self.max_rate, 1.0 / delay)
+            self.min_rate = min(self.min_rate, self.max_rate)
+            self.rate = min(self.rate, self.max_rate)
+
+    def reserve(self):
+        """Claim the next request slot and return how many seconds to wait for it"""
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        return slot - now
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, status, latency, retry_after=None):
+        """Adjust the rate after a response; ``status`` is None for a failed request"""
+        congested = status is None or status == 429 or status >= 500
+        slow = (not congested and self.baseline is not None
+                and latency > self.latency_factor * self.baseline)
+        if not congested:
+            self.baseline = latency if self.baseline is None else 0.9 * self.baseline + 0.1 * latency
+
+        if retry_after:
+            self._next_slot = max(self._next_slot, time.monotonic() + retry_after)
+        if congested or slow:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self._last_decrease = now
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.decreases += 1
+                logger.debug(f"Backing off to {self.rate:.2f} req/s "
+                             f"({'status ' + str(status) if congested else f'latency {latency:.2f}s'})")
+        elif self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+            self.peak_rate = max(self.peak_rate, self.rate)
+            self.increases += 1
+
+    def stats(self):
+        return {
+            'rate_rps': self.rate,
+            'peak_rate_rps': self.peak_rate,
+            'min_rate_rps': self.min_rate,
+            'max_rate_rps': self.max_rate,
+            'latency_baseline_s': self.baseline,
+            'increases': self.increases,
+            'decreases': self.decreases,
+        }
+
+
+def retry_after(headers):
+    """Seconds from a Retry-After header given in seconds, or None"""
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+SQLite record store for scraped MOH data
+Upserts records into one table per category keyed on a content hash, with
+FTS5 full-text indexes over titles, descriptions and summaries
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+
+from records import as_dict, from_dict
+from scraper_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Fields of each category indexed for full-text search
+TEXT_FIELDS = {
+    'health_policies': ['title', 'content_preview'],
+    'healthcare_facilities': ['name', 'location', 'services'],
+    'health_programs': ['title', 'description', 'objectives'],
+    'publications': ['title'],
+    'news_updates': ['title', 'summary'],
+    'contact_info': ['type', 'value'],
+    'departments': ['name'],
+    'ehr_relevant_links': ['text', 'url'],
+}
+
+# Per-run fields left out of the content hash so re-scraped records dedupe
+VOLATILE_FIELDS = ('scraped_at',)
+
+
+def record_hash(record):
+    """Stable content hash of a record, ignoring when it was scraped"""
+    content = {key: value for key, value in as_dict(record).items() if key not in VOLATILE_FIELDS}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _text(value):
+    if isinstance(value, (list, tuple)):
+        return ' '.join(str(item) for item in value)
+    return value or ''
+
+
+class RecordStore:
+    """Content-addressed store of scraped records with full-text search"""
+
+    def __init__(self, path='moh_records.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for category, fields in TEXT_FIELDS.items():
+            self._create_tables(category, fields)
+        self.conn.commit()
+
+    def _create_tables(self, category, fields):
+        columns = ', '.join(f"{field} TEXT" for field in fields)
+        field_list = ', '.join(fields)
+        new_values = ', '.join(f"new.{field}" for field in fields)
+        old_values = ', '.join(f"old.{field}" for field in fields)
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {category} (
+                rowid INTEGER PRIMARY KEY,
+                hash TEXT NOT NULL UNIQUE,
+                data TEXT NOT NULL,
+                {columns},
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS {category}_fts USING fts5(
+                {field_list}, content='{category}', content_rowid='rowid'
+            );
+            CREATE TRIGGER IF NOT EXISTS {category}_ai AFTER INSERT ON {category} BEGIN
+                INSERT INTO {category}_fts(rowid, {field_list}) VALUES (new.rowid, {new_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {category}_ad AFTER DELETE ON {category} BEGIN
+                INSERT INTO {category}_fts({category}_fts, rowid, {field_list})
+                VALUES ('delete', old.rowid, {old_values});
+            END;
+        """)
+
+    def upsert(self, category, record):
+        """Insert a record, or refresh ``last_seen`` if identical content is stored.
+
+        Changes are not committed until :meth:`commit`, so callers can
+        batch a page's records into one transaction.
+        """
+        fields = TEXT_FIELDS[category]
+        record = as_dict(record)
+        digest = record_hash(record)
+        now = time.time()
+        self.conn.execute(
+            f"INSERT INTO {category} (hash, data, {', '.join(fields)}, first_seen, last_seen) "
+            f"VALUES (?, ?, {', '.join('?' for _ in fields)}, ?, ?) "
+            f"ON CONFLICT(hash) DO UPDATE SET last_seen = excluded.last_seen",
+            [digest, json.dumps(record, ensure_ascii=False)]
+            + [_text(record.get(field)) for field in fields] + [now, now])
+        return digest
+
+    def upsert_many(self, category, records):
+        for record in records:
+            self.upsert(category, record)
+        self.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+    def get(self, category, digest):
+        """Return the record stored under a content hash, or None"""
+        row = self.conn.execute(f"SELECT data FROM {category} WHERE hash = ?", (digest,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def records(self, category):
+        """Iterate over every stored record of a category"""
+        for (data,) in self.conn.execute(f"SELECT data FROM {category} ORDER BY rowid"):
+            yield json.loads(data)
+
+    def count(self, category):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {category}").fetchone()[0]
+
+    def search(self, query, categories=None, limit=20):
+        """Full-text search ranked by BM25.
+
+        ``query`` uses FTS5 syntax (e.g. ``malaria``, ``"child health"``,
+        ``title:diabetes``). Returns dicts with the category, hash and record.
+        """
+        results = []
+        for category in categories or TEXT_FIELDS:
+            try:
+                rows = self.conn.execute(
+                    f"SELECT r.hash, r.data, bm25({category}_fts) AS rank "
+                    f"FROM {category}_fts JOIN {category} r ON r.rowid = {category}_fts.rowid "
+                    f"WHERE {category}_fts MATCH ? ORDER BY rank LIMIT ?",
+                    (query, limit)).fetchall()
+            except sqlite3.OperationalError as e:
+                # A column filter such as ``title:`` only applies to some categories
+                if 'no such column' not in str(e):
+                    raise
+                continue
+            results.extend({'category': category, 'hash': digest, 'record': json.loads(data), 'rank': rank}
+                           for digest, data, rank in rows)
+        results.sort(key=lambda result: result['rank'])
+        return results[:limit]
+
+    def import_dump(self, json_path):
+        """Load a ``moh_data_<timestamp>.json`` dump into the store"""
+        with open(json_path, encoding='utf-8') as f:
+            scraped_data = json.load(f)
+        for category, records in scraped_data.items():
+            if category in TEXT_FIELDS:
+                # Normalize to the typed form so hashes match freshly scraped records
+                self.upsert_many(category, (from_dict(category, record) for record in records))
+        logger.info(f"Imported {json_path} into {self.path}")
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the scraped MOH record store")
+    parser.add_argument('store', help="SQLite store written with moh_scraper.py --store")
+    parser.add_argument('query', nargs='?', help="FTS5 query")
+    parser.add_argument('--category', action='append', choices=list(TEXT_FIELDS),
+                        help="Restrict the search to a category (repeatable)")
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--import', dest='dumps', nargs='+', default=[], metavar='JSON',
+                        help="Import moh_data_<timestamp>.json dumps first")
+    args = parser.parse_args()
+
+    configure_logging(log_file=None)
+    store = RecordStore(args.store)
+    for dump in args.dumps:
+        store.import_dump(dump)
+    if args.query:
+        start = time.perf_counter()
+        results = store.search(args.query, args.category, args.limit)
+        elapsed = time.perf_counter() - start
+        for result in results:
+            record = result['record']
+            title = record.get('title') or record.get('name') or record.get('value') or record.get('text')
+            print(f"[{result['category']}] {title}")
+        print(f"{len(results)} results in {elapsed * 1000:.2f} ms")
+    store.close()
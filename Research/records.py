@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Record types for scraped MOH entities
+Compact immutable tuples in place of per-record dicts; extractors intern
+page URLs and share one scraped_at timestamp per page
+"""
+
+from typing import NamedTuple, Tuple
+
+
+class PolicyRecord(NamedTuple):
+    title: str
+    url: str
+    source_page: str = ''
+    content_preview: str = ''
+    scraped_at: str = ''
+
+
+class FacilityRecord(NamedTuple):
+    name: str
+    location: str = ''
+    contact: str = ''
+    services: Tuple[str, ...] = ()
+    source_url: str = ''
+    scraped_at: str = ''
+
+
+class ProgramRecord(NamedTuple):
+    title: str
+    description: str = ''
+    target_group: str = ''
+    objectives: Tuple[str, ...] = ()
+    url: str = ''
+    scraped_at: str = ''
+
+
+class PublicationRecord(NamedTuple):
+    title: str
+    url: str
+    content_type: str = ''
+    size: int = 0
+    scraped_at: str = ''
+
+
+class NewsRecord(NamedTuple):
+    title: str
+    date: str = ''
+    summary: str = ''
+    url: str = ''
+    scraped_at: str = ''
+
+
+class ContactRecord(NamedTuple):
+    type: str
+    value: str
+    source_url: str = ''
+    scraped_at: str = ''
+
+
+class DepartmentRecord(NamedTuple):
+    name: str
+    source_url: str = ''
+    scraped_at: str = ''
+
+
+RECORD_TYPES = {
+    'health_policies': PolicyRecord,
+    'healthcare_facilities': FacilityRecord,
+    'health_programs': ProgramRecord,
+    'publications': PublicationRecord,
+    'news_updates': NewsRecord,
+    'contact_info': ContactRecord,
+    'departments': DepartmentRecord,
+}
+
+
+def as_dict(record):
+    """Return a plain dict for a typed record; dicts (e.g. links) pass through"""
+    if isinstance(record, tuple):
+        return {field: list(value) if isinstance(value, tuple) else value
+                for field, value in zip(record._fields, record)}
+    return record
+
+
+def from_dict(category, data):
+    """Rebuild a typed record from its dict form, e.g. when loading a JSON dump"""
+    record_type = RECORD_TYPES.get(category)
+    if record_type is None:
+        return data
+    values = {field: data[field] for field in record_type._fields if field in data}
+    for field in ('services', 'objectives'):
+        if field in values:
+            values[field] = tuple(values[field])
+    return record_type(**values)
+
+
+def pack_records(records):
+    """Strip typed records down to plain tuples for shipping between processes.
+
+    NamedTuples pickle through a Python-level ``__getnewargs__`` call per
+    record, several times slower than dicts; plain tuples keyed by category
+    (the schema) pickle faster than either. Other categories pass through.
+    """
+    return {category: [tuple(record) for record in items] if category in RECORD_TYPES else items
+            for category, items in records.items()}
+
+
+def unpack_records(packed):
+    """Rebuild the typed records from ``pack_records`` output"""
+    return {category: list(map(RECORD_TYPES[category]._make, items)) if category in RECORD_TYPES else items
+            for category, items in packed.items()}
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Change-aware recrawl scheduler for the MOH site
+Long-running mode that revisits each page on its own adaptive interval,
+shortened when the page changes and lengthened while it stays the same
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import signal
+import sqlite3
+import time
+
+from ehr_insights import InsightAggregator
+from record_store import RecordStore, record_hash
+from scraper_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Starting revisit interval per extractor, before a page has any change history
+INITIAL_INTERVALS = {
+    'extract_news_info': 6 * HOUR,
+    'extract_program_info': 3 * DAY,
+    'extract_contact_details': 7 * DAY,
+    'extract_policy_documents': 7 * DAY,
+    'extract_facility_info': 7 * DAY,
+}
+MIN_INTERVAL = 1 * HOUR
+MAX_INTERVAL = 30 * DAY
+# Interval multipliers when a visit finds the page changed or unchanged
+ON_CHANGE = 0.5
+ON_UNCHANGED = 1.5
+# How often the home page and sitemaps are re-read for new links
+DISCOVERY_INTERVAL = 6 * HOUR
+
+
+def page_hash(records):
+    """Hash of the records extracted from a page, ignoring when they were scraped.
+
+    Hashing records rather than HTML means rotating banners, dates in the
+    footer or session tokens don't count as changes.
+    """
+    digests = sorted(record_hash(record) for items in records.values() for record in items)
+    return hashlib.blake2b('\n'.join(digests).encode(), digest_size=16).hexdigest()
+
+
+class RecrawlSchedule:
+    """Per-URL revisit schedule and change history in SQLite"""
+
+    def __init__(self, path='recrawl_state.db'):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                extractors TEXT NOT NULL,
+                interval REAL NOT NULL,
+                next_visit REAL NOT NULL,
+                last_visit REAL,
+                last_change REAL,
+                content_hash TEXT,
+                visits INTEGER NOT NULL DEFAULT 0,
+                changes INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS pages_next_visit ON pages (next_visit);
+            CREATE TABLE IF NOT EXISTS visits (
+                url TEXT NOT NULL,
+                visited_at REAL NOT NULL,
+                changed INTEGER NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def add(self, url, extractors, lastmod_changed=False):
+        """Schedule a newly discovered page for an immediate first visit.
+
+        A known page whose sitemap lastmod moved is brought forward to now.
+        """
+        interval = min(INITIAL_INTERVALS.get(name, MAX_INTERVAL) for name in extractors)
+        now = time.time()
+        cursor = self.conn.execute("INSERT OR IGNORE INTO pages (url, extractors, interval, next_visit) "
+                                   "VALUES (?, ?, ?, ?)", (url, json.dumps(extractors), interval, now))
+        if not cursor.rowcount and lastmod_changed:
+            self.conn.execute("UPDATE pages SET next_visit = MIN(next_visit, ?) WHERE url = ?", (now, url))
+        return cursor.rowcount == 1
+
+    def due(self, now, limit=None):
+        """``(url, extractors, content_hash)`` of pages due a visit, most change-prone first.
+
+        Pages are ranked by their smoothed change rate, so when more are due
+        than one cycle's budget the frequently changing sections go first.
+        """
+        rows = self.conn.execute("""
+            SELECT url, extractors, content_hash FROM pages WHERE next_visit <= ?
+            ORDER BY (changes + 1.0) / (visits + 2.0) DESC, next_visit
+            LIMIT ?
+        """, (now, -1 if limit is None else limit))
+        return [(url, json.loads(extractors), content_hash) for url, extractors, content_hash in rows]
+
+    def record_visit(self, url, content_hash, now):
+        """Update a page's interval from whether its content changed; returns whether it did"""
+        interval, previous = self.conn.execute("SELECT interval, content_hash FROM pages WHERE url = ?",
+                                               (url,)).fetchone()
+        first = previous is None
+        changed = not first and content_hash != previous
+        if changed:
+            interval = max(MIN_INTERVAL, interval * ON_CHANGE)
+        elif not first:
+            interval = min(MAX_INTERVAL, interval * ON_UNCHANGED)
+        self.conn.execute("""
+            UPDATE pages SET interval = ?, next_visit = ?, last_visit = ?, content_hash = ?,
+                visits = visits + 1, changes = changes + ?, last_change = CASE WHEN ? THEN ? ELSE last_change END
+            WHERE url = ?
+        """, (interval, now + interval, now, content_hash, int(changed), changed, now, url))
+        self.conn.execute("INSERT INTO visits (url, visited_at, changed) VALUES (?, ?, ?)",
+                          (url, now, int(changed or first)))
+        self.conn.commit()
+        return changed or first
+
+    def postpone(self, url, seconds, now):
+        """Retry a page that couldn't be fetched, without touching its interval"""
+        self.conn.execute("UPDATE pages SET next_visit = ? WHERE url = ?", (now + seconds, url))
+        self.conn.commit()
+
+    def next_visit(self):
+        return self.conn.execute("SELECT MIN(next_visit) FROM pages").fetchone()[0]
+
+    def stats(self):
+        pages, per_day, changes, visits = self.conn.execute(
+            "SELECT COUNT(*), SUM(86400.0 / interval), SUM(changes), SUM(visits) FROM pages").fetchone()
+        return {
+            'pages': pages,
+            'requests_per_day': round(per_day or 0, 1),
+            'visits': visits or 0,
+            'changes': changes or 0,
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+class RecrawlScheduler:
+    """Runs an MOHScraper as a daemon over a RecrawlSchedule.
+
+    Each cycle re-reads the home page and sitemaps when discovery is due,
+    then fetches the due pages (at most ``budget`` per cycle) and upserts
+    the records of pages whose content changed into the scraper's record
+    store. Records are not kept in memory, so the daemon's footprint stays
+    flat however long it runs.
+    """
+
+    def __init__(self, scraper, schedule, budget=None, discovery_interval=DISCOVERY_INTERVAL):
+        if scraper.store is None:
+            raise ValueError("RecrawlScheduler needs a scraper with a record store")
+        self.scraper = scraper
+        self.schedule = schedule
+        self.budget = budget
+        self.discovery_interval = discovery_interval
+        self.last_discovery = 0.0
+        self.stopping = False
+
+    def discover(self):
+        """Re-read the home page and sitemaps and schedule new or re-modified pages"""
+        scraper = self.scraper
+        scraper.scrape_main_page()
+        added = 0
+        for link in scraper.discovered_links:
+            url = link['url']
+            names = scraper.extractors_for_link(link['text'])
+            if not names or not url.startswith(('http://', 'https://')):
+                continue
+            kind = scraper.classify_url(url)
+            if kind:
+                scraper.skip_page(url, kind)
+                continue
+            unchanged = scraper.discovery is not None and scraper.discovery.is_unchanged(url)
+            added += self.schedule.add(url, names, bool(link.get('lastmod')) and not unchanged)
+        self.schedule.conn.commit()
+        if scraper.discovery:
+            scraper.discovery.save_state()
+        self.last_discovery = time.time()
+        logger.info(f"Discovery found {added} new pages; schedule: {self.schedule.stats()}")
+
+    def visit(self, url, extractors, now):
+        from moh_scraper import extract_page_records
+
+        scraper = self.scraper
+        content = scraper.fetch_page(url)
+        if content is None:
+            status = scraper.metrics.last_status(url)
+            if status is None or status >= 400:
+                self.schedule.postpone(url, MIN_INTERVAL, now)
+                return False
+            records = {}
+        else:
+            boilerplate = scraper.boilerplate.boilerplate(url) if scraper.boilerplate else frozenset()
+            records, stats = extract_page_records(url, content, extractors, boilerplate)
+            scraper.merge_page_records(url, {}, stats)
+        changed = self.schedule.record_visit(url, page_hash(records), now)
+        if changed:
+            for category, items in records.items():
+                scraper.store.upsert_many(category, items)
+        return changed
+
+    def run_cycle(self):
+        now = time.time()
+        if now - self.last_discovery >= self.discovery_interval:
+            self.discover()
+        visited = changed = 0
+        for url, extractors, _ in self.schedule.due(time.time(), self.budget):
+            if self.stopping:
+                break
+            visited += 1
+            changed += self.visit(url, extractors, time.time())
+        if visited:
+            logger.info(f"Visited {visited} due pages, {changed} changed; schedule: {self.schedule.stats()}")
+        # Documents skipped during the cycle were upserted as publications; drop the in-memory copies
+        for items in self.scraper.scraped_data.values():
+            items.clear()
+        self.scraper.insights = InsightAggregator()
+        # Every visit adds a fetch entry, so per-cycle metrics are dropped too
+        self.scraper.metrics.fetches.clear()
+        self.scraper.metrics.skipped.clear()
+        if self.scraper.discovery:
+            self.scraper.discovery.save_state()
+        if self.scraper.boilerplate:
+            self.scraper.boilerplate.save_state()
+        return visited
+
+    def run(self, once=False, max_sleep=300):
+        """Run cycles until stopped (SIGINT/SIGTERM), sleeping until the next page is due"""
+        def stop(signum, frame):
+            logger.info("Stopping after the current page")
+            self.stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        try:
+            while not self.stopping:
+                self.run_cycle()
+                if once:
+                    break
+                next_due = min(self.schedule.next_visit() or float('inf'),
+                               self.last_discovery + self.discovery_interval)
+                deadline = time.time() + min(max_sleep, max(1.0, next_due - time.time()))
+                while not self.stopping and time.time() < deadline:
+                    time.sleep(min(1.0, deadline - time.time()))
+        finally:
+            self.scraper.close()
+
+
+if __name__ == "__main__":
+    from boilerplate import BoilerplateDetector
+    from moh_scraper import MOHScraper
+
+    parser = argparse.ArgumentParser(description="Revisit MOH pages on adaptive, change-driven intervals")
+    parser.add_argument('--state', default='recrawl_state.db', help="Schedule and change history database")
+    parser.add_argument('--store', default='moh_records.db', help="SQLite record store that changed records go to")
+    parser.add_argument('--budget', type=int, help="At most this many page visits per cycle")
+    parser.add_argument('--discovery-hours', type=float, default=DISCOVERY_INTERVAL / HOUR,
+                        help="Hours between re-reading the home page and sitemaps for new links")
+    parser.add_argument('--once', action='store_true', help="Run one cycle and exit (e.g. from cron)")
+    parser.add_argument('--keep-boilerplate', action='store_true',
+                        help="Don't prune headers, menus and footers shared across pages before extraction")
+    parser.add_argument('--log-level', default='INFO')
+    parser.add_argument('--log-file', default='recrawl_scheduler.log')
+    args = parser.parse_args()
+
+    configure_logging(args.log_level.upper(), args.log_file)
+    scraper = MOHScraper(store=RecordStore(args.store),
+                         boilerplate=None if args.keep_boilerplate else BoilerplateDetector())
+    scheduler = RecrawlScheduler(scraper, RecrawlSchedule(args.state), args.budget, args.discovery_hours * HOUR)
+    scheduler.run(once=args.once)
@@ -1,75 +1,243 @@
 
+import argparse
 import os
+import sys
 import time
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from langchain.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.document_loaders import TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import fitz  # PyMuPDF
+
+from rate_limit import AdaptiveRateLimiter, retry_after
+
+# Each stage imports its own dependencies (requests, PyMuPDF, langchain, models) when it runs,
+# so a download-only or precomputed query run doesn't pay for the others at startup
 
 BASE_DIR = "guidelines"
-os.makedirs(BASE_DIR, exist_ok=True)
+INDEX_DIR = "faiss_guidelines_db"
+
+SOURCES = {
+    "who": "https://www.who.int/publications/guidelines",
+    "moh": "https://www.moh.gov.gh/documents/",
+}
+WHO_URL = SOURCES["who"]
+MOH_URL = SOURCES["moh"]
+
+# Tries per PDF when the server answers 429/5xx or the request fails
+PDF_ATTEMPTS = 3
 
-WHO_URL = "https://www.who.int/publications/guidelines"
-MOH_URL = "https://www.moh.gov.gh/documents/"
+# Same as embedding_backends.BACKENDS, which isn't imported here because it loads langchain
+BACKENDS = ("hf", "onnx")
 
 def download_pdfs(base_url, domain):
+    import requests
+    from bs4 import BeautifulSoup
+    from urllib.parse import urljoin
+
     print(f"Scraping {domain}...")
     try:
         response = requests.get(base_url, timeout=10)
         soup = BeautifulSoup(response.text, "html.parser")
-
-        for link in soup.find_all("a"):
-            href = link.get("href", "")
-            if ".pdf" in href:
-                full_url = urljoin(base_url, href)
-                filename = os.path.join(BASE_DIR, f"{domain}_{os.path.basename(href)}")
-                if not os.path.exists(filename):
-                    print(f"Downloading: {full_url}")
-                    pdf_data = requests.get(full_url, timeout=10)
-                    with open(filename, "wb") as f:
-                        f.write(pdf_data.content)
-                    time.sleep(2)
+        pdf_urls = [urljoin(base_url, link.get("href", "")) for link in soup.find_all("a")
+                    if ".pdf" in link.get("href", "")]
+        fetch_pdfs(pdf_urls, domain)
     except Exception as e:
         print(f"Error scraping {domain}: {e}")
 
+def fetch_pdfs(pdf_urls, domain):
+    """Download PDFs not already in BASE_DIR as <domain>_<file name>.pdf, pacing the requests.
+
+    429, 5xx and failed requests slow the limiter down and are retried up to
+    PDF_ATTEMPTS times; a PDF that still fails is reported and skipped.
+    """
+    import requests
+
+    os.makedirs(BASE_DIR, exist_ok=True)
+    limiter = AdaptiveRateLimiter(initial_rate=0.5, max_rate=4.0)
+    failed = 0
+    for full_url in pdf_urls:
+        filename = os.path.join(BASE_DIR, f"{domain}_{os.path.basename(full_url)}")
+        if os.path.exists(filename):
+            continue
+        print(f"Downloading: {full_url}")
+        for attempt in range(PDF_ATTEMPTS):
+            limiter.wait()
+            start = time.perf_counter()
+            try:
+                # Streamed so the latency fed to the limiter excludes the PDF's size
+                with requests.get(full_url, timeout=10, stream=True) as pdf_data:
+                    limiter.record(pdf_data.status_code, time.perf_counter() - start,
+                                   retry_after(pdf_data.headers))
+                    status = pdf_data.status_code
+                    if pdf_data.ok:
+                        # Written under a temporary name so an interrupted download isn't kept as the PDF
+                        with open(filename + ".part", "wb") as f:
+                            for chunk in pdf_data.iter_content(64 * 1024):
+                                f.write(chunk)
+                        os.replace(filename + ".part", filename)
+                        break
+            except requests.RequestException as e:
+                limiter.record(None, time.perf_counter() - start)
+                status = e
+            if not (isinstance(status, Exception) or status == 429 or status >= 500):
+                break
+        if not os.path.exists(filename):
+            failed += 1
+            print(f"Failed to download {full_url}: {status}")
+    print(f"{domain}: finished at {limiter.rate:.2f} downloads/s after {limiter.decreases} back-offs, "
+          f"{failed} failed")
+
+def scraped_publications(paths):
+    """PDF URLs the site scraper recorded under 'publications', grouped by publisher.
+
+    ``paths`` are moh_data_*.json dumps, moh_publications_*.csv files or
+    record store databases.
+    """
+    import csv
+    import json
+    from urllib.parse import urlparse
+
+    urls = []
+    for path in paths:
+        if path.endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                urls.extend(record["url"] for record in json.load(f).get("publications", []))
+        elif path.endswith(".csv"):
+            with open(path, newline="", encoding="utf-8") as f:
+                urls.extend(record["url"] for record in csv.DictReader(f))
+        else:
+            from record_store import RecordStore
+            store = RecordStore(path)
+            try:
+                urls.extend(record["url"] for record in store.records("publications"))
+            finally:
+                store.close()
+
+    by_publisher = {}
+    for url in dict.fromkeys(urls):
+        if not urlparse(url).path.lower().endswith(".pdf"):
+            continue
+        host = urlparse(url).netloc.lower()
+        publisher = next((name for name, source in SOURCES.items() if urlparse(source).netloc == host), "other")
+        by_publisher.setdefault(publisher, []).append(url)
+    return by_publisher
+
 def extract_text_from_pdfs():
+    from pdf_text import extract_pdf_texts
+
+    os.makedirs(BASE_DIR, exist_ok=True)
+    pdf_paths = [os.path.join(BASE_DIR, file) for file in os.listdir(BASE_DIR) if file.endswith(".pdf")]
+    print(f"Extracting text from {len(pdf_paths)} PDFs...")
+    # Scanned pages without a text layer are OCRed, with results cached by PDF hash
+    texts = extract_pdf_texts(pdf_paths, cache_dir=os.path.join(BASE_DIR, "ocr_cache"))
     all_docs = []
-    for file in os.listdir(BASE_DIR):
-        if file.endswith(".pdf"):
-            path = os.path.join(BASE_DIR, file)
-            print(f"Extracting: {path}")
-            try:
-                doc = fitz.open(path)
-                text = ""
-                for page in doc:
-                    text += page.get_text()
-                temp_path = path.replace(".pdf", ".txt")
-                with open(temp_path, "w", encoding="utf-8") as f:
-                    f.write(text)
-                all_docs.append(temp_path)
-            except Exception as e:
-                print(f"Error extracting text from {path}: {e}")
+    for path, text in texts.items():
+        if not text.strip():
+            print(f"No text extracted from {path}")
+            continue
+        temp_path = path.replace(".pdf", ".txt")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        all_docs.append(temp_path)
     return all_docs
 
-def embed_into_faiss(doc_paths):
-    docs = []
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    for path in doc_paths:
-        loader = TextLoader(path, encoding="utf-8")
-        docs.extend(splitter.split_documents(loader.load()))
+def extracted_texts():
+    """The .txt files a previous extract run left in BASE_DIR"""
+    if not os.path.isdir(BASE_DIR):
+        return []
+    return sorted(os.path.join(BASE_DIR, file) for file in os.listdir(BASE_DIR) if file.endswith(".txt"))
+
+def embed_into_faiss(doc_paths, backend="hf", workers=None, chunker="layout"):
+    from guideline_index import build_index
+
+    if chunker == "layout":
+        from guideline_chunker import chunk_pdfs
+        # Section-aligned chunks sized to the model's token limit, read from the PDFs' layout
+        pdf_paths = [path[:-len(".txt")] + ".pdf" for path in doc_paths]
+        docs = chunk_pdfs(pdf_paths, ocr_cache_dir=os.path.join(BASE_DIR, "ocr_cache"))
+    else:
+        from guideline_index import load_documents
+        docs = load_documents(doc_paths)
+
+    print(f"Embedding {len(docs)} chunks with the '{backend}' backend...")
+    # Shards are embedded in parallel worker processes and merged into one index
+    build_index(docs, INDEX_DIR, backend, workers=workers)
+    print(f"Saved FAISS DB to '{INDEX_DIR}/' with per-source, per-year partitions")
+
+def query_guidelines(query, k=4, publisher=None, year=None, min_year=None, max_year=None, live=False):
+    """Print the guideline passages for a query.
+
+    A bare topic such as 'malaria', or one in a precomputed phrasing such as
+    'treatment guidelines for malaria', is answered from the precomputed
+    table without loading a model; anything else is embedded and searched.
+    """
+    filtered = any(value is not None for value in (publisher, year, min_year, max_year))
+    if not live and not filtered:
+        from guideline_answers import PrecomputedAnswers
+        results = PrecomputedAnswers(INDEX_DIR).answer(query)
+        if results is not None:
+            for result in results[:k]:
+                print_passage(result["metadata"], result["content"], result["distance"])
+            return
+
+    from guideline_index import GuidelineSearch
+    for doc, distance in GuidelineSearch(INDEX_DIR).search(query, k, publisher, year, min_year, max_year):
+        print_passage(doc.metadata, doc.page_content, distance)
 
-    print("Embedding documents...")
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    db = FAISS.from_documents(docs, embeddings)
-    db.save_local("faiss_guidelines_db")
-    print("Saved FAISS DB to 'faiss_guidelines_db/'")
+def print_passage(metadata, content, distance):
+    pages = f" p.{metadata['page_start']}" if metadata.get("page_start") else ""
+    print(f"[{metadata.get('publisher')} {metadata.get('year') or '----'}] "
+          f"{metadata.get('document')}{pages} ({distance:.3f})")
+    print(f"    {' '.join(content.split())[:200]}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Download, extract, index and search WHO/MOH guideline PDFs")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    embed_options = argparse.ArgumentParser(add_help=False)
+    embed_options.add_argument("--backend", choices=BACKENDS, default="hf",
+                               help="Embedding backend: 'hf' (PyTorch) or 'onnx' (int8 ONNX Runtime)")
+    embed_options.add_argument("--workers", type=int, help="Embedding processes (default: one per CPU)")
+    embed_options.add_argument("--chunker", choices=("layout", "character"), default="layout",
+                               help="'layout': section-aligned, token-budgeted chunks; "
+                                    "'character': fixed 1000-character chunks with 200 overlap")
+
+    download_options = argparse.ArgumentParser(add_help=False)
+    download_options.add_argument("--source", nargs="+", choices=list(SOURCES), default=list(SOURCES))
+    download_options.add_argument("--publications", nargs="+", metavar="PATH", default=[],
+                                  help="Also download the PDFs moh_scraper.py recorded as publications "
+                                       "(moh_data_*.json, moh_publications_*.csv or a record store)")
+
+    commands.add_parser("download", parents=[download_options], help="Download new guideline PDFs")
+    commands.add_parser("extract", help="Extract text from downloaded PDFs, OCRing scanned pages")
+    commands.add_parser("embed", parents=[embed_options], help="Index the extracted guidelines")
+    commands.add_parser("all", parents=[embed_options, download_options],
+                        help="download, extract and embed (the default)")
+
+    query = commands.add_parser("query", help="Search the guidelines index")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=4)
+    query.add_argument("--publisher", choices=list(SOURCES) + ["other"])
+    query.add_argument("--year", type=int)
+    query.add_argument("--min-year", type=int)
+    query.add_argument("--max-year", type=int)
+    query.add_argument("--live", action="store_true", help="Always search, even for precomputed topics")
+    return parser
 
 if __name__ == "__main__":
-    download_pdfs(WHO_URL, "who")
-    download_pdfs(MOH_URL, "moh")
-    extracted = extract_text_from_pdfs()
-    embed_into_faiss(extracted)
+    argv = sys.argv[1:]
+    # Without a command (or with only embed options) run the whole pipeline, as before subcommands
+    if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+        argv = ["all"] + argv
+    args = build_parser().parse_args(argv)
+
+    if args.command in ("download", "all"):
+        for source in args.source:
+            download_pdfs(SOURCES[source], source)
+        for publisher, urls in scraped_publications(args.publications).items():
+            try:
+                fetch_pdfs(urls, publisher)
+            except Exception as e:
+                print(f"Error downloading scraped {publisher} publications: {e}")
+    if args.command in ("extract", "all"):
+        extract_text_from_pdfs()
+    if args.command in ("embed", "all"):
+        embed_into_faiss(extracted_texts(), args.backend, args.workers, args.chunker)
+    if args.command == "query":
+        query_guidelines(args.text, args.k, args.publisher, args.year, args.min_year, args.max_year, args.live)
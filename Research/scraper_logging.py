@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Logging setup for the MOH scraper
+Queue-based asynchronous handlers, optional JSON events and per-page
+aggregation of the per-record "Found ..." messages from the extractors
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+from collections import Counter
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including ``extra`` fields"""
+
+    def format(self, record):
+        event = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        event.update((key, value) for key, value in vars(record).items()
+                     if key not in _RECORD_ATTRS)
+        if record.exc_info:
+            event['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=logging.INFO, log_file='moh_scraper.log', json_format=False, console=True):
+    """Route all logging through a queue to file/console handlers on a background thread.
+
+    Call this from an entry point, not at import time. Returns the started
+    QueueListener, which is also stopped (and flushed) at interpreter exit.
+    """
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    handlers = []
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    return listener
+
+
+def reset_worker_logging():
+    """Process pool initializer: drop queue handlers inherited from the parent.
+
+    A forked worker has a copy of the parent's queue but no listener, so
+    anything logged through it would never be written.
+    """
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(logging.WARNING)
+
+
+class EventSampler:
+    """Counts per-record events and logs one summary per page.
+
+    Only the first ``sample_first`` events of each type, then every
+    ``sample_every``-th, are logged individually, and only at DEBUG level.
+    """
+
+    def __init__(self, logger, sample_first=3, sample_every=100):
+        self.logger = logger
+        self.sample_first = sample_first
+        self.sample_every = sample_every
+        self.totals = Counter()
+        self._pages = {}
+
+    def event(self, event_type, page, message, *args):
+        self._pages.setdefault(page, Counter())[event_type] += 1
+        self.totals[event_type] += 1
+        seen = self.totals[event_type]
+        if (seen <= self.sample_first or seen % self.sample_every == 0) \
+                and self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(message, *args, extra={'event': event_type, 'page': page, 'seq': seen})
+
+    def flush(self, page):
+        """Log and return the event counts gathered for a page"""
+        counts = self._pages.pop(page, Counter())
+        self.log_counts(page, counts)
+        return dict(counts)
+
+    def log_counts(self, page, counts):
+        for event_type, count in counts.items():
+            self.logger.info("Found %d %s on %s", count, event_type, page,
+                             extra={'event': event_type, 'count': count, 'page': page})
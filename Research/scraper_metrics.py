@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Run metrics for the MOH scraper
+Records latency, bytes and parse time for every fetch, per-extractor time and
+record counts and per-phase durations, with optional phase profiling
+"""
+
+import cProfile
+import json
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class ScraperMetrics:
+    """Collects timings and counts for one scraper run"""
+
+    PROFILERS = ('cprofile', 'pyinstrument')
+
+    def __init__(self, profiler=None, profile_dir='profiles'):
+        if profiler not in (None,) + self.PROFILERS:
+            raise ValueError(f"Unknown profiler: {profiler}")
+        self.profiler = profiler
+        self.profile_dir = profile_dir
+        self.started_at = datetime.now().isoformat()
+        self.fetches = {}
+        self.extractors = {}
+        self.phases = {}
+        self.skipped = {}
+        # Adaptive rate limiter state per host, filled in by the scraper
+        self.rate_limits = {}
+
+    def record_fetch(self, url, status, latency, size, parse_time=0.0):
+        """Record one fetch; a URL fetched again (retried or recrawled) gets another entry"""
+        self.fetches.setdefault(url, []).append({
+            'status': status,
+            'latency_s': latency,
+            'bytes': size,
+            'parse_s': parse_time,
+        })
+
+    def last_status(self, url, default=200):
+        """Status of the latest fetch of ``url``, or ``default`` if it was never fetched"""
+        entries = self.fetches.get(url)
+        return entries[-1]['status'] if entries else default
+
+    def record_skip(self, url, reason):
+        """Note a URL that was not parsed, e.g. 'document', 'binary' or 'too_large'"""
+        self.skipped[url] = reason
+
+    def record_parse(self, url, parse_time):
+        if url in self.fetches:
+            self.fetches[url][-1]['parse_s'] += parse_time
+
+    def record_extractor(self, name, seconds, records):
+        stats = self.extractors.setdefault(name, {'calls': 0, 'seconds': 0.0, 'records': 0})
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        stats['records'] += records
+
+    def merge_extractors(self, extractors):
+        """Fold extractor stats gathered in another process into this run"""
+        for name, other in extractors.items():
+            stats = self.extractors.setdefault(name, {'calls': 0, 'seconds': 0.0, 'records': 0})
+            for key in stats:
+                stats[key] += other[key]
+
+    @contextmanager
+    def phase(self, name):
+        """Time a phase of the run, profiling it if a profiler is configured"""
+        stop_profiler = self._start_profiler(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+            if stop_profiler:
+                stop_profiler()
+
+    def _start_profiler(self, name):
+        if self.profiler is None:
+            return None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, name)
+
+        if self.profiler == 'cprofile':
+            profile = cProfile.Profile()
+            profile.enable()
+
+            def stop():
+                profile.disable()
+                profile.dump_stats(f"{path}.prof")
+            return stop
+
+        from pyinstrument import Profiler
+        profile = Profiler()
+        profile.start()
+
+        def stop():
+            profile.stop()
+            with open(f"{path}.html", 'w', encoding='utf-8') as f:
+                f.write(profile.output_html())
+        return stop
+
+    def report(self):
+        """Return the run report as a JSON-serializable dict"""
+        fetches = [fetch for entries in self.fetches.values() for fetch in entries]
+        latencies = sorted(fetch['latency_s'] for fetch in fetches)
+        return {
+            'started_at': self.started_at,
+            'phases': self.phases,
+            'fetch_summary': {
+                'requests': len(fetches),
+                'urls': len(self.fetches),
+                'errors': sum(1 for fetch in fetches
+                              if fetch['status'] is None or fetch['status'] >= 400),
+                'bytes': sum(fetch['bytes'] for fetch in fetches),
+                'latency_s_total': sum(latencies),
+                'latency_s_p50': percentile(latencies, 50),
+                'latency_s_p95': percentile(latencies, 95),
+                'parse_s_total': sum(fetch['parse_s'] for fetch in fetches),
+                'skipped': dict(Counter(self.skipped.values())),
+            },
+            'rate_limits': self.rate_limits,
+            'extractors': self.extractors,
+            'fetches': self.fetches,
+        }
+
+    def save_report(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        logger.info(f"Run report saved to {path}")
+
+    def to_prometheus(self):
+        """Render the run totals in the Prometheus text exposition format"""
+        summary = self.report()['fetch_summary']
+        lines = [
+            '# HELP moh_scraper_requests_total Pages fetched',
+            '# TYPE moh_scraper_requests_total counter',
+            f"moh_scraper_requests_total {summary['requests']}",
+            '# HELP moh_scraper_request_errors_total Failed page fetches',
+            '# TYPE moh_scraper_request_errors_total counter',
+            f"moh_scraper_request_errors_total {summary['errors']}",
+            '# HELP moh_scraper_response_bytes_total Bytes downloaded',
+            '# TYPE moh_scraper_response_bytes_total counter',
+            f"moh_scraper_response_bytes_total {summary['bytes']}",
+            '# HELP moh_scraper_fetch_seconds_total Time spent fetching pages',
+            '# TYPE moh_scraper_fetch_seconds_total counter',
+            f"moh_scraper_fetch_seconds_total {summary['latency_s_total']}",
+            '# HELP moh_scraper_parse_seconds_total Time spent parsing pages',
+            '# TYPE moh_scraper_parse_seconds_total counter',
+            f"moh_scraper_parse_seconds_total {summary['parse_s_total']}",
+            '# HELP moh_scraper_phase_seconds Duration of each scraper phase',
+            '# TYPE moh_scraper_phase_seconds gauge',
+        ]
+        lines.extend(f'moh_scraper_phase_seconds{{phase="{name}"}} {seconds}'
+                     for name, seconds in self.phases.items())
+        lines.extend([
+            '# HELP moh_scraper_request_rate Current adaptive request rate per host (req/s)',
+            '# TYPE moh_scraper_request_rate gauge',
+        ])
+        lines.extend(f'moh_scraper_request_rate{{host="{host}"}} {stats["rate_rps"]}'
+                     for host, stats in self.rate_limits.items())
+        lines.extend([
+            '# HELP moh_scraper_rate_decreases_total Adaptive rate back-offs per host',
+            '# TYPE moh_scraper_rate_decreases_total counter',
+        ])
+        lines.extend(f'moh_scraper_rate_decreases_total{{host="{host}"}} {stats["decreases"]}'
+                     for host, stats in self.rate_limits.items())
+        lines.extend([
+            '# HELP moh_scraper_skipped_total URLs not parsed, by reason',
+            '# TYPE moh_scraper_skipped_total counter',
+        ])
+        lines.extend(f'moh_scraper_skipped_total{{reason="{reason}"}} {count}'
+                     for reason, count in summary['skipped'].items())
+        lines.extend([
+            '# HELP moh_scraper_extractor_seconds_total Time spent in each extractor',
+            '# TYPE moh_scraper_extractor_seconds_total counter',
+        ])
+        lines.extend(f'moh_scraper_extractor_seconds_total{{extractor="{name}"}} {stats["seconds"]}'
+                     for name, stats in self.extractors.items())
+        lines.extend([
+            '# HELP moh_scraper_extractor_records_total Records produced by each extractor',
+            '# TYPE moh_scraper_extractor_records_total counter',
+        ])
+        lines.extend(f'moh_scraper_extractor_records_total{{extractor="{name}"}} {stats["records"]}'
+                     for name, stats in self.extractors.items())
+        return '\n'.join(lines) + '\n'
+
+    def save_prometheus(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        logger.info(f"Prometheus metrics saved to {path}")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
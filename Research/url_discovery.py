@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+robots.txt and XML sitemap driven URL discovery
+Finds a site's pages from its sitemaps (including sitemap indexes), skips
+URLs whose lastmod hasn't changed since the previous crawl, and exposes the
+robots.txt rules and Crawl-delay for the scraper's rate limiting
+"""
+
+import gzip
+import json
+import logging
+import os
+import xml.etree.ElementTree as ET
+from urllib.parse import unquote, urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+# Tried when robots.txt doesn't list any sitemaps
+DEFAULT_SITEMAPS = ['sitemap.xml', 'sitemap_index.xml', 'wp-sitemap.xml']
+
+
+def link_text_from_url(url):
+    """Pseudo link text for a sitemap URL, built from its path segments.
+
+    Sitemap entries have no anchor text, so the slug words stand in for it
+    when routing pages to extractors.
+    """
+    path = unquote(urlparse(url).path)
+    words = path.replace('-', ' ').replace('_', ' ').replace('/', ' ')
+    return ' '.join(words.split())
+
+
+class SiteDiscovery:
+    """robots.txt rules plus sitemap discovery for one site"""
+
+    def __init__(self, session, base_url, state_path='crawl_state.json', max_sitemaps=50):
+        self.session = session
+        self.base_url = base_url
+        self.state_path = state_path
+        self.max_sitemaps = max_sitemaps
+        self.user_agent = session.headers.get('User-Agent', '*')
+        self.robots = RobotFileParser()
+        self.robots_loaded = False
+        self.previous_lastmod = self._load_state()
+        self.current_lastmod = {}
+        self.fetched = set()
+
+    def _load_state(self):
+        if self.state_path and os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def mark_fetched(self, url):
+        """Note that a URL was fetched this crawl, so its lastmod may be saved"""
+        self.fetched.add(url)
+
+    def save_state(self):
+        """Persist the lastmod of every URL fetched so the next crawl can skip unchanged ones.
+
+        URLs listed in a sitemap but not fetched, e.g. after a timeout or 5xx,
+        keep their previous lastmod so the next crawl tries them again. The
+        file is re-read first, so several sites' discoveries can share it.
+        """
+        if not self.state_path:
+            return
+        state = self._load_state()
+        state.update((url, lastmod) for url, lastmod in self.current_lastmod.items() if url in self.fetched)
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+
+    def _fetch(self, url):
+        try:
+            response = self.session.get(url, timeout=10)
+        except requests.RequestException as e:
+            logger.warning(f"Error fetching {url}: {e}")
+            return None
+        if response.status_code != 200:
+            return None
+        content = response.content
+        if content[:2] == b'\x1f\x8b':
+            content = gzip.decompress(content)
+        return content
+
+    def load_robots(self):
+        """Fetch and parse robots.txt; a missing file allows everything"""
+        content = self._fetch(urljoin(self.base_url, '/robots.txt'))
+        self.robots.parse(content.decode('utf-8', 'replace').splitlines() if content else [])
+        self.robots_loaded = True
+        return self.robots
+
+    def can_fetch(self, url):
+        return not self.robots_loaded or self.robots.can_fetch(self.user_agent, url)
+
+    @property
+    def crawl_delay(self):
+        """Crawl-delay for our user agent from robots.txt, or None"""
+        if not self.robots_loaded:
+            return None
+        delay = self.robots.crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+    def sitemap_urls(self):
+        listed = self.robots.site_maps() if self.robots_loaded else None
+        return listed or [urljoin(self.base_url, path) for path in DEFAULT_SITEMAPS]
+
+    def iter_sitemap(self, url, seen):
+        """Yield ``(loc, lastmod)`` for every page in a sitemap, following sitemap indexes"""
+        if url in seen or len(seen) >= self.max_sitemaps:
+            return
+        seen.add(url)
+        content = self._fetch(url)
+        if not content:
+            return
+        try:
+            root = ET.fromstring(content)
+        except ET.ParseError as e:
+            logger.warning(f"Invalid sitemap {url}: {e}")
+            return
+
+        if root.tag == f"{SITEMAP_NS}sitemapindex":
+            for sitemap in root.iter(f"{SITEMAP_NS}sitemap"):
+                loc = sitemap.findtext(f"{SITEMAP_NS}loc", '').strip()
+                if loc:
+                    yield from self.iter_sitemap(loc, seen)
+        else:
+            for entry in root.iter(f"{SITEMAP_NS}url"):
+                loc = entry.findtext(f"{SITEMAP_NS}loc", '').strip()
+                lastmod = entry.findtext(f"{SITEMAP_NS}lastmod", '').strip() or None
+                if loc:
+                    yield loc, lastmod
+
+    def discover(self):
+        """Return ``(url, lastmod)`` for the site's fetchable sitemap pages that changed since last crawl"""
+        if not self.robots_loaded:
+            self.load_robots()
+        seen = set()
+        pages = {}
+        for sitemap_url in self.sitemap_urls():
+            for loc, lastmod in self.iter_sitemap(sitemap_url, seen):
+                pages[loc] = lastmod
+
+        changed = []
+        skipped = 0
+        for url, lastmod in pages.items():
+            if not self.can_fetch(url):
+                continue
+            if lastmod:
+                self.current_lastmod[url] = lastmod
+                if self.previous_lastmod.get(url) == lastmod:
+                    skipped += 1
+                    continue
+            changed.append((url, lastmod))
+        logger.info(f"Sitemaps list {len(pages)} pages: {len(changed)} to crawl, {skipped} unchanged")
+        return changed
+
+    def is_unchanged(self, url):
+        """True if the sitemap lastmod of a URL matches the previous crawl's"""
+        lastmod = self.current_lastmod.get(url)
+        return lastmod is not None and self.previous_lastmod.get(url) == lastmod